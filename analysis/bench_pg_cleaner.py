@@ -0,0 +1,168 @@
+"""
+Benchmark of the redundant log search of js_compare.pg_analyzer on a synthetic page graph.
+
+Compares walking back from each js call edge id by id in a dict (as pg_cleaner did before)
+with the EdgeIndex, which finds the edges by binary search in sorted arrays. The counts of
+both are checked to be the same, on the synthetic graph and on any graphs given.
+
+    python bench_pg_cleaner.py --edges 200000
+    python bench_pg_cleaner.py --graphml pagegraph-query/assets/graphs/*.graphml
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+import networkx as nx
+from js_compare import EdgeIndex, pg_cleaner
+
+# Web APIs that the synthetic graph calls
+METHODS = ["CSSStyleDeclaration.item", "Window.getComputedStyle", "CSS.escape", "MessageChannel.constructor"]
+
+def scan_cleaner(G, edges_ids, edge_id):
+    """
+    The former pg_cleaner, without its debug output.
+    """
+    redundant_logs = list()
+    idx = 1
+    child = G.nodes().get(edges_ids[edge_id][1])
+
+    while True:
+        while edge_id-idx not in edges_ids:
+            idx += 1
+            if idx > edge_id:
+                return []
+        if edges_ids[edge_id-idx][2]["edge type"] == "js result":
+            break
+        idx += 1
+        if idx > edge_id:
+            return []
+
+    while True:
+        while edge_id-idx not in edges_ids:
+            idx += 1
+        edge_data = edges_ids[edge_id-idx]
+        edge_value = edge_data[2].get("value")
+        if not edge_value:
+            break
+        try:
+            json_value = json.loads(edge_value)
+        except json.JSONDecodeError:
+            break
+        if not isinstance(json_value, dict) or "property" not in json_value:
+            break
+        breaker = True
+        try:
+            property = json_value["property"].replace("[object CSS]", "CSS")
+            if property == child["method"]:
+                breaker = False
+            x = property + "." + json_value["event"]
+            if x == child["method"]:
+                breaker = False
+            x = x.replace("Window.", "")
+            if x == child["method"]:
+                breaker = False
+        except Exception:
+            break
+        if breaker:
+            break
+        if G.nodes().get(edge_data[0], {}).get("method") != "JsonStringify":
+            break
+        redundant_logs.append(edge_value)
+        idx += 2
+
+    return redundant_logs[1:]
+
+def web_api_calls(G):
+    """
+    The js call edges into web API nodes, with the method called.
+    """
+    for node, data in G.nodes(data=True):
+        if data.get("node type") == "web API":
+            for e in G.in_edges(node, data=True):
+                if e[2]["edge type"] == "js call":
+                    yield int(e[2]["id"]), data["method"]
+
+def count_scanned(G):
+    edges = sorted(G.edges(data=True), key=lambda x: int(x[2]["id"]))
+    edges_ids = {int(x[2]["id"]): x for x in edges}
+    d = defaultdict(int)
+    for edge_id, method in web_api_calls(G):
+        d[method] += 1 + len(scan_cleaner(G, edges_ids, edge_id))
+    return dict(d)
+
+def count_indexed(G, edge_index):
+    d = defaultdict(int)
+    for edge_id, method in web_api_calls(G):
+        d[method] += 1 + len(pg_cleaner(edge_index, edge_id, method))
+    return dict(d)
+
+def synthetic_graph(edges, log_rate, seed=0):
+    """
+    Build a graph of about edges edges: web API calls, a share of them (log_rate) after a chain
+    of JsonStringify logs, between unrelated edges, with gaps in the edge ids.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    G.add_node("script", **{"node type": "script"})
+    G.add_node("stringify", **{"node type": "JS builtin", "method": "JsonStringify"})
+    G.add_node("other", **{"node type": "HTML element"})
+    for method in METHODS:
+        G.add_node(method, **{"node type": "web API", "method": method})
+
+    edge_id = 0
+
+    def add(source, target, edge_type, value=None, step=None):
+        nonlocal edge_id
+        data = {"id": str(edge_id), "edge type": edge_type}
+        if value is not None:
+            data["value"] = value
+        G.add_edge(source, target, **data)
+        edge_id += step or rng.choice([1, 1, 2, 3])
+
+    # Plain edges first, so that no chain runs into the lowest ids
+    for _ in range(10):
+        add("script", "other", "structure")
+    while edge_id < edges:
+        method = rng.choice(METHODS)
+        if rng.random() < log_rate:
+            property, _, event = method.rpartition(".")
+            # The hooks log the call with JSON.stringify, once or several times
+            for _ in range(rng.randrange(1, 5)):
+                log = json.dumps({"type": "log", "property": property, "event": event})
+                add("script", "stringify", "js call", step=1)
+                add("stringify", "script", "js result", log, step=1)
+        add("script", method, "js call")
+        for _ in range(rng.randrange(0, 20)):
+            add("script", "other", rng.choice(["structure", "attr set", "js call"]))
+    return G
+
+def compare(name, G):
+    start = time.perf_counter()
+    edge_index = EdgeIndex(G)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = count_indexed(G, edge_index)
+    indexed_s = time.perf_counter() - start + build_s
+    start = time.perf_counter()
+    scanned = count_scanned(G)
+    scanned_s = time.perf_counter() - start
+    assert indexed == scanned, (name, indexed, scanned)
+    print(f"{name}: {G.number_of_edges()} edges, {sum(indexed.values())} calls counted, "
+          f"scan {scanned_s:.2f}s, index {indexed_s:.2f}s ({build_s:.2f}s to build), "
+          f"speedup {scanned_s / max(indexed_s, 1e-9):.0f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the redundant log search of js_compare.")
+    parser.add_argument("--edges", type=int, default=200000, help="edges of the synthetic graph")
+    parser.add_argument("--log-rate", type=float, default=0.02, help="share of calls the hooks log")
+    parser.add_argument("--graphml", nargs="*", default=[], help="graphs to compare the counts on")
+    args = parser.parse_args()
+
+    for path in args.graphml:
+        compare(path, nx.read_graphml(path))
+    compare("synthetic", synthetic_graph(args.edges, args.log_rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of the protocol resolution of requests_analysis on a synthetic pagegraph.log.
+
+Compares scanning the whole log with a regex per URL (as protocol_majority_vote did before,
+which also read the log from disk for every URL, not counted here) with the ProtocolIndex,
+which pagegraph_log fills in one pass over the log. The per-URL scan takes minutes for the
+full set of URLs, so it is timed on a sample, checked against the index, and extrapolated.
+
+    python bench_protocol_index.py --size-mb 50 --urls 5000
+"""
+
+import argparse
+import io
+import random
+import re
+import time
+from collections import Counter
+from pagegraph_log import PagegraphLog, UrlMention
+
+def scan_vote(log, url):
+    """
+    The former protocol_majority_vote, on a log that was read already.
+    """
+    url_sp = url.split("://", 1)[1]
+    prot = Counter(re.findall(r"(https?://)" + url_sp.replace("?", r"\?"), log)).most_common(1)[0][0]
+    return prot + url_sp
+
+def synthetic_log(size, urls, seed=0):
+    """
+    Build a log of about size characters, with lines of noise, URLs in console JSON and plain log lines.
+    """
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        url = rng.choice(urls)
+        # The browser mostly, but not always, logs the right scheme
+        if rng.random() < 0.2:
+            url = url.replace("https://", "http://", 1)
+        kind = rng.random()
+        if kind < 0.3:
+            line = f'[1017/120000.000:INFO:CONSOLE(1)] "{{"tag":"inline_handler","url":"{url}"}}", source: {url} (1)'
+        elif kind < 0.6:
+            line = f"[1017/120000.000:VERBOSE1:network_delegate.cc(42)] Request {rng.randrange(10**6)} to {url} started"
+        else:
+            line = "[1017/120000.000:VERBOSE2:render_frame_impl.cc(7)] " + "x" * rng.randrange(50, 300)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the protocol resolution of requests_analysis.")
+    parser.add_argument("--size-mb", type=float, default=50, help="size of the synthetic log in MB")
+    parser.add_argument("--urls", type=int, default=5000, help="number of distinct URLs")
+    parser.add_argument("--sample", type=int, default=20, help="URLs the per-URL scan is timed on")
+    args = parser.parse_args()
+
+    urls = [f"https://site{i % 200}.example/path/{i}?q={i}&r=x" for i in range(args.urls)]
+    log = synthetic_log(int(args.size_mb * 1e6), urls)
+    # Only URLs that occur in the log can be resolved
+    urls = [url for url in urls if url.split("://", 1)[1] in log]
+    print(f"Log: {len(log) / 1e6:.1f} MB, URLs: {len(urls)}")
+
+    start = time.perf_counter()
+    index = PagegraphLog(io.StringIO(log, newline="\n"), [UrlMention]).protocols
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    resolved = [index.resolve(url) for url in urls]
+    lookup = time.perf_counter() - start
+    indexed = build + lookup
+    print(f"Index: {build:.2f}s to build, {lookup:.3f}s for all lookups, {indexed:.2f}s in total")
+
+    sample = random.Random(1).sample(range(len(urls)), min(args.sample, len(urls)))
+    start = time.perf_counter()
+    for i in sample:
+        assert scan_vote(log, urls[i]) == resolved[i], urls[i]
+    per_url = (time.perf_counter() - start) / len(sample)
+    scanned = per_url * len(urls)
+    print(f"Scan per URL: {per_url:.3f}s per URL, about {scanned:.0f}s for all URLs")
+    print(f"Speedup: about {scanned / indexed:.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from utils import get_valid_directories
+from pagegraph_log import read_log, HandlerTrace
 import os
 from typing import Tuple, List, Dict, Any
 import multiprocessing
@@ -22,20 +23,8 @@ def handle_pg_log(path: str) -> Tuple[List[str], List[str], List[str]]:
     Parse the pagegraph log file to extract API traces, false traces, and false 'on' traces.
     """
 
-    with open(path, "r", errors='ignore') as f:
-        api_traces, false_traces, false_on_traces = [], [], []
-
-        for line in f.readlines():
-            line = line.strip()
-            if "INFO:CONSOLE" in line:
-                if '"tag":"inline_handler' in line:
-                    api_traces.append(line)
-                if '"tag":"prog_handler' in line:
-                    false_traces.append(line)
-                if '"tag":"on_attr_handler' in line:
-                    false_on_traces.append(line)
-
-    return api_traces, false_traces, false_on_traces
+    traces = read_log(path, [HandlerTrace]).handler_traces
+    return traces["inline_handler"], traces["prog_handler"], traces["on_attr_handler"]
 
 def is_dom_excluded_element(node) -> bool:
     if node.type_name() != 'HTML element':
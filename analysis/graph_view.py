@@ -0,0 +1,81 @@
+"""
+Page graphs for the analyses that walk them with the networkx API.
+
+read_graph loads a page graph with pagegraph-query, which memory maps the columnar cache of
+the recording if there is a current one (and writes it otherwise), instead of parsing the
+GraphML again on every run. The graph is returned as a GraphView, which has the parts of the
+networkx MultiDiGraph API that the analyses use, read from the store of the page graph.
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+# Add pagegraph-query
+sys.path.insert(0, 'pagegraph-query')
+import pagegraph.graph  # noqa: E402
+
+class NodeView:
+    """
+    The nodes of a graph, like G.nodes of networkx: G.nodes[node] and G.nodes().get(node) are
+    the attributes of a node, G.nodes(data=True) the nodes with their attributes.
+    """
+
+    def __init__(self, store) -> None:
+        self.store = store
+
+    def __call__(self, data: bool = False):
+        if data:
+            return [(node, self.store.node_data(node)) for node in self.store.node_ids()]
+        return self
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.node_ids())
+
+    def __getitem__(self, node: str) -> Dict[str, Any]:
+        return self.store.node_data(node)
+
+    def get(self, node: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return self.store.node_data(node)
+        except KeyError:
+            return default
+
+class GraphView:
+    """
+    A page graph, read through the networkx MultiDiGraph API. Edges are (source, target, data)
+    tuples with data=True, (source, target) otherwise.
+    """
+
+    def __init__(self, graph: pagegraph.graph.PageGraph) -> None:
+        self.graph = graph
+        self.store = graph.store
+        self.nodes = NodeView(self.store)
+
+    def edge(self, edge_id: str, data: bool) -> Any:
+        source, target = self.store.edge_endpoints(edge_id)
+        if data:
+            return source, target, self.store.edge_data(edge_id)
+        return source, target
+
+    def edges(self, data: bool = False) -> List[Any]:
+        return [self.edge(edge_id, data) for edge_id in self.store.edge_ids()]
+
+    def in_edges(self, node: str, data: bool = False) -> List[Any]:
+        return [self.edge(edge_id, data) for edge_id in self.store.incoming_edge_ids(node)]
+
+    def out_edges(self, node: str, data: bool = False) -> List[Any]:
+        return [self.edge(edge_id, data) for edge_id in self.store.outgoing_edge_ids(node)]
+
+    def close(self) -> None:
+        """
+        Release the page graph, which can't be read afterwards.
+        """
+        self.graph.close()
+
+def read_graph(graphml_file: str) -> GraphView:
+    """
+    Read a page graph, from its columnar cache if it is current.
+
+    Like pagegraph-query, this raises an Exception for graphs without a version.
+    """
+    return GraphView(pagegraph.graph.from_path(graphml_file))
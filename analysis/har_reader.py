@@ -0,0 +1,303 @@
+import codecs
+import json
+import re
+import zlib
+from typing import Any, Dict, Iterator, List
+import pandas as pd
+
+# Bytes read from a HAR file at once
+CHUNK_SIZE = 1 << 16
+
+DECODER = json.JSONDecoder()
+# Characters that continue a number
+NUMBER_CHARS = "0123456789.eE+-"
+# Whitespace between JSON tokens
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Key of an object member without escapes, up to its value
+MEMBER_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+# End of an object member, up to the next member or the end of the object
+MEMBER_END = re.compile(r'[ \t\n\r]*([,}])[ \t\n\r]*')
+# Characters of a string up to its closing quote, or up to a backslash that ends the text
+STRING_CHARS = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# Fields of the request and response of a HAR entry that are skipped, not decoded
+SKIPPED_FIELDS = {"request": {"postData"}, "response": {"content"}}
+# Separates the values of a header that occurs several times in a HAR table
+VALUE_SEPARATOR = "\n"
+# Timezone at the end of a startedDateTime
+TIMEZONE_RX = r"(Z|[+-]\d\d:?\d\d)$"
+
+def read_chunks(har_file: str) -> Iterator[str]:
+    """
+    Read the text of a HAR file in chunks, decompressing it if it is a .zhar.
+    """
+    decompressor = zlib.decompressobj() if har_file.endswith(".zhar") else None
+    text = codecs.getincrementaldecoder("utf-8")()
+    with open(har_file, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            yield text.decode(chunk)
+        if decompressor is not None:
+            yield text.decode(decompressor.flush(), final=True)
+        else:
+            yield text.decode(b"", final=True)
+
+class JsonScanner:
+    """
+    Walk JSON text that arrives in chunks, one value at a time.
+
+    Values are decoded by json where they are in the buffer as a whole. Strings and
+    containers that continue in the next chunk are scanned on from where the text ran
+    out, instead of being decoded again from their start after every chunk. Values that
+    are skipped are scanned without being kept, so only the values that are decoded are
+    held in memory, along with at most one chunk of text around them.
+    """
+
+    def __init__(self, chunks: Iterator[str]) -> None:
+        self.chunks = chunks
+        self.buffer = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """
+        Append the next chunk to the buffer, dropping what was consumed. Return whether there was one.
+        """
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character.
+        """
+        if self.pos < len(self.buffer) and self.buffer[self.pos] not in " \t\n\r":
+            return self.buffer[self.pos]
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def expect(self, char: str) -> None:
+        """
+        Consume the next character, which must be char.
+        """
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r}, found {self.buffer[self.pos]!r}")
+        self.pos += 1
+
+    def string_end(self, start: int, keep: bool) -> int:
+        """
+        Find the closing quote of the string whose text continues at start, and return the
+        position after it. With keep, the buffer keeps the string from self.pos on, else the
+        text scanned is dropped as the next chunks are read.
+        """
+        while True:
+            end = STRING_CHARS.match(self.buffer, start).end()
+            if end < len(self.buffer) and self.buffer[end] == '"':
+                return end + 1
+            # Continue at the end of the text, or at the backslash that ends it
+            if not keep:
+                self.pos = end
+            start = end - self.pos
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+            start += self.pos
+
+    def value(self) -> Any:
+        """
+        Decode the next value.
+        """
+        char = self.peek()
+        try:
+            value, end = DECODER.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            # The value continues in the next chunk. Strings are scanned from where the
+            # text ran out, and containers are read one item at a time.
+            if char == '"':
+                self.string_end(self.pos + 1, True)
+                value, self.pos = DECODER.raw_decode(self.buffer, self.pos)
+                return value
+            if char == "{":
+                return {key: self.value() for key in self.members()}
+            if char == "[":
+                return [self.value() for _ in self.items()]
+            if not self.fill():
+                raise
+            return self.value()
+        # A number may continue in the next chunk, e.g. 1 followed by .5
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if is_number and (end == len(self.buffer) or self.buffer[end] in NUMBER_CHARS) and self.fill():
+            return self.value()
+        self.pos = end
+        return value
+
+    def skip(self) -> None:
+        """
+        Consume the next value without decoding it.
+        """
+        char = self.peek()
+        if char == '"':
+            self.pos = self.string_end(self.pos + 1, False)
+        elif char == "{":
+            for _ in self.members():
+                self.skip()
+        elif char == "[":
+            for _ in self.items():
+                self.skip()
+        else:
+            self.value()
+
+    def members(self) -> Iterator[str]:
+        """
+        Walk an object, yielding its keys. The caller must consume each value.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            # Keys without escapes, as HAR keys are, are matched along with their colon
+            match = MEMBER_KEY.match(self.buffer, self.pos)
+            if match:
+                key = match.group(1)
+                self.pos = match.end()
+            else:
+                key = self.value()
+                self.expect(":")
+            yield key
+            match = MEMBER_END.match(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                if match.group(1) == "}":
+                    return
+                continue
+            if self.peek() == "}":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def items(self) -> Iterator[None]:
+        """
+        Walk an array, yielding once per item. The caller must consume each item.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+def read_entry(scanner: JsonScanner) -> Dict[str, Any]:
+    """
+    Decode the next HAR entry, skipping the fields in SKIPPED_FIELDS.
+    """
+    entry = {}
+    for key in scanner.members():
+        if key not in SKIPPED_FIELDS:
+            entry[key] = scanner.value()
+            continue
+        entry[key] = {}
+        for message_key in scanner.members():
+            if message_key in SKIPPED_FIELDS[key]:
+                scanner.skip()
+            else:
+                entry[key][message_key] = scanner.value()
+    return entry
+
+def slim_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep only the fields of a HAR entry that the analyses use.
+    """
+    return {
+        "url": entry["request"]["url"],
+        "method": entry["request"].get("method"),
+        "startedDateTime": entry["startedDateTime"],
+        "time": entry.get("time", 0),
+        "timings": entry.get("timings", {}),
+        "request": {"headers": entry["request"].get("headers", [])},
+        "response": {
+            "status": entry["response"].get("status"),
+            "headers": entry["response"].get("headers", []),
+            "redirectURL": entry["response"].get("redirectURL", ""),
+        },
+    }
+
+def iter_har_entries(har_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the entries of a HAR file (.har or .zhar) one at a time, without reading the whole file.
+
+    Entries only have the fields kept by slim_entry. The response bodies and request data that
+    mitmdump stores in the HAR are skipped while the entry is read, without being decoded.
+    """
+    scanner = JsonScanner(read_chunks(har_file))
+    for key in scanner.members():
+        if key != "log":
+            scanner.value()
+            continue
+        for log_key in scanner.members():
+            if log_key != "entries":
+                scanner.value()
+                continue
+            for _ in scanner.items():
+                yield slim_entry(read_entry(scanner))
+
+def har_table(har_file: str, request_headers: List[str] = [], response_headers: List[str] = []) -> pd.DataFrame:
+    """
+    Flatten the entries of a HAR file into a dataframe, one row per entry, in the order of the HAR.
+
+    The columns are url, method, status, redirect_url, started (startedDateTime, in the timezone
+    of the HAR but without it), time (ms) and end (started + time), and a column per header asked
+    for, named by the lowercase header name (prefixed with response_ for response headers). Header
+    names are matched exactly; a header that occurs several times has its values joined by
+    VALUE_SEPARATOR, and is None if it is missing.
+    """
+    columns: Dict[str, List[Any]] = {
+        "url": [], "method": [], "status": [], "redirect_url": [], "started": [], "time": [],
+    }
+    # Columns of the headers asked for, by message and header name
+    header_columns = {
+        "request": {name: name.lower() for name in request_headers},
+        "response": {name: "response_" + name.lower() for name in response_headers},
+    }
+    for names in header_columns.values():
+        for column in names.values():
+            columns[column] = []
+
+    for e in iter_har_entries(har_file):
+        columns["url"].append(e["url"])
+        columns["method"].append(e["method"])
+        columns["status"].append(e["response"]["status"])
+        columns["redirect_url"].append(e["response"]["redirectURL"])
+        columns["started"].append(e["startedDateTime"])
+        columns["time"].append(e["time"])
+        for message, names in header_columns.items():
+            values: Dict[str, List[str]] = {}
+            for h in e[message]["headers"]:
+                if h["name"] in names:
+                    values.setdefault(names[h["name"]], []).append(h["value"])
+            for column in names.values():
+                columns[column].append(VALUE_SEPARATOR.join(values[column]) if column in values else None)
+
+    table = pd.DataFrame(columns)
+    # The timezone is dropped, not converted to
+    started = table["started"].astype(str).str.replace(TIMEZONE_RX, "", regex=True)
+    table["started"] = pd.to_datetime(started, format="ISO8601")
+    # Rounded to microseconds, like datetime.timedelta
+    table["end"] = table["started"] + pd.to_timedelta(table["time"], unit="ms").dt.round("us")
+    return table
+
+def has_value(column: pd.Series, value: str) -> pd.Series:
+    """
+    Mask of the rows of a header column of har_table where the header has a value.
+    """
+    joined = VALUE_SEPARATOR + column.fillna("").astype(str) + VALUE_SEPARATOR
+    return column.notna() & joined.str.contains(VALUE_SEPARATOR + value + VALUE_SEPARATOR, regex=False)
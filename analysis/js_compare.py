@@ -1,8 +1,7 @@
 import json
-import re
 import os
 import shutil
-import networkx as nx
+import numpy as np
 from collections import defaultdict
 import multiprocessing
 import pandas as pd
@@ -10,6 +9,8 @@ from tqdm import tqdm
 import time
 from typing import Any
 from utils import get_valid_directories
+from pagegraph_log import read_log, HookRecord
+from graph_view import read_graph
 
 pd.set_option('display.max_rows', None)
 
@@ -26,128 +27,129 @@ def log_analyzer(path: str) -> dict[str, int]:
     Returns:
         dict[str, int]: A dictionary of properties/events and their occurrence counts.
     """
-    log_content = open(path, "r").read()
     d = defaultdict(int)
 
-    for l in log_content.split("\n"):
-        if l == "calling generatePageGraph":
-            break
+    for json_data in read_log(path, [HookRecord]).hooks:
+        # {'type': 'log', 'function': '[object CSSStyleDeclaration].item', 'args': [0]}
+        if json_data["type"] != "log": continue
 
-        if "[HWPG] {" in l:
-            line = re.search(r'INFO:CONSOLE.*\[HWPG\] (.*}).*", source', l)
-            if not line:
-                # Not a logging line
-                # print(f"ERROR: No log for {path} in line: {l[:500]}")
-                continue
-
-            try:
-                json_data = json.loads(line[1])
-            except:
-                print(f"ERROR: Parsing json: {l}")
-                continue
+        if json_data["event"] in ["get", "set", "constructor"]:
+            d[f"{json_data['property']}.{json_data['event']}"] += 1
+        else:
+            d[f"{json_data['property']}"] += 1
+    return d
 
-            # {'type': 'log', 'function': '[object CSSStyleDeclaration].item', 'args': [0]}
-            if json_data["type"] != "log": continue
+class EdgeIndex:
+    """
+    The edges of a page graph in arrays sorted by edge id, to find the edges logged before a js call.
+
+    Attributes:
+        ids: Edge ids, sorted.
+        types: Edge type of each edge, as a code into type_names.
+        sources, targets: Source and target node of each edge, as a code into nodes.
+        value_offsets: Index of the value of each edge into values, -1 if it has none.
+        result_ids: Ids of the js result edges.
+        log_calls: For the edges from a JsonStringify node with a logged call as value, the
+            names the call can have in the page graph, by position.
+    """
 
-            if json_data["event"] in ["get", "set", "constructor"]:
-                d[f"{json_data['property']}.{json_data['event']}"] += 1
+    def __init__(self, G):
+        self.nodes = list(G.nodes())
+        node_codes = {node: code for code, node in enumerate(self.nodes)}
+        type_codes = {}
+
+        # One pass over the edges, in the order of the graph
+        ids, types, sources, targets, value_offsets = [], [], [], [], []
+        self.values = []
+        for source, target, data in G.edges(data=True):
+            ids.append(int(data["id"]))
+            types.append(type_codes.setdefault(data["edge type"], len(type_codes)))
+            sources.append(node_codes[source])
+            targets.append(node_codes[target])
+            value = data.get("value")
+            if value:
+                value_offsets.append(len(self.values))
+                self.values.append(value)
             else:
-                d[f"{json_data['property']}"] += 1
-    return d
+                value_offsets.append(-1)
+
+        ids = np.array(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.type_names = list(type_codes)
+        self.ids = ids[order]
+        self.types = np.array(types, dtype=np.int32)[order]
+        self.sources = np.array(sources, dtype=np.int64)[order]
+        self.targets = np.array(targets, dtype=np.int64)[order]
+        self.value_offsets = np.array(value_offsets, dtype=np.int64)[order]
+
+        self.result_ids = self.ids[self.types == self.type_code("js result")]
+
+        stringify_nodes = [code for code, node in enumerate(self.nodes) if G.nodes[node].get("method") == "JsonStringify"]
+        log_mask = (self.value_offsets >= 0) & np.isin(self.sources, stringify_nodes)
+        self.log_calls = {}
+        for position in np.flatnonzero(log_mask):
+            calls = logged_call_names(self.values[self.value_offsets[position]])
+            if calls:
+                self.log_calls[int(position)] = calls
+
+    def type_code(self, type_name):
+        """
+        Code of an edge type, -1 if no edge has it.
+        """
+        try:
+            return self.type_names.index(type_name)
+        except ValueError:
+            return -1
+
+def logged_call_names(edge_value):
+    """
+    Names that the call logged in the value of an edge can have in the page graph, or None if
+    the value is no logged call.
+    """
+    try:
+        json_value = json.loads(edge_value)
+    except json.JSONDecodeError:
+        return None
+
+    # Check for the Json Value as it indicates the logging of a call
+    if not isinstance(json_value, dict) or "property" not in json_value:
+        return None
 
-def pg_cleaner(G, edges_ids, edge_id):
+    try:
+        property = json_value["property"].replace("[object CSS]", "CSS")
+        x = property + "." + json_value["event"]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    return {property, x, x.replace("Window.", "")}
+
+def pg_cleaner(edge_index, edge_id, method):
     """
     Identify redundant logs based on edge relationships in the graph.
 
+    The chain of logs starts at the last js result edge before the call, and continues with
+    the edge before each but one, as long as these log the call from JsonStringify.
+
     Args:
-        G: NetworkX graph object.
-        edges_ids: Dictionary mapping edge IDs to edge details.
-        edge_id: Current edge ID being processed.
+        edge_index: EdgeIndex of the graph.
+        edge_id: Id of the js call edge being processed.
+        method: Method of the web API that is called.
 
     Returns:
         list: Redundant logs identified.
     """
     redundant_logs = list()
-    idx = 1
 
-    # check if parent 
-    edge = edges_ids[edge_id]
-    child = G.nodes().get(edge[1])
-    parent = G.nodes().get(edge[0])
-    
     # Go through the edges to find the result of the call
-    while True:
-        while edge_id-idx not in edges_ids:
-            idx += 1
-            if idx > edge_id:
-                return []
-            
-        if edges_ids[edge_id-idx][2]["edge type"] == "js result":
-            break
-        idx += 1
-        if idx > edge_id:
-            return []
-        
-    # Traverse edges to identify redundant logs
-    while True:                
-        while edge_id-idx not in edges_ids:
-                idx += 1
-        
-        try:
-            edge_data = edges_ids[edge_id-idx]
-        except:            
-            print(f"ERROR: Edge {edge_id - idx} not found")
-            for k in edges_ids:
-                if k >= edge_id-idx-20 and k <= edge_id-idx+20:
-                    print(str(edges_ids[k])[:200])
-            break
-
-        edge_value = edge_data[2].get("value")
-        if not edge_value:
-            break
-
-        try:
-            json_value = json.loads(edge_value)
-        except json.JSONDecodeError:
-            print("Error: break due to json")
-            break
-
-        if type(json_value) != type({}):
-            break
-
-        # Check for the Json Value as it indicates the logging of a call
-        if "property" not in json_value:
-            break
+    result = edge_index.result_ids.searchsorted(edge_id) - 1
+    if result < 0:
+        return []
+    position = int(edge_index.ids.searchsorted(edge_index.result_ids[result]))
 
-        breaker = True
-        
-        try:
-            property = json_value["property"].replace("[object CSS]", "CSS")
-            if property == child["method"]:
-                breaker = False
-
-            x = property + "." + json_value["event"]
-            if x == child["method"]:
-                breaker = False
-
-            x = x.replace("Window.", "")
-            if x == child["method"]:
-                breaker = False
-        except Exception as e:
-            print(f"ERROR FOR {type(json_value)} {json_value}: {e}")
-            print(child)
-            break
-
-        if breaker:
-            # print("break due to false method")
-            break
-
-        parent_method = G.nodes().get(edge_data[0], {}).get("method")
-        if parent_method != "JsonStringify":
-            break
-
-        redundant_logs.append(edge_value)
-        idx += 2
+    # Traverse edges to identify redundant logs
+    while position >= 0 and method in edge_index.log_calls.get(position, ()):
+        redundant_logs.append(edge_index.values[edge_index.value_offsets[position]])
+        # The last edge with an id at least two lower
+        position = int(edge_index.ids.searchsorted(edge_index.ids[position] - 2, side="right")) - 1
 
     return redundant_logs[1:]
 
@@ -165,15 +167,13 @@ def pg_analyzer(path: str, standard_filter: list[str]) -> dict[str, int]:
     d = defaultdict(int)
 
     try:
-        G = nx.read_graphml(path)
-    except:
-        print(f"Error parsing xml in {path}")
+        G = read_graph(path)
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
         return d
 
 
-    edges = [x for x in G.edges(data=True)]
-    edges = sorted(edges, key=lambda x:int(x[2]['id']))
-    edges_ids = {int(x[2]['id']):x for x in edges}
+    edge_index = EdgeIndex(G)
 
     def standard_filter_helper(method):
         standard = method.split(".")[0]
@@ -197,8 +197,9 @@ def pg_analyzer(path: str, standard_filter: list[str]) -> dict[str, int]:
                     method = n[1]["method"]
                     if standard_filter_helper(method):
                         d[method] += 1
-                        redundant_logs_res = pg_cleaner(G, edges_ids, int(e[2]['id']))
+                        redundant_logs_res = pg_cleaner(edge_index, int(e[2]['id']), method)
                         d[method] += len(redundant_logs_res)
+    G.close()
     return d
 
 
@@ -0,0 +1,147 @@
+# Runs a single query over many PageGraph recordings, e.g., every
+# recording in a crawl output directory, using a pool of worker processes.
+#
+# Results are written as JSON Lines, one record per recording, as soon as
+# each recording has been processed (so in completion order, not input
+# order). A recording that fails to parse or query produces a record
+# describing the failure, and doesn't stop the batch.
+
+from dataclasses import dataclass
+import glob
+import json
+from multiprocessing import Pool
+import pathlib
+import re
+import time
+import traceback
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+import pagegraph.commands
+import pagegraph.graph
+from pagegraph.graph import PageGraph
+from pagegraph.graph.store import Loader
+from pagegraph.serialize import Report, to_jsonable
+
+
+# Each returns a (list of) Report(s), given a loaded graph.
+QueryFunc = Callable[[PageGraph], Any]
+
+# Each query is run with the same defaults as the matching run.py
+# command, when given no optional arguments.
+QUERIES: dict[str, QueryFunc] = {
+    "requests": lambda pg: (
+        pagegraph.commands.requests_in_graph(pg, None)),
+    "scripts": lambda pg: (
+        pagegraph.commands.scripts_in_graph(pg, None, None, False, False)),
+    "js-calls": lambda pg: (
+        pagegraph.commands.js_calls_in_graph(pg, None, False, None, None)),
+    "subframes": lambda pg: (
+        pagegraph.commands.subframes_in_graph(pg, False)),
+    "event-listeners": lambda pg: (
+        pagegraph.commands.event_listeners_in_graph(pg)),
+}
+
+# Crawl output is written to one directory per origin, named
+# "<scheme>_<hostname>" (e.g., "https_example.org"). Replays of an origin
+# are written to subdirectories of that origin's directory.
+ORIGIN_DIR_PATTERN = re.compile(r"(https?)_(.+)")
+
+
+@dataclass
+class BatchTask:
+    query: str
+    input_path: str
+    debug: bool
+    loader: Loader
+
+
+@dataclass
+class BatchResultReport(Report):
+    origin: str | None
+    path: str
+    query: str
+    success: bool
+    elapsed: float
+    error: str | None = None
+    result: Any = None
+
+
+@dataclass
+class BatchSummaryReport(Report):
+    query: str
+    graphs: int
+    failures: int
+    elapsed: float
+
+
+def origin_for_path(input_path: pathlib.Path) -> str | None:
+    for directory in input_path.parents:
+        if match := ORIGIN_DIR_PATTERN.fullmatch(directory.name):
+            scheme, hostname = match.groups()
+            return f"{scheme}://{hostname}"
+    return None
+
+
+def graph_paths(target: str) -> list[pathlib.Path]:
+    """Returns every PageGraph recording under `target`, if it is a
+    directory, or otherwise every file matching `target` as a glob."""
+    target_path = pathlib.Path(target)
+    if target_path.is_dir():
+        return sorted(target_path.rglob("*.graphml"))
+    return sorted(pathlib.Path(x) for x in glob.glob(target, recursive=True))
+
+
+def run_task(task: BatchTask) -> BatchResultReport:
+    input_path = pathlib.Path(task.input_path)
+    origin = origin_for_path(input_path)
+    start = time.perf_counter()
+    try:
+        # Workers process many recordings, so each graph is closed as soon
+        # as its result is serialized, instead of when it is next collected.
+        pg = pagegraph.graph.from_path(task.input_path, task.debug,
+                                       task.loader)
+        try:
+            result = to_jsonable(QUERIES[task.query](pg))
+        finally:
+            pg.close()
+        return BatchResultReport(
+            origin, task.input_path, task.query, True,
+            time.perf_counter() - start, result=result)
+    except Exception as e:
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        return BatchResultReport(
+            origin, task.input_path, task.query, False,
+            time.perf_counter() - start, error=error)
+
+
+def run(query: str, targets: Iterable[str], num_workers: int | None,
+        debug: bool, loader: Loader) -> Iterator[BatchResultReport]:
+    """Yields a result for each recording matching `targets`, as each
+    finishes."""
+    if query not in QUERIES:
+        raise ValueError(f"Unknown query: {query}")
+    tasks = []
+    for target in targets:
+        for input_path in graph_paths(target):
+            tasks.append(BatchTask(query, str(input_path), debug, loader))
+    if len(tasks) == 0:
+        return
+    with Pool(num_workers) as pool:
+        yield from pool.imap_unordered(run_task, tasks)
+
+
+def write_jsonl(query: str, targets: Iterable[str],
+                num_workers: int | None, debug: bool, loader: Loader,
+                output: TextIO) -> BatchSummaryReport:
+    start = time.perf_counter()
+    num_graphs = 0
+    num_failures = 0
+    for report in run(query, targets, num_workers, debug, loader):
+        num_graphs += 1
+        if not report.success:
+            num_failures += 1
+        output.write(json.dumps(to_jsonable(report)))
+        output.write("\n")
+        output.flush()
+    return BatchSummaryReport(query, num_graphs, num_failures,
+                              time.perf_counter() - start)
@@ -0,0 +1,406 @@
+# Columnar, memory mappable cache of parsed PageGraph recordings.
+#
+# Parsing GraphML dominates the runtime of most analyses, and the same
+# recordings get re-parsed on every run. The first time a recording is
+# loaded, its nodes, edges, attributes and adjacency are written as numpy
+# arrays to a sidecar directory next to the recording
+# ("<recording>.graphml.pgcache/"). Later loads memory map those arrays,
+# and only decode the attributes of the nodes and edges a query touches.
+#
+# A cache is only used if it was built by the same cache format version,
+# from a recording with the same size and modification time. Otherwise it
+# is rebuilt.
+
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Any, Callable, Iterable, Optional, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from packaging.version import parse, Version
+
+from pagegraph.graph.store import GraphStore
+from pagegraph.graphml import BOOL_VALUES, PYTHON_TYPES
+from pagegraph.types import PageGraphNodeId, PageGraphEdgeId
+
+
+CACHE_SUFFIX = ".pgcache"
+CACHE_FORMAT_VERSION = 1
+META_FILE_NAME = "meta.json"
+
+ARRAY_NAMES = (
+    # Numeric part of the "n##" / "e##" ids, in GraphStore order.
+    "node_ids",
+    "edge_ids",
+    # Node indexes (not ids) for the incoming and outgoing node of
+    # each edge.
+    "edge_sources",
+    "edge_targets",
+    # CSR encoded attributes: the attributes of element i are the
+    # (key, value) pairs at [offsets[i], offsets[i + 1]). Keys index into
+    # the key table in the meta file, values into the string table.
+    "node_attr_offsets",
+    "node_attr_keys",
+    "node_attr_values",
+    "edge_attr_offsets",
+    "edge_attr_keys",
+    "edge_attr_values",
+    # CSR encoded adjacency: the edge indexes leaving / entering node i
+    # are at [offsets[i], offsets[i + 1]).
+    "out_offsets",
+    "out_edges",
+    "in_offsets",
+    "in_edges",
+    # Interned attribute strings, as a single UTF-8 blob.
+    "string_offsets",
+    "string_data",
+)
+
+Array = NDArray[Any]
+
+
+def decode_bool(value: str) -> bool:
+    return BOOL_VALUES[value]
+
+
+def value_type_name(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    return "string"
+
+
+def encode_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def cache_path(input_path: str) -> pathlib.Path:
+    return pathlib.Path(input_path + CACHE_SUFFIX)
+
+
+def parse_element_id(element_id: str, prefix: str) -> int:
+    """PageGraph ids are always "n##" or "e##". Anything else can't be
+    stored in the (numeric) id arrays, so the recording is not cached."""
+    if not element_id.startswith(prefix):
+        raise ValueError(f"Unexpected element id: {element_id}")
+    numeric_id = int(element_id[1:])
+    if f"{prefix}{numeric_id}" != element_id:
+        raise ValueError(f"Unexpected element id: {element_id}")
+    return numeric_id
+
+
+class ColumnarStore(GraphStore):
+    """GraphStore backed by (usually memory mapped) arrays from a cache
+    directory. Attribute dicts are decoded the first time each element
+    is asked about, and then kept."""
+
+    arrays: dict[str, Array]
+
+    __keys: list[tuple[str, Callable[[str], Any]]]
+    __node_ids: Union[list[PageGraphNodeId], None]
+    __edge_ids: Union[list[PageGraphEdgeId], None]
+    __node_index: Union[dict[PageGraphNodeId, int], None]
+    __edge_index: Union[dict[PageGraphEdgeId, int], None]
+    __node_data: dict[int, dict[str, Any]]
+    __edge_data: dict[int, dict[str, Any]]
+
+    def __init__(self, arrays: dict[str, Array], meta: dict[str, Any]):
+        self.arrays = arrays
+        self.__keys = []
+        for name, type_name in meta["keys"]:
+            if type_name == "boolean":
+                self.__keys.append((name, decode_bool))
+            else:
+                self.__keys.append((name, PYTHON_TYPES[type_name]))
+        self.__node_ids = None
+        self.__edge_ids = None
+        self.__node_index = None
+        self.__edge_index = None
+        self.__node_data = {}
+        self.__edge_data = {}
+
+    def __node_id_list(self) -> list[PageGraphNodeId]:
+        if self.__node_ids is None:
+            self.__node_ids = [
+                f"n{x}" for x in self.arrays["node_ids"].tolist()]
+        return self.__node_ids
+
+    def __edge_id_list(self) -> list[PageGraphEdgeId]:
+        if self.__edge_ids is None:
+            self.__edge_ids = [
+                f"e{x}" for x in self.arrays["edge_ids"].tolist()]
+        return self.__edge_ids
+
+    def node_index(self, node_id: PageGraphNodeId) -> int:
+        if self.__node_index is None:
+            self.__node_index = {
+                x: i for i, x in enumerate(self.__node_id_list())}
+        return self.__node_index[node_id]
+
+    def edge_index(self, edge_id: PageGraphEdgeId) -> int:
+        if self.__edge_index is None:
+            self.__edge_index = {
+                x: i for i, x in enumerate(self.__edge_id_list())}
+        return self.__edge_index[edge_id]
+
+    def __span(self, offsets_name: str, index: int) -> tuple[int, int]:
+        offsets = self.arrays[offsets_name]
+        return int(offsets[index]), int(offsets[index + 1])
+
+    def __int_list(self, name: str, indexes: Any) -> list[int]:
+        values: list[int] = self.arrays[name][indexes].tolist()
+        return values
+
+    def string(self, index: int) -> str:
+        start, end = self.__span("string_offsets", index)
+        return self.arrays["string_data"][start:end].tobytes().decode("utf8")
+
+    def __decode_attrs(self, prefix: str, index: int) -> dict[str, Any]:
+        start, end = self.__span(f"{prefix}_attr_offsets", index)
+        keys = self.__int_list(f"{prefix}_attr_keys", slice(start, end))
+        values = self.__int_list(f"{prefix}_attr_values", slice(start, end))
+        data: dict[str, Any] = {}
+        for key_index, value_index in zip(keys, values):
+            name, decoder = self.__keys[key_index]
+            data[name] = decoder(self.string(value_index))
+        return data
+
+    def __adjacent_edges(self, direction: str,
+                         node_id: PageGraphNodeId) -> list[int]:
+        index = self.node_index(node_id)
+        start, end = self.__span(f"{direction}_offsets", index)
+        return self.__int_list(f"{direction}_edges", slice(start, end))
+
+    def close(self) -> None:
+        self.arrays = {}
+        self.__node_ids = None
+        self.__edge_ids = None
+        self.__node_index = None
+        self.__edge_index = None
+        self.__node_data = {}
+        self.__edge_data = {}
+
+    def node_ids(self) -> Iterable[PageGraphNodeId]:
+        return self.__node_id_list()
+
+    def edge_ids(self) -> Iterable[PageGraphEdgeId]:
+        return self.__edge_id_list()
+
+    def node_data(self, node_id: PageGraphNodeId) -> dict[str, Any]:
+        index = self.node_index(node_id)
+        if index not in self.__node_data:
+            self.__node_data[index] = self.__decode_attrs("node", index)
+        return self.__node_data[index]
+
+    def edge_data(self, edge_id: PageGraphEdgeId) -> dict[str, Any]:
+        index = self.edge_index(edge_id)
+        if index not in self.__edge_data:
+            self.__edge_data[index] = self.__decode_attrs("edge", index)
+        return self.__edge_data[index]
+
+    def edge_endpoints(self, edge_id: PageGraphEdgeId) -> tuple[
+            PageGraphNodeId, PageGraphNodeId]:
+        index = self.edge_index(edge_id)
+        node_ids = self.__node_id_list()
+        source = int(self.arrays["edge_sources"][index])
+        target = int(self.arrays["edge_targets"][index])
+        return node_ids[source], node_ids[target]
+
+    def child_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        edges = self.__adjacent_edges("out", node_id)
+        targets = self.__int_list("edge_targets", edges)
+        node_ids = self.__node_id_list()
+        return [node_ids[x] for x in dict.fromkeys(targets)]
+
+    def parent_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        edges = self.__adjacent_edges("in", node_id)
+        sources = self.__int_list("edge_sources", edges)
+        node_ids = self.__node_id_list()
+        return [node_ids[x] for x in dict.fromkeys(sources)]
+
+    def outgoing_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        edge_ids = self.__edge_id_list()
+        return [edge_ids[x] for x in self.__adjacent_edges("out", node_id)]
+
+    def incoming_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        edge_ids = self.__edge_id_list()
+        return [edge_ids[x] for x in self.__adjacent_edges("in", node_id)]
+
+
+class Interner:
+    values: list[str]
+    __index: dict[str, int]
+
+    def __init__(self) -> None:
+        self.values = []
+        self.__index = {}
+
+    def intern(self, value: str) -> int:
+        try:
+            return self.__index[value]
+        except KeyError:
+            index = len(self.values)
+            self.__index[value] = index
+            self.values.append(value)
+            return index
+
+
+def to_csr(rows: list[list[int]], dtype: Any) -> tuple[Array, Array]:
+    lengths = np.fromiter((len(x) for x in rows), dtype=np.int64,
+                          count=len(rows))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter((x for row in rows for x in row), dtype=dtype,
+                         count=int(offsets[-1]))
+    return offsets, values
+
+
+def encode_attrs(elements: list[dict[str, Any]], keys: Interner,
+                 strings: Interner) -> tuple[Array, Array, Array]:
+    key_rows: list[list[int]] = []
+    value_rows: list[list[int]] = []
+    for data in elements:
+        key_row = []
+        value_row = []
+        for name, value in data.items():
+            key = json.dumps([name, value_type_name(value)])
+            key_row.append(keys.intern(key))
+            value_row.append(strings.intern(encode_value(value)))
+        key_rows.append(key_row)
+        value_rows.append(value_row)
+    offsets, key_array = to_csr(key_rows, np.uint16)
+    _, value_array = to_csr(value_rows, np.uint32)
+    return offsets, key_array, value_array
+
+
+def build(store: GraphStore) -> tuple[dict[str, Array], dict[str, Any]]:
+    """Encodes any GraphStore into the arrays and meta data stored in
+    a cache directory."""
+    node_ids = list(store.node_ids())
+    edge_ids = list(store.edge_ids())
+    node_index = {x: i for i, x in enumerate(node_ids)}
+    edge_index = {x: i for i, x in enumerate(edge_ids)}
+
+    arrays: dict[str, Array] = {}
+    arrays["node_ids"] = np.array(
+        [parse_element_id(x, "n") for x in node_ids], dtype=np.int64)
+    arrays["edge_ids"] = np.array(
+        [parse_element_id(x, "e") for x in edge_ids], dtype=np.int64)
+
+    node_data = [store.node_data(x) for x in node_ids]
+    edge_data = [store.edge_data(x) for x in edge_ids]
+
+    sources = np.empty(len(edge_ids), dtype=np.int32)
+    targets = np.empty(len(edge_ids), dtype=np.int32)
+    for index, edge_id in enumerate(edge_ids):
+        source_id, target_id = store.edge_endpoints(edge_id)
+        sources[index] = node_index[source_id]
+        targets[index] = node_index[target_id]
+    arrays["edge_sources"] = sources
+    arrays["edge_targets"] = targets
+
+    keys = Interner()
+    strings = Interner()
+    (arrays["node_attr_offsets"], arrays["node_attr_keys"],
+        arrays["node_attr_values"]) = encode_attrs(node_data, keys, strings)
+    (arrays["edge_attr_offsets"], arrays["edge_attr_keys"],
+        arrays["edge_attr_values"]) = encode_attrs(edge_data, keys, strings)
+
+    out_rows = [[edge_index[e] for e in store.outgoing_edge_ids(x)]
+                for x in node_ids]
+    in_rows = [[edge_index[e] for e in store.incoming_edge_ids(x)]
+               for x in node_ids]
+    arrays["out_offsets"], arrays["out_edges"] = to_csr(out_rows, np.int32)
+    arrays["in_offsets"], arrays["in_edges"] = to_csr(in_rows, np.int32)
+
+    encoded = [x.encode("utf8") for x in strings.values]
+    lengths = np.fromiter((len(x) for x in encoded), dtype=np.int64,
+                          count=len(encoded))
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=string_offsets[1:])
+    arrays["string_offsets"] = string_offsets
+    arrays["string_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    meta: dict[str, Any] = {
+        "keys": [json.loads(x) for x in keys.values],
+    }
+    return arrays, meta
+
+
+def source_stats(input_path: str) -> dict[str, int]:
+    stat = os.stat(input_path)
+    return {
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def load(input_path: str) -> Optional[tuple[ColumnarStore, Version]]:
+    """Returns the cached store and graph version for the recording,
+    or None if there is no cache, or the cache is stale or unreadable."""
+    directory = cache_path(input_path)
+    try:
+        with (directory / META_FILE_NAME).open("r") as handle:
+            meta = json.load(handle)
+        if meta.get("format") != CACHE_FORMAT_VERSION:
+            return None
+        for name, value in source_stats(input_path).items():
+            if meta.get(name) != value:
+                return None
+        arrays = {}
+        for name in ARRAY_NAMES:
+            arrays[name] = np.load(directory / f"{name}.npy", mmap_mode="r")
+        return ColumnarStore(arrays, meta), parse(meta["graph_version"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write(input_path: str, store: GraphStore,
+          graph_version: Version) -> bool:
+    """Writes the cache for the recording. Returns False (and leaves
+    no partial cache behind) if the store can't be encoded, or the
+    cache directory can't be written, e.g. on a read only file system."""
+    stats = source_stats(input_path)
+    try:
+        arrays, meta = build(store)
+    except ValueError:
+        return False
+    meta["format"] = CACHE_FORMAT_VERSION
+    meta["graph_version"] = str(graph_version)
+    meta.update(stats)
+
+    directory = cache_path(input_path)
+    temp_directory = None
+    try:
+        temp_directory = tempfile.mkdtemp(
+            prefix=directory.name + ".", suffix=".tmp",
+            dir=directory.parent)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(temp_directory, f"{name}.npy"),
+                    arrays[name])
+        # The meta file is written last, so a cache is never seen as
+        # valid unless all of its arrays were written.
+        with open(os.path.join(temp_directory, META_FILE_NAME), "w") as f:
+            json.dump(meta, f)
+        if directory.exists():
+            shutil.rmtree(directory, ignore_errors=True)
+        os.rename(temp_directory, directory)
+        temp_directory = None
+    except OSError:
+        return False
+    finally:
+        if temp_directory is not None:
+            shutil.rmtree(temp_directory, ignore_errors=True)
+    return True
@@ -2,11 +2,13 @@ from dataclasses import dataclass
 from typing import cast, Any, TYPE_CHECKING, Union
 
 import pagegraph.graph
-from pagegraph.types import PageGraphId
+from pagegraph.graph import PageGraph
+from pagegraph.graph.store import Loader
+from pagegraph.types import EventListenerId, PageGraphId
 from pagegraph.serialize import FrameReport, RequestReport, ScriptReport
 from pagegraph.serialize import DOMElementReport, JSStructureReport
 from pagegraph.serialize import JSInvokeReport, Report, RequestChainReport
-from pagegraph.serialize import NodeReport, EdgeReport
+from pagegraph.serialize import NodeReport, EdgeReport, Reportable
 from pagegraph.versions import Feature
 
 
@@ -17,9 +19,8 @@ class SubFramesCommandReport(Report):
     child_frames: list[FrameReport]
 
 
-def subframes(input_path: str, local_only: bool,
-              debug: bool) -> list[SubFramesCommandReport]:
-    pg = pagegraph.graph.from_path(input_path, debug)
+def subframes_in_graph(pg: PageGraph, local_only: bool
+                       ) -> list[SubFramesCommandReport]:
     report: list[SubFramesCommandReport] = []
 
     for iframe_node in pg.iframe_nodes():
@@ -50,15 +51,21 @@ def subframes(input_path: str, local_only: bool,
     return report
 
 
+def subframes(input_path: str, local_only: bool, debug: bool,
+              loader: Loader = Loader.CACHED
+              ) -> list[SubFramesCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return subframes_in_graph(pg, local_only)
+
+
 @dataclass
 class RequestsCommandReport(Report):
     request: RequestChainReport
     frame: FrameReport
 
 
-def requests(input_path: str, frame_nid: str | None,
-             debug: bool) -> list[RequestsCommandReport]:
-    pg = pagegraph.graph.from_path(input_path, debug)
+def requests_in_graph(pg: PageGraph, frame_nid: str | None
+                      ) -> list[RequestsCommandReport]:
     reports: list[RequestsCommandReport] = []
 
     for request_start_edge in pg.request_start_edges():
@@ -77,6 +84,13 @@ def requests(input_path: str, frame_nid: str | None,
     return reports
 
 
+def requests(input_path: str, frame_nid: str | None, debug: bool,
+             loader: Loader = Loader.CACHED
+             ) -> list[RequestsCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return requests_in_graph(pg, frame_nid)
+
+
 @dataclass
 class JSCallsCommandReport(Report):
     method: JSStructureReport
@@ -85,10 +99,9 @@ class JSCallsCommandReport(Report):
     receiver_context: FrameReport
 
 
-def js_calls(input_path: str, frame: str | None, cross_frame: bool,
-             method: str | None, pg_id: PageGraphId | None,
-             debug: bool) -> list[JSCallsCommandReport]:
-    pg = pagegraph.graph.from_path(input_path, debug)
+def js_calls_in_graph(pg: PageGraph, frame: str | None, cross_frame: bool,
+                      method: str | None, pg_id: PageGraphId | None
+                      ) -> list[JSCallsCommandReport]:
     reports: list[JSCallsCommandReport] = []
 
     js_structure_nodes = pg.js_structure_nodes()
@@ -114,16 +127,23 @@ def js_calls(input_path: str, frame: str | None, cross_frame: bool,
     return reports
 
 
+def js_calls(input_path: str, frame: str | None, cross_frame: bool,
+             method: str | None, pg_id: PageGraphId | None, debug: bool,
+             loader: Loader = Loader.CACHED
+             ) -> list[JSCallsCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return js_calls_in_graph(pg, frame, cross_frame, method, pg_id)
+
+
 @dataclass
 class ScriptsCommandReport(Report):
     script: ScriptReport
     frame: FrameReport | None = None
 
 
-def scripts(input_path: str, frame: str | None, pg_id: PageGraphId | None,
-            include_source: bool, omit_executors: bool,
-            debug: bool) -> list[ScriptsCommandReport]:
-    pg = pagegraph.graph.from_path(input_path, debug)
+def scripts_in_graph(pg: PageGraph, frame: str | None,
+                     pg_id: PageGraphId | None, include_source: bool,
+                     omit_executors: bool) -> list[ScriptsCommandReport]:
     reports: list[ScriptsCommandReport] = []
     for script_node in pg.script_nodes():
         if pg_id and script_node.pg_id() != pg_id:
@@ -143,9 +163,48 @@ def scripts(input_path: str, frame: str | None, pg_id: PageGraphId | None,
     return reports
 
 
-def element_query(input_path: str, pg_id: PageGraphId, depth: int,
-                  debug: bool) -> Union[NodeReport | EdgeReport]:
-    pg = pagegraph.graph.from_path(input_path, debug)
+def scripts(input_path: str, frame: str | None, pg_id: PageGraphId | None,
+            include_source: bool, omit_executors: bool, debug: bool,
+            loader: Loader = Loader.CACHED
+            ) -> list[ScriptsCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return scripts_in_graph(pg, frame, pg_id, include_source, omit_executors)
+
+
+@dataclass
+class EventListenersCommandReport(Report):
+    event_listener_id: EventListenerId
+    event: str
+    element: Report
+    listener: ScriptReport
+    creator: PageGraphId | None
+    inline: bool
+
+
+def event_listeners_in_graph(pg: PageGraph
+                             ) -> list[EventListenersCommandReport]:
+    reports: list[EventListenersCommandReport] = []
+    for event_listener in pg.event_listeners():
+        element_report = cast(Reportable, event_listener.element).to_report()
+        creator = event_listener.creator
+        creator_id = creator.pg_id() if creator is not None else None
+        report = EventListenersCommandReport(
+            event_listener.event_listener_id, event_listener.event,
+            element_report, event_listener.listener.to_report(), creator_id,
+            event_listener.is_inline_event_handler())
+        reports.append(report)
+    return reports
+
+
+def event_listeners(input_path: str, debug: bool,
+                    loader: Loader = Loader.CACHED
+                    ) -> list[EventListenersCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return event_listeners_in_graph(pg)
+
+
+def element_query_in_graph(pg: PageGraph, pg_id: PageGraphId,
+                           depth: int) -> Union[NodeReport | EdgeReport]:
     if pg_id.startswith("n"):
         return pg.node(pg_id).to_node_report(depth)
     elif pg_id.startswith("e"):
@@ -154,6 +213,13 @@ def element_query(input_path: str, pg_id: PageGraphId, depth: int,
         raise ValueError("Invalid element id, should be either n## or e##.")
 
 
+def element_query(input_path: str, pg_id: PageGraphId, depth: int,
+                  debug: bool, loader: Loader = Loader.CACHED
+                  ) -> Union[NodeReport | EdgeReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return element_query_in_graph(pg, pg_id, depth)
+
+
 @dataclass
 class EffectsCommandReport(Report):
     actor: Report
@@ -164,17 +230,25 @@ class EffectsCommandReport(Report):
 # a node is responsible for are
 
 
-def effects(input_path: str, pg_id: PageGraphId, loose: bool,
-            debug: bool) -> list[EffectsCommandReport]:
+def effects_in_graph(pg: PageGraph, pg_id: PageGraphId, loose: bool
+                     ) -> list[EffectsCommandReport]:
     reports: list[EffectsCommandReport] = []
     return reports
 
 
+def effects(input_path: str, pg_id: PageGraphId, loose: bool,
+            debug: bool, loader: Loader = Loader.CACHED
+            ) -> list[EffectsCommandReport]:
+    pg = pagegraph.graph.from_path(input_path, debug, loader)
+    return effects_in_graph(pg, pg_id, loose)
+
+
 @dataclass
 class ValidationReport(Report):
     success: bool
 
 
-def validate(input_path: str) -> ValidationReport:
-    pagegraph.graph.from_path(input_path, True)
+def validate(input_path: str,
+             loader: Loader = Loader.CACHED) -> ValidationReport:
+    pagegraph.graph.from_path(input_path, True, loader)
     return ValidationReport(True)
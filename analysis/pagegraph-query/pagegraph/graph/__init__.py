@@ -1,10 +1,12 @@
-from functools import lru_cache
 from itertools import chain
-from typing import Any, cast, Union, Optional, NoReturn
+from typing import Any, cast, Iterable, Union, Optional, NoReturn
 
 import networkx as NWX  # type: ignore
 from packaging.version import Version
 
+import pagegraph.cache
+from pagegraph.graphml import read_graphml
+
 from pagegraph.graph.edge import Edge, NodeInsertEdge, JSCallEdge
 from pagegraph.graph.edge import RequestStartEdge, StorageDeleteEdge
 from pagegraph.graph.edge import EventListenerEdge
@@ -16,13 +18,23 @@ from pagegraph.graph.node import ParserNode, FrameOwnerNode, ResourceNode
 from pagegraph.graph.node import TextNode, JSStructureNode
 from pagegraph.graph.requests import RequestChain, request_chain_for_edge
 from pagegraph.graph.event_listener import EventListener, event_listener_for_edge
+from pagegraph.graph.store import GraphStore, Loader, NetworkXStore
 from pagegraph.types import BlinkId, EventListenerId, NodeIterator, PageGraphId, DOMNode
 from pagegraph.types import ChildDOMNode, ParentDOMNode, EdgeIterator, FrameId
 from pagegraph.types import RequestId
 from pagegraph.versions import Feature, check_pagegraph_version
+from pagegraph.versions import check_graph_version
 from pagegraph.versions import min_version_for_feature
 
 
+DOM_NODE_TYPES = [
+    Node.Types.DOM_ROOT,
+    Node.Types.HTML_NODE,
+    Node.Types.TEXT_NODE,
+    Node.Types.FRAME_OWNER,
+]
+
+
 class PageGraph:
 
     # Instance properties
@@ -30,76 +42,208 @@ class PageGraph:
     # Tracks the version of the graph (distinct from the version of this
     # library).
     graph_version: Union[Version, None]
-    graph: NWX.MultiDiGraph
-    r_graph: NWX.MultiDiGraph
-
-    __blink_id_map: dict[BlinkId, DOMNode] = {}
-    __request_chain_map: dict[RequestId, RequestChain] = {}
-    __event_listener_map: dict[EventListenerId, EventListener] = {}
-
-    __nodes_by_type: dict[Node.Types, list[Node]] = {}
-    __edges_by_type: dict[Edge.Types, list[Edge]] = {}
-    __edge_cache: list[Edge] = []
-    __edge_id_cache: dict[PageGraphId, tuple[Any, Any]] = {}
-
-    __inserted_below_map: dict[ParentDOMNode, list[ChildDOMNode]] = {}
+    store: GraphStore
+
+    # All of the below indexes are owned by the instance, and are dropped
+    # by `close()`. Node and edge objects hold a reference back to their
+    # graph, so these are all reference cycles, and are otherwise only
+    # freed when the garbage collector next runs.
+    __node_map: dict[PageGraphId, Node]
+    __edge_map: dict[PageGraphId, Edge]
+
+    # The remaining indexes are only built the first time something needs
+    # them (and are None until then), so that queries only pay for the
+    # parts of the graph they touch.
+    __blink_id_map: Union[dict[BlinkId, DOMNode], None]
+    __request_chain_map: Union[dict[RequestId, RequestChain], None]
+    __event_listener_map: Union[dict[EventListenerId, EventListener], None]
+
+    __node_ids_by_type: Union[dict[Node.Types, list[PageGraphId]], None]
+    __edge_ids_by_type: Union[dict[Edge.Types, list[PageGraphId]], None]
+    __nodes_by_type: dict[Node.Types, list[Node]]
+    __edges_by_type: dict[Edge.Types, list[Edge]]
+    __edge_cache: list[Edge]
+
+    __inserted_below_map: Union[
+        dict[ParentDOMNode, list[ChildDOMNode]], None]
+    # Per node, the ids of the node's incoming (or outgoing) edges,
+    # grouped by edge type. Only built for nodes that are asked for
+    # their edges of a given type.
+    __incoming_edge_ids_by_type: dict[
+        PageGraphId, dict[Edge.Types, list[PageGraphId]]]
+    __outgoing_edge_ids_by_type: dict[
+        PageGraphId, dict[Edge.Types, list[PageGraphId]]]
     # Mapping from a frame id to the most recent DOM node seen for the frame
-    __frame_id_map: dict[FrameId, DOMRootNode] = {}
+    __frame_id_map: Union[dict[FrameId, DOMRootNode], None]
 
-    def __init__(self, graph: NWX.MultiDiGraph,
+    def __init__(self, store: GraphStore,
                  version: Union[Version, None] = None, debug: bool = False):
-        self.graph = graph
+        self.store = store
         self.debug = debug
         self.graph_version = version
-        self.r_graph = NWX.reverse_view(graph)
-
-        # do the below to populate the blink_id mapping dicts
-        # and the frame_id to frame node mapping (we keep the most
-        # recent version of each frame).
-        for node_type in Node.Types:
-            self.__nodes_by_type[node_type] = []
-        for edge_type in Edge.Types:
-            self.__edges_by_type[edge_type] = []
-
-        for node in self.nodes():
-            self.__nodes_by_type[node.node_type()].append(node)
-        for edge in self.edges():
-            self.__edges_by_type[edge.edge_type()].append(edge)
-
-        # Now that we've mapped the NetworkX representation of the
-        # graph into the representation defined by this library,
-        # we iterate over each node and edge again, to allow
-        # each element to take steps and operations only
-        # safe to do once we know the entire graph is hooked up.
-        for node in self.nodes():
-            if self.debug:
+        self.__reset_indexes()
+
+        # Validating the graph means looking at every node and edge,
+        # so is only done (eagerly) when debugging.
+        if self.debug:
+            for node in self.nodes():
                 node.validate()
-            node.build_caches()
-        for edge in self.edges():
-            if self.debug:
+            for edge in self.edges():
                 edge.validate()
-            edge.build_caches()
 
-        for node in self.dom_nodes():
-            if domroot_node := node.as_domroot_node():
+    def __reset_indexes(self) -> None:
+        self.__node_map = {}
+        self.__edge_map = {}
+        self.__blink_id_map = None
+        self.__request_chain_map = None
+        self.__event_listener_map = None
+        self.__node_ids_by_type = None
+        self.__edge_ids_by_type = None
+        self.__nodes_by_type = {}
+        self.__edges_by_type = {}
+        self.__edge_cache = []
+        self.__inserted_below_map = None
+        self.__incoming_edge_ids_by_type = {}
+        self.__outgoing_edge_ids_by_type = {}
+        self.__frame_id_map = None
+
+    def close(self) -> None:
+        """Drops every node, edge and index held by the graph, and
+        releases the underlying store. The graph can't be queried after
+        this is called. Long running processes that load many graphs
+        should call this when done with each, so that memory is returned
+        immediately, and not only when the garbage collector next runs."""
+        self.__reset_indexes()
+        self.store.close()
+
+    def __node_type_for_id(self, node_id: PageGraphId) -> Node.Types:
+        node_type_str = self.store.node_data(node_id)[
+            Node.RawAttrs.TYPE.value]
+        return Node.Types(node_type_str)
+
+    def __edge_type_for_id(self, edge_id: PageGraphId) -> Edge.Types:
+        edge_type_str = self.store.edge_data(edge_id)[
+            Edge.RawAttrs.TYPE.value]
+        return Edge.Types(edge_type_str)
+
+    def __node_ids_of_type(self, node_type: Node.Types) -> list[PageGraphId]:
+        # Only reads the type attribute of each node, so doesn't need to
+        # build node objects for node types no one asks about.
+        if self.__node_ids_by_type is None:
+            node_ids_by_type: dict[Node.Types, list[PageGraphId]] = {
+                x: [] for x in Node.Types}
+            for node_id in self.store.node_ids():
+                node_ids_by_type[self.__node_type_for_id(node_id)].append(
+                    node_id)
+            self.__node_ids_by_type = node_ids_by_type
+        return self.__node_ids_by_type[node_type]
+
+    def __edge_ids_of_type(self, edge_type: Edge.Types) -> list[PageGraphId]:
+        if self.__edge_ids_by_type is None:
+            edge_ids_by_type: dict[Edge.Types, list[PageGraphId]] = {
+                x: [] for x in Edge.Types}
+            for edge_id in self.store.edge_ids():
+                edge_ids_by_type[self.__edge_type_for_id(edge_id)].append(
+                    edge_id)
+            self.__edge_ids_by_type = edge_ids_by_type
+        return self.__edge_ids_by_type[edge_type]
+
+    def __group_edge_ids_by_type(
+            self, edge_ids: Iterable[PageGraphId]
+            ) -> dict[Edge.Types, list[PageGraphId]]:
+        edge_ids_by_type: dict[Edge.Types, list[PageGraphId]] = {}
+        for edge_id in edge_ids:
+            edge_type = self.__edge_type_for_id(edge_id)
+            edge_ids_by_type.setdefault(edge_type, []).append(edge_id)
+        return edge_ids_by_type
+
+    def incoming_edges_of_type(self, node_id: PageGraphId,
+                               edge_type: Edge.Types) -> list[Edge]:
+        """Returns the node's incoming edges of the given type, in the
+        same order `Node.incoming_edges()` would return them."""
+        if node_id not in self.__incoming_edge_ids_by_type:
+            self.__incoming_edge_ids_by_type[node_id] = (
+                self.__group_edge_ids_by_type(
+                    self.store.incoming_edge_ids(node_id)))
+        edge_ids = self.__incoming_edge_ids_by_type[node_id].get(
+            edge_type, [])
+        return [self.edge(edge_id) for edge_id in edge_ids]
+
+    def outgoing_edges_of_type(self, node_id: PageGraphId,
+                               edge_type: Edge.Types) -> list[Edge]:
+        """Returns the node's outgoing edges of the given type, in the
+        same order `Node.outgoing_edges()` would return them."""
+        if node_id not in self.__outgoing_edge_ids_by_type:
+            self.__outgoing_edge_ids_by_type[node_id] = (
+                self.__group_edge_ids_by_type(
+                    self.store.outgoing_edge_ids(node_id)))
+        edge_ids = self.__outgoing_edge_ids_by_type[node_id].get(
+            edge_type, [])
+        return [self.edge(edge_id) for edge_id in edge_ids]
+
+    def __get_blink_id_map(self) -> dict[BlinkId, DOMNode]:
+        if self.__blink_id_map is None:
+            # Nodes are visited in graph order, so if more than one node
+            # shares a blink id, the last one wins.
+            dom_node_types = set(DOM_NODE_TYPES)
+            blink_id_map = {}
+            for node_id in self.store.node_ids():
+                if self.__node_type_for_id(node_id) not in dom_node_types:
+                    continue
+                dom_node = self.node(node_id).as_dom_node()
+                assert dom_node is not None
+                blink_id_map[dom_node.blink_id()] = dom_node
+            self.__blink_id_map = blink_id_map
+        return self.__blink_id_map
+
+    def __get_frame_id_map(self) -> dict[FrameId, DOMRootNode]:
+        # We keep the most recent DOM root node for each frame.
+        if self.__frame_id_map is None:
+            frame_id_map: dict[FrameId, DOMRootNode] = {}
+            for domroot_node in self.domroot_nodes():
                 blink_id = domroot_node.blink_id()
-                if blink_id not in self.__frame_id_map:
-                    self.__frame_id_map[blink_id] = domroot_node
+                if blink_id not in frame_id_map:
+                    frame_id_map[blink_id] = domroot_node
                 else:
-                    current_node = self.__frame_id_map[blink_id]
+                    current_node = frame_id_map[blink_id]
                     if current_node.timestamp() < domroot_node.timestamp():
-                        self.__frame_id_map[blink_id] = domroot_node
-
-        for request_start_edge in self.request_start_edges():
-            request_id = request_start_edge.request_id()
-            self.__request_chain_map[request_id] = request_chain_for_edge(
-                request_start_edge)
-                        
-        for event_listener_edge in self.event_listener_edges():
-            event_listener_id = event_listener_edge.event_listener_id()
-            self.__event_listener_map[event_listener_id] = event_listener_for_edge(
-                event_listener_edge)
-            
+                        frame_id_map[blink_id] = domroot_node
+            self.__frame_id_map = frame_id_map
+        return self.__frame_id_map
+
+    def __get_request_chain_map(self) -> dict[RequestId, RequestChain]:
+        if self.__request_chain_map is None:
+            request_chain_map = {}
+            for request_start_edge in self.request_start_edges():
+                request_id = request_start_edge.request_id()
+                request_chain_map[request_id] = request_chain_for_edge(
+                    request_start_edge)
+            self.__request_chain_map = request_chain_map
+        return self.__request_chain_map
+
+    def __get_event_listener_map(self) -> dict[EventListenerId,
+                                               EventListener]:
+        if self.__event_listener_map is None:
+            event_listener_map = {}
+            for event_listener_edge in self.event_listener_edges():
+                event_listener_id = event_listener_edge.event_listener_id()
+                event_listener_map[event_listener_id] = (
+                    event_listener_for_edge(event_listener_edge))
+            self.__event_listener_map = event_listener_map
+        return self.__event_listener_map
+
+    def __get_inserted_below_map(self) -> dict[ParentDOMNode,
+                                               list[ChildDOMNode]]:
+        if self.__inserted_below_map is None:
+            inserted_below_map: dict[ParentDOMNode, list[ChildDOMNode]] = {}
+            for insert_edge in self.insert_edges():
+                inserted_node = insert_edge.inserted_node()
+                parent_node = insert_edge.inserted_below_node()
+                if parent_node not in inserted_below_map:
+                    inserted_below_map[parent_node] = []
+                inserted_below_map[parent_node].append(inserted_node)
+            self.__inserted_below_map = inserted_below_map
+        return self.__inserted_below_map
 
     def feature_check(self, feature: Feature) -> bool:
         if self.graph_version is None:
@@ -116,26 +260,27 @@ class PageGraph:
         return prefetched_requests
 
     def request_chain_for_id(self, request_id: RequestId) -> RequestChain:
+        request_chain_map = self.__get_request_chain_map()
         if self.debug:
-            if request_id not in self.__request_chain_map:
+            if request_id not in request_chain_map:
                 raise Exception(f"Unrecognized request id: {request_id}")
-        return self.__request_chain_map[request_id]
+        return request_chain_map[request_id]
     
     def event_listener_for_id(self, event_listener_id: EventListenerId) -> EventListener:
+        event_listener_map = self.__get_event_listener_map()
         if self.debug:
-            if event_listener_id not in self.__event_listener_map:
+            if event_listener_id not in event_listener_map:
                 raise Exception(f"Unrecognized request id: {event_listener_id}")
-        return self.__event_listener_map[event_listener_id]
+        return event_listener_map[event_listener_id]
 
     def nodes(self) -> list[Node]:
-        return [self.node(node_id) for node_id in self.graph.nodes()]
+        return [self.node(node_id) for node_id in self.store.node_ids()]
 
     def edges(self) -> EdgeIterator:
         if len(self.__edge_cache) > 0:
             return self.__edge_cache
         edges = []
-        for u, v, edge_id in self.graph.edges:
-            self.__edge_id_cache[edge_id] = (u, v)
+        for edge_id in self.store.edge_ids():
             edges.append(self.edge(edge_id))
         self.__edge_cache = edges
         return edges
@@ -169,38 +314,40 @@ class PageGraph:
         return cast(list[StorageClearEdge], edges)
 
     def node_for_blink_id(self, blink_id: BlinkId) -> DOMNode:
+        blink_id_map = self.__get_blink_id_map()
         if self.debug:
-            if blink_id not in self.__blink_id_map:
+            if blink_id not in blink_id_map:
                 raise Exception(f"blink_id not in blink_id cache: {blink_id}")
 
-        node = self.__blink_id_map[blink_id]
+        node = blink_id_map[blink_id]
         dom_node = node.as_dom_node()
         assert dom_node is not None
         return dom_node
 
     def dom_nodes(self) -> list[DOMNode]:
-        node_types = [
-            Node.Types.DOM_ROOT,
-            Node.Types.HTML_NODE,
-            Node.Types.TEXT_NODE,
-            Node.Types.FRAME_OWNER,
-        ]
         nodes = []
-        for node_type in node_types:
+        for node_type in DOM_NODE_TYPES:
             nodes += self.nodes_of_type(node_type)
         return cast(list[DOMNode], nodes)
 
     def nodes_of_type(self, node_type: Node.Types) -> list[Node]:
+        if node_type not in self.__nodes_by_type:
+            node_ids = self.__node_ids_of_type(node_type)
+            self.__nodes_by_type[node_type] = [self.node(x) for x in node_ids]
         return self.__nodes_by_type[node_type]
 
     def edges_of_type(self, edge_type: Edge.Types) -> list[Edge]:
+        if edge_type not in self.__edges_by_type:
+            edge_ids = self.__edge_ids_of_type(edge_type)
+            self.__edges_by_type[edge_type] = [self.edge(x) for x in edge_ids]
         return self.__edges_by_type[edge_type]
 
     def domroot_for_frame_id(self, frame_id: FrameId) -> DOMRootNode:
+        frame_id_map = self.__get_frame_id_map()
         if self.debug:
-            if frame_id not in self.__frame_id_map:
+            if frame_id not in frame_id_map:
                 raise Exception(f"frame_id not in __frame_id_map:{frame_id}")
-        return self.__frame_id_map[frame_id]
+        return frame_id_map[frame_id]
 
     def resource_nodes(self) -> list[ResourceNode]:
         node_iterator = self.nodes_of_type(Node.Types.RESOURCE)
@@ -240,42 +387,32 @@ class PageGraph:
             self, parent_node: ParentDOMNode) -> Optional[list[ChildDOMNode]]:
         """Returns all nodes that were ever a child of the parent node,
         at any point during the page's lifetime."""
-        if parent_node not in self.__inserted_below_map:
+        inserted_below_map = self.__get_inserted_below_map()
+        if parent_node not in inserted_below_map:
             return None
-        return self.__inserted_below_map[parent_node]
+        return inserted_below_map[parent_node]
 
-    @lru_cache(maxsize=None)
     def node(self, node_id: PageGraphId) -> Node:
         """Loading any node object should come through this method, since
         this method is the one that knows what Node or Node subtype
         should be used."""
-        node_type_str = self.graph.nodes[node_id][Node.RawAttrs.TYPE.value]
-        node_type = Node.Types(node_type_str)
+        if node := self.__node_map.get(node_id):
+            return node
+        node_type = self.__node_type_for_id(node_id)
         node = node_for_type(node_type, self, node_id)
-        if dom_node := node.as_dom_node():
-            self.__blink_id_map[dom_node.blink_id()] = dom_node
+        self.__node_map[node_id] = node
         return node
 
-    @lru_cache(maxsize=None)
     def edge(self, edge_id: PageGraphId) -> Edge:
         """Loading any edge object should come through this method, since
         this method is the one that knows what Edge or Edge subtype
         should be used."""
-        parent_id, child_id = self.__edge_id_cache[edge_id]
-        edge_key = (parent_id, child_id, edge_id)
-        edge_data = self.graph.edges[edge_key]
-        edge_type_str = edge_data[Edge.RawAttrs.TYPE.value]
-        edge_type = Edge.Types(edge_type_str)
-        init_args = [self, edge_id, parent_id, child_id]
-        edge = edge_for_type(edge_type, *init_args)
-
-        if insert_edge := edge.as_insert_edge():
-            inserted_node = insert_edge.inserted_node()
-            parent_node = insert_edge.inserted_below_node()
-
-            if parent_node not in self.__inserted_below_map:
-                self.__inserted_below_map[parent_node] = []
-            self.__inserted_below_map[parent_node].append(inserted_node)
+        if edge := self.__edge_map.get(edge_id):
+            return edge
+        parent_id, child_id = self.store.edge_endpoints(edge_id)
+        edge_type = self.__edge_type_for_id(edge_id)
+        edge = edge_for_type(edge_type, self, edge_id, parent_id, child_id)
+        self.__edge_map[edge_id] = edge
         return edge
 
     def iframe_nodes(self) -> list[FrameOwnerNode]:
@@ -293,6 +430,25 @@ class PageGraph:
         return domroot_nodes
 
 
-def from_path(input_path: str, debug: bool = False) -> PageGraph:
-    graph_version = check_pagegraph_version(input_path)
-    return PageGraph(NWX.read_graphml(input_path), graph_version, debug)
+def from_path(input_path: str, debug: bool = False,
+              loader: Loader = Loader.CACHED) -> PageGraph:
+    if loader == Loader.NETWORKX:
+        graph_version = check_pagegraph_version(input_path)
+        store: GraphStore = NetworkXStore(NWX.read_graphml(input_path))
+        return PageGraph(store, graph_version, debug)
+
+    if loader == Loader.CACHED:
+        cached = pagegraph.cache.load(input_path)
+        if cached is not None:
+            cached_store, cached_version = cached
+            graph_version = check_graph_version(cached_version)
+            return PageGraph(cached_store, graph_version, debug)
+
+    reader = read_graphml(input_path)
+    if reader.graph_version is None:
+        raise Exception("Unable to determine version of PageGraph file")
+    graph_version = check_graph_version(reader.graph_version)
+    if loader == Loader.CACHED:
+        pagegraph.cache.write(input_path, reader.store,
+                              reader.graph_version)
+    return PageGraph(reader.store, graph_version, debug)
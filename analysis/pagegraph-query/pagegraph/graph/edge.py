@@ -4,7 +4,7 @@ from json import loads, JSONDecodeError
 from typing import Any, cast, Dict, List, Optional, TypeVar, Type
 from typing import TYPE_CHECKING, Union
 
-from pagegraph.graph.element import PageGraphElement
+from pagegraph.graph.element import PageGraphElement, UNREAD
 from pagegraph.types import PageGraphNodeId, PageGraphEdgeId, Url
 from pagegraph.types import BlinkId, PageGraphEdgeKey, RequesterNode
 from pagegraph.types import ChildDOMNode, ParentDOMNode, FrameId, RequestId, EventListenerId
@@ -70,8 +70,15 @@ class Edge(PageGraphElement, ABC):
         return cls.outgoing_node_types
 
     # Used as instance properties
+    __slots__ = ("incoming_node_id", "outgoing_node_id", "_type_code",
+                 "_frame_id", "_request_id")
+
     incoming_node_id: PageGraphNodeId
     outgoing_node_id: PageGraphNodeId
+    # Index of the edge's type in EDGE_TYPES
+    _type_code: int
+    _frame_id: Union[FrameId, None]
+    _request_id: Union[RequestId, None]
 
     class Types(StrEnum):
         ATTRIBUTE_DELETE = "delete attribute"
@@ -122,6 +129,16 @@ class Edge(PageGraphElement, ABC):
         self.incoming_node_id = parent_id
         self.outgoing_node_id = child_id
         super().__init__(graph, id)
+        type_name = self.data()[self.RawAttrs.TYPE.value]
+        self._type_code = EDGE_TYPE_CODES[type_name]
+        self._frame_id = UNREAD
+        self._request_id = UNREAD
+
+    def _request_id_attr(self) -> Union[RequestId, None]:
+        if self._request_id is UNREAD:
+            self._request_id = self._int_attr(
+                self.RawAttrs.REQUEST_ID.value)
+        return self._request_id
 
     def to_edge_report(
             self, depth: int = 0,
@@ -165,11 +182,10 @@ class Edge(PageGraphElement, ABC):
         return self.pg.node(self.outgoing_node_id)
 
     def edge_type(self) -> "Edge.Types":
-        type_name = self.data()[self.RawAttrs.TYPE.value]
-        return self.Types(type_name)
+        return EDGE_TYPES[self._type_code]
 
     def is_type(self, edge_type: Types) -> bool:
-        return self.data()[self.RawAttrs.TYPE.value] == edge_type.value
+        return EDGE_TYPES[self._type_code] is edge_type
 
     def as_insert_edge(self) -> Optional["NodeInsertEdge"]:
         return None
@@ -245,7 +261,7 @@ class Edge(PageGraphElement, ABC):
         return None
 
     def data(self) -> dict[str, str]:
-        return cast(dict[str, str], self.pg.graph.edges[self.edge_key()])
+        return cast(dict[str, str], self.pg.store.edge_data(self._id))
 
     def edge_key(self) -> PageGraphEdgeKey:
         return self.incoming_node_id, self.outgoing_node_id, self._id
@@ -283,20 +299,27 @@ class Edge(PageGraphElement, ABC):
 
 class FrameIdAttributedEdge(Edge, ABC):
 
+    __slots__ = ()
+
     def domroot_for_frame_id(self) -> "DOMRootNode":
         print("Want to get frame root")
         frame_id = self.frame_id()
         return self.pg.domroot_for_frame_id(frame_id)
 
     def frame_id(self) -> FrameId:
-        if self.pg.debug:
-            if self.RawAttrs.FRAME_ID.value not in self.data():
+        if self._frame_id is UNREAD:
+            self._frame_id = self._int_attr(self.RawAttrs.FRAME_ID.value)
+        if self._frame_id is None:
+            if self.pg.debug:
                 self.throw("No frame id recorded")
-        return int(self.data()[self.RawAttrs.FRAME_ID.value])
+            raise KeyError(self.RawAttrs.FRAME_ID.value)
+        return self._frame_id
 
 
 class AttributeEdge(FrameIdAttributedEdge, ABC):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "script",  # Node.Types.SCRIPT
         "parser",  # TEMP
@@ -326,12 +349,16 @@ class AttributeEdge(FrameIdAttributedEdge, ABC):
 
 class AttributeDeleteEdge(AttributeEdge):
 
+    __slots__ = ()
+
     def as_attribute_delete_edge(self) -> Optional["AttributeDeleteEdge"]:
         return self
 
 
 class AttributeSetEdge(AttributeEdge):
 
+    __slots__ = ()
+
     def as_attribute_set_edge(self) -> Optional["AttributeSetEdge"]:
         return self
 
@@ -346,6 +373,8 @@ class AttributeSetEdge(AttributeEdge):
 
 class CrossDOMEdge(Edge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "frame owner",  # Node.Types.FRAME_OWNER
     ]
@@ -388,6 +417,8 @@ class CrossDOMEdge(Edge):
 
 class DocumentEdge(Edge):
 
+    __slots__ = ()
+
     def as_document_edge(self) -> Optional["DocumentEdge"]:
         return self
 
@@ -406,6 +437,8 @@ class DocumentEdge(Edge):
 
 class ExecuteEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "HTML element",  # Node.Types.HTML_NODE
         "DOM root",  # Node.Types.HTML_NODE
@@ -431,6 +464,8 @@ class ExecuteEdge(FrameIdAttributedEdge):
 
 class ExecuteFromAttributeEdge(ExecuteEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "HTML element",  # Node.Types.HTML_NODE
     ]
@@ -445,6 +480,8 @@ class ExecuteFromAttributeEdge(ExecuteEdge):
 
 class StructureEdge(Edge):
 
+    __slots__ = ()
+
     # Note that the correct values for edges differs depending on
     # graph version.
     incoming_node_type_names = None
@@ -474,6 +511,8 @@ class StructureEdge(Edge):
 
 class RequestStartEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "DOM root",  # Node.Types.DOM_ROOT
         "HTML element",  # Node.Types.HTML_NODE
@@ -491,7 +530,10 @@ class RequestStartEdge(FrameIdAttributedEdge):
     }
 
     def request_id(self) -> RequestId:
-        return int(self.data()[Edge.RawAttrs.REQUEST_ID.value])
+        request_id = self._request_id_attr()
+        if request_id is None:
+            self.throw("No request id recorded")
+        return request_id
 
     def as_request_start_edge(self) -> Optional["RequestStartEdge"]:
         return self
@@ -521,8 +563,13 @@ class RequestStartEdge(FrameIdAttributedEdge):
 
 class RequestResponseEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     def request_id(self) -> RequestId:
-        return int(self.data()[Edge.RawAttrs.REQUEST_ID.value])
+        request_id = self._request_id_attr()
+        if request_id is None:
+            self.throw("No request id recorded")
+        return request_id
 
     def incoming_node(self) -> "ResourceNode":
         node = super().incoming_node()
@@ -538,6 +585,8 @@ class RequestResponseEdge(FrameIdAttributedEdge):
 
 class RequestCompleteEdge(RequestResponseEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "resource",  # Node.Types.RESOURCE
     ]
@@ -574,6 +623,8 @@ class RequestCompleteEdge(RequestResponseEdge):
 
 class RequestErrorEdge(RequestResponseEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "resource",  # Node.Types.RESOURCE
     ]
@@ -602,6 +653,8 @@ class RequestErrorEdge(RequestResponseEdge):
 
 class RequestRedirectEdge(RequestResponseEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "resource",  # Node.Types.RESOURCE
     ]
@@ -625,6 +678,8 @@ class RequestRedirectEdge(RequestResponseEdge):
 
 class NodeCreateEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "parser",  # Node.Types.PARSER
         "script",  # Node.Types.SCRIPT
@@ -665,6 +720,8 @@ class NodeCreateEdge(FrameIdAttributedEdge):
 
 class NodeInsertEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "parser",  # Node.Types.PARSER
         "script",  # Node.Types.SCRIPT
@@ -712,6 +769,8 @@ class NodeInsertEdge(FrameIdAttributedEdge):
 
 
 class NodeRemoveEdge(FrameIdAttributedEdge):
+    __slots__ = ()
+
     incoming_node_type_names = [
         "script",  # Node.Types.SCRIPT
         "parser",  # TEMP
@@ -730,6 +789,8 @@ class NodeRemoveEdge(FrameIdAttributedEdge):
 
 class EventListenerEdge(Edge):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "DOM root",  # Node.Types.DOM_ROOT
         "HTML element",  # Node.Types.HTML_NODE
@@ -754,6 +815,8 @@ class EventListenerEdge(Edge):
 
 
 class EventListenerAddEdge(FrameIdAttributedEdge):
+    __slots__ = ()
+
     def as_event_listener_add_edge(self) -> Optional["EventListenerAddEdge"]:
         return self
     
@@ -762,6 +825,8 @@ class EventListenerAddEdge(FrameIdAttributedEdge):
 
 
 class EventListenerRemoveEdge(FrameIdAttributedEdge):
+    __slots__ = ()
+
     def as_event_listener_remove_edge(self) -> Optional[
             "EventListenerRemoveEdge"]:
         return self
@@ -771,12 +836,16 @@ class EventListenerRemoveEdge(FrameIdAttributedEdge):
 
 
 class StorageBucketEdge(Edge):
+    __slots__ = ()
+
     def as_storage_bucket_edge(self) -> Optional["StorageBucketEdge"]:
         return self
 
 
 class StorageCallEdge(FrameIdAttributedEdge, ABC):
 
+    __slots__ = ()
+
     incoming_node_type_names = [
         "script",  # Node.Types.SCRIPT
     ]
@@ -799,6 +868,8 @@ class StorageCallEdge(FrameIdAttributedEdge, ABC):
 
 
 class StorageReadCallEdge(StorageCallEdge):
+    __slots__ = ()
+
     def as_storage_read_call_edge(self) -> Optional["StorageReadCallEdge"]:
         return self
 
@@ -807,6 +878,8 @@ class StorageReadCallEdge(StorageCallEdge):
 
 
 class StorageReadResultEdge(FrameIdAttributedEdge):
+    __slots__ = ()
+
     def as_storage_read_result_edge(self) -> Optional["StorageReadResultEdge"]:
         return self
 
@@ -815,6 +888,8 @@ class StorageReadResultEdge(FrameIdAttributedEdge):
 
 
 class StorageSetEdge(StorageCallEdge):
+    __slots__ = ()
+
     def as_storage_set_dge(self) -> Optional["StorageSetEdge"]:
         return self
 
@@ -826,11 +901,15 @@ class StorageSetEdge(StorageCallEdge):
 
 
 class StorageClearEdge(StorageCallEdge):
+    __slots__ = ()
+
     def as_storage_clear_edge(self) -> Optional["StorageClearEdge"]:
         return self
 
 
 class StorageDeleteEdge(StorageCallEdge):
+    __slots__ = ()
+
     def as_storage_delete_edge(self) -> Optional["StorageDeleteEdge"]:
         return self
 
@@ -840,6 +919,8 @@ class StorageDeleteEdge(StorageCallEdge):
 
 class JSCallEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     def args(self) -> Any:
         args_raw = self.data()[Edge.RawAttrs.ARGS.value]
         return_result = None
@@ -867,6 +948,8 @@ class JSCallEdge(FrameIdAttributedEdge):
 
 class JSResultEdge(FrameIdAttributedEdge):
 
+    __slots__ = ()
+
     def value(self) -> Any:
         value_raw = self.data()[Edge.RawAttrs.VALUE.value]
         try:
@@ -891,8 +974,13 @@ class JSResultEdge(FrameIdAttributedEdge):
 
 
 class DeprecatedEdge(Edge):
-    pass
+    __slots__ = ()
+
 
+# Edge types are stored on each edge as their index in this tuple.
+EDGE_TYPES: tuple[Edge.Types, ...] = tuple(Edge.Types)
+EDGE_TYPE_CODES: dict[str, int] = {
+    edge_type.value: code for code, edge_type in enumerate(EDGE_TYPES)}
 
 TYPE_MAPPING: Dict[Edge.Types, Type[Edge]] = dict([
     (Edge.Types.ATTRIBUTE_DELETE, AttributeDeleteEdge),
@@ -1,13 +1,17 @@
 from abc import ABC
 from enum import Enum
 import sys
-from typing import Any, TYPE_CHECKING, Union
+from typing import Any, NoReturn, TYPE_CHECKING, Union
 
 from pagegraph.types import PageGraphId
 
 if TYPE_CHECKING:
     from pagegraph.graph import PageGraph
 
+# Value of an element's attribute field before the attribute was first
+# read (None means the element doesn't have the attribute).
+UNREAD: Any = object()
+
 class StrEnum(str, Enum):
     def _generate_next_value_(name, start, count, last_values):
         return name
@@ -24,12 +28,27 @@ class PageGraphElement(ABC):
     summary_methods: Union[dict[str, str], None] = None
 
     # Instance properties
+    #
+    # Graphs can have hundreds of thousands of elements, so elements
+    # are slotted (and so every child class must define `__slots__` too).
+    # Attributes read in hot loops are copied out of the element's raw
+    # attribute dict the first time they are read, and then kept.
+    __slots__ = ("pg", "_id", "_timestamp")
+
     pg: "PageGraph"
     _id: PageGraphId
+    _timestamp: Union[int, None]
 
     def __init__(self, graph: "PageGraph", pg_id: PageGraphId):
         self.pg = graph
         self._id = pg_id
+        self._timestamp = UNREAD
+
+    def _int_attr(self, attr: str) -> Union[int, None]:
+        value = self.data().get(attr)
+        if value is None:
+            return None
+        return int(value)
 
     def id(self) -> int:
         return int(self._id[1:])
@@ -53,15 +72,16 @@ class PageGraphElement(ABC):
         raise NotImplementedError("Child class must implement 'data'")
 
     def timestamp(self) -> int:
-        return int(self.data()[self.__class__.RawAttrs.TIMESTAMP])
+        if self._timestamp is UNREAD:
+            self._timestamp = self._int_attr(self.RawAttrs.TIMESTAMP)
+        if self._timestamp is None:
+            self.throw("No timestamp recorded")
+        return self._timestamp
 
     def describe(self) -> str:
         raise NotImplementedError("Child class must implement 'describe'")
 
-    def build_caches(self) -> None:
-        pass
-
-    def throw(self, desc: str) -> None:
+    def throw(self, desc: str) -> NoReturn:
         sys.stderr.write(self.describe())
         sys.stderr.write("\n")
         raise Exception(desc)
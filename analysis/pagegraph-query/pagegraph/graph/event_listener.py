@@ -61,11 +61,9 @@ class EventListener(Reportable):
         return False
         
     def is_inline_event_handler(self) -> bool:
-        execute_from_attribute_edges = [
-            e for e in self.listener.incoming_edges()
-            if e.edge_type() == Edge.Types.EXECUTE_FROM_ATTRIBUTE
-        ]
-        if len(execute_from_attribute_edges) == 0:
+        execute_from_attribute_edges = self.listener.incoming_edges(
+            of_type=Edge.Types.EXECUTE_FROM_ATTRIBUTE)
+        if len(list(execute_from_attribute_edges)) == 0:
             return False
         return True
 
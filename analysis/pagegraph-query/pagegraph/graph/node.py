@@ -10,7 +10,7 @@ from itertools import chain
 import sys
 from typing import Any, cast, Optional, Type, TYPE_CHECKING, Union
 
-from pagegraph.graph.element import PageGraphElement, sort_elements
+from pagegraph.graph.element import PageGraphElement, sort_elements, UNREAD
 from pagegraph.graph.edge import Edge
 from pagegraph.graph.js import JSCallResult
 from pagegraph.graph.requests import RequestResponse, RequestChain
@@ -80,30 +80,50 @@ class Node(PageGraphElement, ABC):
         TAG = "tag name"
         URL = "url"
 
+    # Instance properties
+    __slots__ = ("_type_code", "_blink_id")
+
+    # Index of the node's type in NODE_TYPES
+    _type_code: int
+    _blink_id: Union[BlinkId, None]
+
+    def __init__(self, graph: "PageGraph", pg_id: PageGraphId):
+        super().__init__(graph, pg_id)
+        type_name = self.data()[self.RawAttrs.TYPE.value]
+        self._type_code = NODE_TYPE_CODES[type_name]
+        self._blink_id = UNREAD
+
     def type_name(self) -> str:
-        return self.data()[self.RawAttrs.TYPE.value]
+        return NODE_TYPES[self._type_code].value
 
     def node_type(self) -> "Node.Types":
-        type_name = self.data()[self.RawAttrs.TYPE.value]
-        return self.Types(type_name)
+        return NODE_TYPES[self._type_code]
 
     def child_nodes(self) -> NodeIterator:
-        for nid, _ in self.pg.graph.adj[self._id].items():
+        for nid in self.pg.store.child_node_ids(self._id):
             yield self.pg.node(nid)
 
     def parent_nodes(self) -> NodeIterator:
-        for nid, _ in self.pg.r_graph.adj[self._id].items():
+        for nid in self.pg.store.parent_node_ids(self._id):
             yield self.pg.node(nid)
 
-    def outgoing_edges(self) -> EdgeIterator:
-        for _, edge_info in self.pg.graph.adj[self._id].items():
-            for edge_id, _ in edge_info.items():
-                yield self.pg.edge(edge_id)
-
-    def incoming_edges(self) -> EdgeIterator:
-        for _, edge_info in self.pg.r_graph.adj[self._id].items():
-            for edge_id, _ in edge_info.items():
-                yield self.pg.edge(edge_id)
+    def outgoing_edges(
+            self, of_type: Optional[Edge.Types] = None) -> EdgeIterator:
+        """If `of_type` is given, only edges of that type are returned
+        (found through an index, instead of checking every edge)."""
+        if of_type is not None:
+            return self.pg.outgoing_edges_of_type(self._id, of_type)
+        edge_ids = self.pg.store.outgoing_edge_ids(self._id)
+        return (self.pg.edge(edge_id) for edge_id in edge_ids)
+
+    def incoming_edges(
+            self, of_type: Optional[Edge.Types] = None) -> EdgeIterator:
+        """If `of_type` is given, only edges of that type are returned
+        (found through an index, instead of checking every edge)."""
+        if of_type is not None:
+            return self.pg.incoming_edges_of_type(self._id, of_type)
+        edge_ids = self.pg.store.incoming_edge_ids(self._id)
+        return (self.pg.edge(edge_id) for edge_id in edge_ids)
 
     def to_node_report(
             self, depth: int = 0,
@@ -142,7 +162,7 @@ class Node(PageGraphElement, ABC):
                                self.summary_fields())
 
     def is_type(self, node_type: Types) -> bool:
-        return self.data()[self.RawAttrs.TYPE.value] == node_type.value
+        return NODE_TYPES[self._type_code] is node_type
 
     def as_dom_node(self) -> Optional[DOMNode]:
         return (
@@ -256,19 +276,18 @@ class Node(PageGraphElement, ABC):
         return frame_owner_nodes
 
     def data(self) -> dict[str, str]:
-        return cast(dict[str, str], self.pg.graph.nodes[self._id])
+        return cast(dict[str, str], self.pg.store.node_data(self._id))
 
     def creation_edge(self) -> Optional["NodeCreateEdge"]:
-        for edge in self.incoming_edges():
+        for edge in self.incoming_edges(of_type=Edge.Types.NODE_CREATE):
             if create_edge := edge.as_create_edge():
                 return create_edge
         return None
 
     def created_nodes(self) -> list[Node]:
         created_nodes = []
-        for edge in self.outgoing_edges():
-            if edge.as_create_edge() is not None:
-                created_nodes.append(edge.outgoing_node())
+        for edge in self.outgoing_edges(of_type=Edge.Types.NODE_CREATE):
+            created_nodes.append(edge.outgoing_node())
         return created_nodes
 
     def executed_scripts(self) -> list[ScriptNode]:
@@ -352,6 +371,8 @@ class Node(PageGraphElement, ABC):
 
 class ScriptNode(Node, Reportable):
 
+    __slots__ = ()
+
     incoming_edge_types = [
         Edge.Types.EVENT_LISTENER,
         Edge.Types.EXECUTE,
@@ -419,7 +440,12 @@ class ScriptNode(Node, Reportable):
 
     def execute_edge(self) -> "ExecuteEdge":
         execute_edge = None
-        for edge in self.incoming_edges():
+        # A script is only executed once, so only one of these should
+        # ever be present.
+        execute_edges = chain(
+            self.incoming_edges(of_type=Edge.Types.EXECUTE),
+            self.incoming_edges(of_type=Edge.Types.EXECUTE_FROM_ATTRIBUTE))
+        for edge in execute_edges:
             if execute_edge := edge.as_execute_edge():
                 break
         if self.pg.debug:
@@ -560,15 +586,21 @@ class ScriptNode(Node, Reportable):
 
 class DOMElementNode(Node, ABC):
 
+    __slots__ = ()
+
     def blink_id(self) -> BlinkId:
-        return int(self.data()[Node.RawAttrs.BLINK_ID.value])
+        if self._blink_id is UNREAD:
+            self._blink_id = self._int_attr(self.RawAttrs.BLINK_ID.value)
+        if self._blink_id is None:
+            self.throw("No blink id recorded")
+        return self._blink_id
 
     def tag_name(self) -> str:
         raise NotImplementedError()
 
     def insertion_edges(self) -> list["NodeInsertEdge"]:
         insertion_edges: list["NodeInsertEdge"] = []
-        for edge in self.incoming_edges():
+        for edge in self.incoming_edges(of_type=Edge.Types.NODE_INSERT):
             if insert_edge := edge.as_insert_edge():
                 insertion_edges.append(insert_edge)
         return sort_elements(insertion_edges)
@@ -616,7 +648,7 @@ class DOMElementNode(Node, ABC):
 
     def creation_edge(self) -> "NodeCreateEdge":
         creation_edge = None
-        for edge in self.incoming_edges():
+        for edge in self.incoming_edges(of_type=Edge.Types.NODE_CREATE):
             if creation_edge := edge.as_create_edge():
                 break
         assert creation_edge
@@ -684,6 +716,8 @@ class DOMElementNode(Node, ABC):
 
 class HTMLNode(DOMElementNode, Reportable):
 
+    __slots__ = ()
+
     summary_methods = {
         "tag name": "tag_name"
     }
@@ -722,7 +756,9 @@ class HTMLNode(DOMElementNode, Reportable):
 
     def requests(self) -> list[RequestChain]:
         chains: list[RequestChain] = []
-        for outgoing_edge in self.outgoing_edges():
+        request_start_edges = self.outgoing_edges(
+            of_type=Edge.Types.REQUEST_START)
+        for outgoing_edge in request_start_edges:
             if request_start_edge := outgoing_edge.as_request_start_edge():
                 request_id = request_start_edge.request_id()
                 request_chain = self.pg.request_chain_for_id(request_id)
@@ -732,6 +768,8 @@ class HTMLNode(DOMElementNode, Reportable):
 
 class FrameOwnerNode(DOMElementNode, Reportable):
 
+    __slots__ = ()
+
     def as_frame_owner_node(self) -> Optional["FrameOwnerNode"]:
         return self
 
@@ -767,6 +805,8 @@ class FrameOwnerNode(DOMElementNode, Reportable):
 
 class TextNode(DOMElementNode, Reportable):
 
+    __slots__ = ()
+
     def as_text_node(self) -> Optional["TextNode"]:
         return self
 
@@ -779,6 +819,8 @@ class TextNode(DOMElementNode, Reportable):
 
 class DOMRootNode(DOMElementNode, Reportable):
 
+    __slots__ = ()
+
     def as_domroot_node(self) -> Optional["DOMRootNode"]:
         return self
 
@@ -833,7 +875,7 @@ class DOMRootNode(DOMElementNode, Reportable):
         return domroot_for_frame_owner_node
 
     def frame_id(self) -> FrameId:
-        return int(self.data()[self.RawAttrs.BLINK_ID.value])
+        return self.blink_id()
 
     def url(self) -> Url | None:
         try:
@@ -857,6 +899,8 @@ class DOMRootNode(DOMElementNode, Reportable):
 
 class ParserNode(Node):
 
+    __slots__ = ()
+
     incoming_node_types = [
         Node.Types.FRAME_OWNER,
         # The RESOURCE case is uncommon, but occurs when something is
@@ -923,10 +967,13 @@ class ResourceNode(Node):
     }
 
     # Instance properties
-    requests_map: dict[RequestId, RequestResponse]
+    __slots__ = ("requests_map",)
+
+    # Built the first time a response is looked up.
+    requests_map: Union[dict[RequestId, RequestResponse], None]
 
     def __init__(self, graph: "PageGraph", pg_id: PageGraphId):
-        self.requests_map = {}
+        self.requests_map = None
         super().__init__(graph, pg_id)
 
     def as_resource_node(self) -> Optional["ResourceNode"]:
@@ -935,12 +982,15 @@ class ResourceNode(Node):
     def url(self) -> Url:
         return self.data()[Node.RawAttrs.URL.value]
 
-    def incoming_edges(self) -> list["RequestStartEdge"]:
-        return cast(list["RequestStartEdge"], super().incoming_edges())
+    def incoming_edges(self, of_type: Optional[Edge.Types] = None
+                       ) -> list["RequestStartEdge"]:
+        return cast(list["RequestStartEdge"],
+                    super().incoming_edges(of_type))
 
-    def outgoing_edges(self) -> list["RequestResponseEdge"]:
+    def outgoing_edges(self, of_type: Optional[Edge.Types] = None
+                       ) -> list["RequestResponseEdge"]:
         outgoing_edges: list["RequestResponseEdge"] = []
-        for edge in super().outgoing_edges():
+        for edge in super().outgoing_edges(of_type):
             if request_complete_edge := edge.as_request_complete_edge():
                 outgoing_edges.append(request_complete_edge)
             elif request_redirect_edge := edge.as_request_redirect_edge():
@@ -955,7 +1005,10 @@ class ResourceNode(Node):
             requesters.append(edge.incoming_node())
         return requesters
 
-    def build_caches(self) -> None:
+    def build_requests_map(self) -> dict[RequestId, RequestResponse]:
+        if self.requests_map is not None:
+            return self.requests_map
+        self.requests_map = {}
         for incoming_edge in self.incoming_edges():
             # print(incoming_edge.describe())
             request_id = incoming_edge.request_id()
@@ -977,16 +1030,20 @@ class ResourceNode(Node):
                     # self.throw("Second response for request for resource")
                     pass
             self.requests_map[request_id].response = outgoing_edge
+        return self.requests_map
 
     def response_for_id(self,
                         request_id: RequestId) -> "RequestResponseEdge" | None:
+        requests_map = self.build_requests_map()
         if self.pg.debug:
-            if request_id not in self.requests_map:
+            if request_id not in requests_map:
                 self.throw("Unexpected request id")
-        return self.requests_map[request_id].response
+        return requests_map[request_id].response
 
 
 class JSStructureNode(Node, Reportable):
+    __slots__ = ()
+
     def to_report(self) -> JSStructureReport:
         return JSStructureReport(self.name(), self.type_name())
 
@@ -1028,14 +1085,18 @@ class JSStructureNode(Node, Reportable):
                 call_results.append(a_call_result)
         return call_results
 
-    def incoming_edges(self) -> list["JSCallEdge"]:
-        return cast(list["JSCallEdge"], super().incoming_edges())
+    def incoming_edges(self, of_type: Optional[Edge.Types] = None
+                       ) -> list["JSCallEdge"]:
+        return cast(list["JSCallEdge"], super().incoming_edges(of_type))
 
-    def outgoing_edges(self) -> list["JSResultEdge"]:
-        return cast(list["JSResultEdge"], super().outgoing_edges())
+    def outgoing_edges(self, of_type: Optional[Edge.Types] = None
+                       ) -> list["JSResultEdge"]:
+        return cast(list["JSResultEdge"], super().outgoing_edges(of_type))
 
 
 class JSBuiltInNode(JSStructureNode):
+    __slots__ = ()
+
     incoming_edge_types = [
         Edge.Types.JS_CALL
     ]
@@ -1049,6 +1110,8 @@ class JSBuiltInNode(JSStructureNode):
 
 
 class WebAPINode(JSStructureNode):
+    __slots__ = ()
+
     incoming_edge_types = [
         Edge.Types.JS_CALL
     ]
@@ -1062,6 +1125,8 @@ class WebAPINode(JSStructureNode):
 
 
 class StorageNode(Node):
+    __slots__ = ()
+
     incoming_edge_types = []
 
     outgoing_edge_types = [
@@ -1073,6 +1138,8 @@ class StorageNode(Node):
 
 
 class StorageAreaNode(Node, ABC):
+    __slots__ = ()
+
     incoming_edge_types = [
         Edge.Types.STORAGE_BUCKET,
         Edge.Types.STORAGE_CLEAR,
@@ -1095,24 +1162,36 @@ class StorageAreaNode(Node, ABC):
 
 class CookieJarNode(StorageAreaNode):
 
+    __slots__ = ()
+
     def as_cookie_jar_node(self) -> Optional["CookieJarNode"]:
         return self
 
 
 class LocalStorageNode(StorageAreaNode):
 
+    __slots__ = ()
+
     def as_local_storage_node(self) -> Optional["LocalStorageNode"]:
         return self
 
 
 class SessionStorageNode(StorageAreaNode):
 
+    __slots__ = ()
+
     def as_session_storage_node(self) -> Optional["SessionStorageNode"]:
         return self
 
 
 class DeprecatedNode(Node):
-    pass
+    __slots__ = ()
+
+
+# Node types are stored on each node as their index in this tuple.
+NODE_TYPES: tuple[Node.Types, ...] = tuple(Node.Types)
+NODE_TYPE_CODES: dict[str, int] = {
+    node_type.value: code for code, node_type in enumerate(NODE_TYPES)}
 
 
 TYPE_MAPPING: dict[Node.Types, Type[Node]] = dict([
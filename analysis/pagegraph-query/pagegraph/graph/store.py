@@ -0,0 +1,219 @@
+from abc import ABC
+from enum import Enum
+from typing import Any, Iterable
+
+import networkx as NWX  # type: ignore
+
+from pagegraph.types import PageGraphNodeId, PageGraphEdgeId
+
+
+class Loader(Enum):
+    # Memory map the columnar cache next to the recording (see
+    # `pagegraph.cache`) if there is a current one. Otherwise, load the
+    # recording with the streaming loader, and write the cache for
+    # next time.
+    CACHED = "cached"
+    # Parse the GraphML file incrementally, and build an `AdjacencyStore`
+    # directly from the stream of <node> and <edge> elements.
+    STREAMING = "streaming"
+    # Parse the GraphML file with NetworkX, and wrap the resulting
+    # `NWX.MultiDiGraph` in a `NetworkXStore`.
+    NETWORKX = "networkx"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class GraphStore(ABC):
+    """Read only view of the nodes and edges in a PageGraph recording.
+
+    `PageGraph` (and the node and edge classes) only ever read the
+    underlying graph through this interface, so that the graph can be
+    backed by different representations (e.g., a NetworkX graph, or the
+    more compact `AdjacencyStore`) without changing the query API.
+
+    Iteration order is significant, and all implementations must match
+    the order NetworkX uses for a `MultiDiGraph`: nodes in the order they
+    appear in the file, edges grouped by source node, then by target node
+    (in the order the first edge to each target appears), then in the
+    order the edges appear."""
+
+    def node_ids(self) -> Iterable[PageGraphNodeId]:
+        raise NotImplementedError()
+
+    def edge_ids(self) -> Iterable[PageGraphEdgeId]:
+        raise NotImplementedError()
+
+    def node_data(self, node_id: PageGraphNodeId) -> dict[str, Any]:
+        raise NotImplementedError()
+
+    def edge_data(self, edge_id: PageGraphEdgeId) -> dict[str, Any]:
+        raise NotImplementedError()
+
+    def edge_endpoints(self, edge_id: PageGraphEdgeId) -> tuple[
+            PageGraphNodeId, PageGraphNodeId]:
+        """Returns the (parent / incoming node, child / outgoing node)
+        ids for the given edge."""
+        raise NotImplementedError()
+
+    def child_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        raise NotImplementedError()
+
+    def parent_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        raise NotImplementedError()
+
+    def outgoing_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        raise NotImplementedError()
+
+    def incoming_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Releases any resources (e.g., memory mapped files) held by
+        the store. The store can't be read after this is called."""
+        pass
+
+
+class NetworkXStore(GraphStore):
+
+    graph: NWX.MultiDiGraph
+    r_graph: NWX.MultiDiGraph
+
+    __edge_endpoints: dict[PageGraphEdgeId,
+                           tuple[PageGraphNodeId, PageGraphNodeId]]
+
+    def __init__(self, graph: NWX.MultiDiGraph):
+        self.graph = graph
+        self.r_graph = NWX.reverse_view(graph)
+        self.__edge_endpoints = {}
+        for parent_id, child_id, edge_id in graph.edges:
+            self.__edge_endpoints[edge_id] = (parent_id, child_id)
+
+    def node_ids(self) -> Iterable[PageGraphNodeId]:
+        return self.graph.nodes()  # type: ignore
+
+    def edge_ids(self) -> Iterable[PageGraphEdgeId]:
+        return self.__edge_endpoints.keys()
+
+    def node_data(self, node_id: PageGraphNodeId) -> dict[str, Any]:
+        return self.graph.nodes[node_id]  # type: ignore
+
+    def edge_data(self, edge_id: PageGraphEdgeId) -> dict[str, Any]:
+        parent_id, child_id = self.__edge_endpoints[edge_id]
+        return self.graph.edges[parent_id, child_id, edge_id]  # type: ignore
+
+    def edge_endpoints(self, edge_id: PageGraphEdgeId) -> tuple[
+            PageGraphNodeId, PageGraphNodeId]:
+        return self.__edge_endpoints[edge_id]
+
+    def child_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        return self.graph.adj[node_id].keys()  # type: ignore
+
+    def parent_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        return self.r_graph.adj[node_id].keys()  # type: ignore
+
+    def outgoing_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        for edge_info in self.graph.adj[node_id].values():
+            yield from edge_info.keys()
+
+    def incoming_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        for edge_info in self.r_graph.adj[node_id].values():
+            yield from edge_info.keys()
+
+
+class AdjacencyStore(GraphStore):
+    """Graph representation built directly from a GraphML stream,
+    without going through NetworkX. Edge attributes are held once per
+    edge, and the adjacency maps only hold edge ids."""
+
+    __nodes: dict[PageGraphNodeId, dict[str, Any]]
+    __edges: dict[PageGraphEdgeId,
+                  tuple[PageGraphNodeId, PageGraphNodeId, dict[str, Any]]]
+    # parent node id -> child node id -> edge ids, and the reverse
+    __succ: dict[PageGraphNodeId, dict[PageGraphNodeId, list[PageGraphEdgeId]]]
+    __pred: dict[PageGraphNodeId, dict[PageGraphNodeId, list[PageGraphEdgeId]]]
+    # Node ids that were referenced by an edge before (or without) the
+    # matching <node> element being seen.
+    __pending_node_ids: list[PageGraphNodeId]
+
+    def __init__(self) -> None:
+        self.__nodes = {}
+        self.__edges = {}
+        self.__succ = {}
+        self.__pred = {}
+        self.__pending_node_ids = []
+
+    def add_node(self, node_id: PageGraphNodeId,
+                 data: dict[str, Any]) -> None:
+        if node_id in self.__nodes:
+            self.__nodes[node_id].update(data)
+        else:
+            self.__nodes[node_id] = data
+
+    def add_edge(self, edge_id: PageGraphEdgeId,
+                 parent_id: PageGraphNodeId, child_id: PageGraphNodeId,
+                 data: dict[str, Any]) -> None:
+        self.__edges[edge_id] = (parent_id, child_id, data)
+        for node_id in (parent_id, child_id):
+            if node_id not in self.__nodes:
+                self.__pending_node_ids.append(node_id)
+
+        child_map = self.__succ.setdefault(parent_id, {})
+        child_map.setdefault(child_id, []).append(edge_id)
+        parent_map = self.__pred.setdefault(child_id, {})
+        parent_map.setdefault(parent_id, []).append(edge_id)
+
+    def finalize(self) -> None:
+        """Must be called once all nodes and edges have been added.
+        NetworkX adds all <node> elements before any <edge> elements,
+        so nodes only referenced by edges come last, in the order
+        the edges referenced them."""
+        for node_id in self.__pending_node_ids:
+            if node_id not in self.__nodes:
+                self.__nodes[node_id] = {}
+        self.__pending_node_ids = []
+
+    def node_ids(self) -> Iterable[PageGraphNodeId]:
+        return self.__nodes.keys()
+
+    def edge_ids(self) -> Iterable[PageGraphEdgeId]:
+        for node_id in self.__nodes:
+            for edge_ids in self.__succ.get(node_id, {}).values():
+                yield from edge_ids
+
+    def node_data(self, node_id: PageGraphNodeId) -> dict[str, Any]:
+        return self.__nodes[node_id]
+
+    def edge_data(self, edge_id: PageGraphEdgeId) -> dict[str, Any]:
+        return self.__edges[edge_id][2]
+
+    def edge_endpoints(self, edge_id: PageGraphEdgeId) -> tuple[
+            PageGraphNodeId, PageGraphNodeId]:
+        parent_id, child_id, _ = self.__edges[edge_id]
+        return parent_id, child_id
+
+    def child_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        return self.__succ.get(node_id, {}).keys()
+
+    def parent_node_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphNodeId]:
+        return self.__pred.get(node_id, {}).keys()
+
+    def outgoing_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        for edge_ids in self.__succ.get(node_id, {}).values():
+            yield from edge_ids
+
+    def incoming_edge_ids(
+            self, node_id: PageGraphNodeId) -> Iterable[PageGraphEdgeId]:
+        for edge_ids in self.__pred.get(node_id, {}).values():
+            yield from edge_ids
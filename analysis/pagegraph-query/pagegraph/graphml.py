@@ -0,0 +1,143 @@
+# Incremental GraphML reader, that builds an `AdjacencyStore` directly
+# from the stream of <node> and <edge> elements, instead of building the
+# entire XML tree in memory and then a NetworkX graph from that.
+#
+# The attribute decoding rules match `networkx.read_graphml`, so that
+# graphs loaded either way answer every query identically.
+
+from typing import Any, Callable, Union
+from xml.parsers import expat
+
+from packaging.version import parse, Version
+
+from pagegraph.graph.store import AdjacencyStore
+
+
+# Mirrors `networkx.readwrite.graphml.GraphMLReader.python_type`.
+PYTHON_TYPES: dict[str, Callable[[str], Any]] = {
+    "int": int,
+    "integer": int,
+    "long": int,
+    "float": float,
+    "double": float,
+    "boolean": bool,
+    "string": str,
+}
+
+BOOL_VALUES = {
+    "true": True,
+    "false": False,
+    "0": False,
+    "1": True,
+}
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+class GraphMLReader:
+    store: AdjacencyStore
+    graph_version: Union[Version, None]
+
+    # GraphML key id -> (attribute name, python type)
+    __keys: dict[str, tuple[str, Callable[[str], Any]]]
+
+    __element_id: Union[str, None]
+    __edge_endpoints: Union[tuple[str, str], None]
+    __element_data: dict[str, Any]
+
+    __data_key: Union[str, None]
+    __text_parts: list[str]
+    __in_version: bool
+
+    def __init__(self) -> None:
+        self.store = AdjacencyStore()
+        self.graph_version = None
+        self.__keys = {}
+        self.__element_id = None
+        self.__edge_endpoints = None
+        self.__element_data = {}
+        self.__data_key = None
+        self.__text_parts = []
+        self.__in_version = False
+
+    def read(self, input_path: str) -> AdjacencyStore:
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.__start_element
+        parser.EndElementHandler = self.__end_element
+        parser.CharacterDataHandler = self.__character_data
+        with open(input_path, "rb") as handle:
+            while chunk := handle.read(READ_CHUNK_SIZE):
+                parser.Parse(chunk, False)
+            parser.Parse(b"", True)
+        self.store.finalize()
+        return self.store
+
+    def __start_element(self, name: str, attrs: dict[str, str]) -> None:
+        if name == "data":
+            self.__data_key = attrs["key"]
+            self.__text_parts = []
+        elif name == "node":
+            self.__element_id = attrs["id"]
+            self.__element_data = {}
+        elif name == "edge":
+            self.__element_id = attrs["id"]
+            self.__edge_endpoints = (attrs["source"], attrs["target"])
+            self.__element_data = {}
+        elif name == "key":
+            attr_name = attrs["attr.name"]
+            attr_type = attrs.get("attr.type", "string")
+            self.__keys[attrs["id"]] = (attr_name, PYTHON_TYPES[attr_type])
+        elif name == "version":
+            self.__in_version = True
+            self.__text_parts = []
+
+    def __character_data(self, text: str) -> None:
+        if self.__data_key is not None or self.__in_version:
+            self.__text_parts.append(text)
+
+    def __end_element(self, name: str) -> None:
+        if name == "data":
+            self.__end_data()
+        elif name == "node":
+            assert self.__element_id is not None
+            self.store.add_node(self.__element_id, self.__element_data)
+            self.__element_id = None
+        elif name == "edge":
+            assert self.__element_id is not None
+            assert self.__edge_endpoints is not None
+            parent_id, child_id = self.__edge_endpoints
+            self.store.add_edge(self.__element_id, parent_id, child_id,
+                                self.__element_data)
+            self.__element_id = None
+            self.__edge_endpoints = None
+        elif name == "version":
+            self.__in_version = False
+            self.graph_version = parse("".join(self.__text_parts))
+
+    def __end_data(self) -> None:
+        data_key = self.__data_key
+        self.__data_key = None
+        # Data elements outside of a node or edge describe the graph
+        # itself, which PageGraph doesn't use.
+        if data_key is None or self.__element_id is None:
+            return
+        # NetworkX skips data elements with no text at all (e.g.,
+        # "<data key='d1'/>"), but keeps empty strings otherwise.
+        if len(self.__text_parts) == 0:
+            return
+        try:
+            attr_name, attr_type = self.__keys[data_key]
+        except KeyError:
+            raise ValueError(f"Bad GraphML data: no key {data_key}")
+        text = "".join(self.__text_parts)
+        if attr_type is bool:
+            self.__element_data[attr_name] = BOOL_VALUES[text.lower()]
+        else:
+            self.__element_data[attr_name] = attr_type(text)
+
+
+def read_graphml(input_path: str) -> GraphMLReader:
+    reader = GraphMLReader()
+    reader.read(input_path)
+    return reader
@@ -109,6 +109,8 @@ class EdgeReport(ElementReport):
 
 
 class Reportable:
+    __slots__ = ()
+
     def to_report(self) -> Report:
         raise NotImplementedError()
 
@@ -0,0 +1,370 @@
+# Answers queries against PageGraph recordings that are kept loaded between
+# queries, so that interactive investigation of a graph (e.g., a series of
+# "elm", "effects", and "js-calls" queries) only pays the cost of parsing
+# the graph once.
+#
+# Queries are received as JSON over HTTP, either on a local TCP port, or on
+# a Unix socket. A query is a POST to /query, with a body like:
+#
+#   {"command": "js-calls", "input": "/path/to/graph.graphml",
+#    "args": {"method": "fetch", "cross": true}}
+#
+# where "command" is the name of a run.py command, and "args" holds that
+# command's options (named after the command's long option names, with
+# dashes replaced by underscores). The response is the same JSON the
+# run.py command would print. A GET to /stats describes the resident graphs
+# and how quickly queries have been answered.
+#
+# Loaded graphs are kept in a least-recently-used cache, bounded by a file
+# size budget: the sizes of the resident graphs' GraphML files, not the
+# memory the loaded graphs take (which depends on the loader, and grows
+# with the indexes queries build). When loading a graph pushes the cache
+# over budget, the least recently used graphs are closed and dropped,
+# though the most recently loaded graph is always kept, even if it alone
+# is over budget. A graph is reloaded if its GraphML file changes on disk.
+
+from collections import deque, OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import math
+import os
+import socketserver
+import stat
+import sys
+import time
+from typing import Any, Callable, cast, Iterable
+
+import pagegraph.commands
+import pagegraph.graph
+from pagegraph.graph import PageGraph
+from pagegraph.graph.store import Loader
+from pagegraph.serialize import Report, to_jsonable
+
+
+# Each returns a (list of) Report(s), given a loaded graph and the
+# arguments included in the query.
+QueryArgs = dict[str, Any]
+ServeQueryFunc = Callable[[PageGraph, QueryArgs], Any]
+
+# How many of the most recent query latencies are used when computing
+# latency percentiles.
+LATENCY_WINDOW = 10000
+
+
+def required_arg(args: QueryArgs, name: str) -> Any:
+    if name not in args:
+        raise ValueError(f"Missing required argument: {name}")
+    return args[name]
+
+
+QUERIES: dict[str, ServeQueryFunc] = {
+    "requests": lambda pg, args: (
+        pagegraph.commands.requests_in_graph(pg, args.get("frame"))),
+    "scripts": lambda pg, args: (
+        pagegraph.commands.scripts_in_graph(
+            pg, args.get("frame"), args.get("id"),
+            args.get("source", False), args.get("omit_executors", False))),
+    "js-calls": lambda pg, args: (
+        pagegraph.commands.js_calls_in_graph(
+            pg, args.get("frame"), args.get("cross", False),
+            args.get("method"), args.get("id"))),
+    "subframes": lambda pg, args: (
+        pagegraph.commands.subframes_in_graph(pg, args.get("local", False))),
+    "event-listeners": lambda pg, args: (
+        pagegraph.commands.event_listeners_in_graph(pg)),
+    "elm": lambda pg, args: (
+        pagegraph.commands.element_query_in_graph(
+            pg, required_arg(args, "id"), args.get("depth", 0))),
+    "effects": lambda pg, args: (
+        pagegraph.commands.effects_in_graph(
+            pg, required_arg(args, "id"), args.get("loose", False))),
+}
+
+
+@dataclass
+class ResidentGraphReport(Report):
+    path: str
+    file_bytes: int
+
+
+@dataclass
+class GraphCacheReport(Report):
+    file_budget: int
+    file_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    graphs: list[ResidentGraphReport]
+
+
+@dataclass
+class ResidentGraph:
+    graph: PageGraph
+    file_size: int
+    mtime_ns: int
+
+
+class GraphCache:
+    """Least-recently-used cache of loaded graphs, keyed by the real path
+    of each graph's GraphML file, and bounded by the total size of the
+    resident graphs' GraphML files."""
+
+    file_budget: int
+    debug: bool
+    loader: Loader
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    __graphs: OrderedDict[str, ResidentGraph]
+
+    def __init__(self, file_budget: int, debug: bool = False,
+                 loader: Loader = Loader.CACHED) -> None:
+        self.file_budget = file_budget
+        self.debug = debug
+        self.loader = loader
+        self.__graphs = OrderedDict()
+
+    def file_size(self) -> int:
+        return sum(x.file_size for x in self.__graphs.values())
+
+    def paths(self) -> list[str]:
+        """Returns the paths of the resident graphs, from least to most
+        recently used."""
+        return list(self.__graphs.keys())
+
+    def get(self, input_path: str) -> PageGraph:
+        key = os.path.realpath(input_path)
+        stat_result = os.stat(key)
+        resident = self.__graphs.get(key)
+        if resident is not None:
+            if resident.mtime_ns == stat_result.st_mtime_ns:
+                self.hits += 1
+                self.__graphs.move_to_end(key)
+                return resident.graph
+            self.__drop(key)
+
+        self.misses += 1
+        graph = pagegraph.graph.from_path(key, self.debug, self.loader)
+        self.__graphs[key] = ResidentGraph(graph, stat_result.st_size,
+                                           stat_result.st_mtime_ns)
+        while (len(self.__graphs) > 1
+               and self.file_size() > self.file_budget):
+            least_recent_key = next(iter(self.__graphs))
+            self.__drop(least_recent_key)
+            self.evictions += 1
+        return graph
+
+    def close(self) -> None:
+        for key in list(self.__graphs.keys()):
+            self.__drop(key)
+
+    def __drop(self, key: str) -> None:
+        resident = self.__graphs.pop(key)
+        resident.graph.close()
+
+    def to_report(self) -> GraphCacheReport:
+        graph_reports = [ResidentGraphReport(k, v.file_size)
+                         for k, v in self.__graphs.items()]
+        return GraphCacheReport(self.file_budget, self.file_size(), self.hits,
+                                self.misses, self.evictions, graph_reports)
+
+
+@dataclass
+class QueryStatsReport(Report):
+    queries: int
+    failures: int
+    qps: float
+    p50_ms: float | None
+    p99_ms: float | None
+    max_ms: float | None
+
+
+class QueryStats:
+    """Counts queries, and tracks the latency of the most recent ones."""
+
+    start: float
+    queries: int = 0
+    failures: int = 0
+    __latencies: deque[float]
+
+    def __init__(self, start: float | None = None) -> None:
+        self.start = start if start is not None else time.perf_counter()
+        self.__latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, elapsed: float, success: bool) -> None:
+        self.queries += 1
+        if not success:
+            self.failures += 1
+        self.__latencies.append(elapsed)
+
+    def percentile(self, percent: float) -> float | None:
+        """Returns the nearest-rank percentile of recent query latencies,
+        in seconds."""
+        if len(self.__latencies) == 0:
+            return None
+        ordered = sorted(self.__latencies)
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def to_report(self) -> QueryStatsReport:
+        uptime = time.perf_counter() - self.start
+        qps = self.queries / uptime if uptime > 0 else 0.0
+
+        def to_ms(seconds: float | None) -> float | None:
+            return seconds * 1000 if seconds is not None else None
+
+        max_latency = max(self.__latencies) if self.__latencies else None
+        return QueryStatsReport(
+            self.queries, self.failures, qps, to_ms(self.percentile(50)),
+            to_ms(self.percentile(99)), to_ms(max_latency))
+
+
+@dataclass
+class ServeStatsReport(Report):
+    uptime: float
+    cache: GraphCacheReport
+    total: QueryStatsReport
+    commands: dict[str, QueryStatsReport]
+
+
+class QueryService:
+    """Answers queries, independent of how they are received."""
+
+    cache: GraphCache
+    start: float
+    total_stats: QueryStats
+    command_stats: dict[str, QueryStats]
+
+    def __init__(self, cache: GraphCache) -> None:
+        self.cache = cache
+        self.start = time.perf_counter()
+        self.total_stats = QueryStats(self.start)
+        self.command_stats = {}
+
+    def query(self, request: Any) -> tuple[int, Any]:
+        """Returns an HTTP status code, and a JSON-able response body."""
+        start = time.perf_counter()
+        command = None
+        status = 200
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Query must be a JSON object")
+            command = required_arg(request, "command")
+            if command not in QUERIES:
+                raise ValueError(f"Unknown command: {command}")
+            input_path = required_arg(request, "input")
+            args = request.get("args", {})
+            if not isinstance(args, dict):
+                raise ValueError("Query args must be a JSON object")
+            pg = self.cache.get(input_path)
+            body = to_jsonable(QUERIES[command](pg, args))
+        except FileNotFoundError as e:
+            status, body = 404, {"error": str(e)}
+        except (ValueError, KeyError) as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        elapsed = time.perf_counter() - start
+        success = status == 200
+        self.total_stats.record(elapsed, success)
+        if isinstance(command, str) and command in QUERIES:
+            if command not in self.command_stats:
+                self.command_stats[command] = QueryStats(self.start)
+            self.command_stats[command].record(elapsed, success)
+        return status, body
+
+    def to_report(self) -> ServeStatsReport:
+        command_reports = {k: v.to_report()
+                           for k, v in self.command_stats.items()}
+        return ServeStatsReport(
+            time.perf_counter() - self.start, self.cache.to_report(),
+            self.total_stats.to_report(), command_reports)
+
+
+def handler_for(service: QueryService,
+                verbose: bool) -> type[BaseHTTPRequestHandler]:
+    class QueryRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                self.__respond(200, to_jsonable(service.to_report()))
+            else:
+                self.__respond(404, {"error": f"Unknown path: {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != "/query":
+                self.__respond(404, {"error": f"Unknown path: {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length))
+            except ValueError as e:
+                self.__respond(400, {"error": f"Invalid JSON: {e}"})
+                return
+            self.__respond(*service.query(request))
+
+        def __respond(self, status: int, body: Any) -> None:
+            encoded = json.dumps(body).encode("utf8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def address_string(self) -> str:
+            # Clients connecting over a Unix socket have no address.
+            if isinstance(self.client_address, tuple):
+                return str(self.client_address[0])
+            return "unix"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            if verbose:
+                super().log_message(format, *args)
+
+    return QueryRequestHandler
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    def server_close(self) -> None:
+        super().server_close()
+        os.unlink(cast(str, self.server_address))
+
+
+def make_server(service: QueryService, host: str, port: int,
+                socket_path: str | None,
+                verbose: bool = False) -> socketserver.BaseServer:
+    handler = handler_for(service, verbose)
+    if socket_path is None:
+        return HTTPServer((host, port), handler)
+    # Replace a socket left behind by an earlier server, but refuse to
+    # replace anything else.
+    if os.path.exists(socket_path):
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            raise ValueError(f"Not a socket: {socket_path}")
+        os.unlink(socket_path)
+    return UnixHTTPServer(socket_path, handler)
+
+
+def serve(input_paths: Iterable[str], host: str, port: int,
+          socket_path: str | None, file_budget: int, verbose: bool,
+          debug: bool, loader: Loader) -> None:
+    cache = GraphCache(file_budget, debug, loader)
+    for input_path in input_paths:
+        cache.get(input_path)
+    service = QueryService(cache)
+    server = make_server(service, host, port, socket_path, verbose)
+    if isinstance(server, HTTPServer):
+        bound_host, bound_port = server.server_address[:2]
+        address = f"http://{bound_host!s}:{bound_port}"
+    else:
+        address = str(socket_path)
+    print(f"Serving {len(cache.paths())} graph(s) on {address}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cache.close()
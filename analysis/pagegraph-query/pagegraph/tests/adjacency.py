@@ -0,0 +1,24 @@
+import unittest
+
+import pagegraph.graph
+from pagegraph.graph.edge import Edge
+import pagegraph.tests.util.paths as PG_PATHS
+
+
+class TypedAdjacencyTestCase(unittest.TestCase):
+
+    def test_matches_filtered_edges(self) -> None:
+        for graph_path in sorted(PG_PATHS.graphs().glob("*.graphml")):
+            with self.subTest(graph=graph_path.name):
+                pg = pagegraph.graph.from_path(str(graph_path))
+                for node in pg.nodes():
+                    for edge_type in Edge.Types:
+                        self.assertEqual(
+                            list(node.incoming_edges(of_type=edge_type)),
+                            [e for e in node.incoming_edges()
+                             if e.edge_type() == edge_type])
+                        self.assertEqual(
+                            list(node.outgoing_edges(of_type=edge_type)),
+                            [e for e in node.outgoing_edges()
+                             if e.edge_type() == edge_type])
+                pg.close()
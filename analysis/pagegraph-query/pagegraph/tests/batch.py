@@ -0,0 +1,75 @@
+import io
+import json
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pagegraph.batch
+from pagegraph.graph import PageGraph
+from pagegraph.graph.store import Loader
+import pagegraph.tests.util.paths as PG_PATHS
+
+
+class BatchQueryTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.crawl_dir = pathlib.Path(tempfile.mkdtemp())
+        self.graph_names = []
+        for graph_path in sorted(PG_PATHS.graphs().glob("*.graphml")):
+            origin_dir = self.crawl_dir / f"https_{graph_path.stem}.test"
+            origin_dir.mkdir()
+            shutil.copyfile(graph_path, origin_dir / graph_path.name)
+            self.graph_names.append(graph_path.stem)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.crawl_dir)
+
+    def test_results_tagged_with_origin(self) -> None:
+        output = io.StringIO()
+        summary = pagegraph.batch.write_jsonl(
+            "requests", [str(self.crawl_dir)], 2, False, Loader.STREAMING,
+            output)
+        self.assertEqual(summary.graphs, len(self.graph_names))
+        self.assertEqual(summary.failures, 0)
+
+        records = [json.loads(x) for x in output.getvalue().splitlines()]
+        origins = sorted(x["origin"] for x in records)
+        self.assertEqual(origins,
+                         sorted(f"https://{x}.test" for x in self.graph_names))
+        for record in records:
+            self.assertTrue(record["success"])
+            self.assertEqual(record["query"], "requests")
+            self.assertIn("elapsed", record)
+            self.assertIsInstance(record["result"], list)
+
+    def test_failures_do_not_abort(self) -> None:
+        broken_path = self.crawl_dir / "https_broken.test" / "broken.graphml"
+        broken_path.parent.mkdir()
+        broken_path.write_text("<graphml")
+
+        pattern = str(self.crawl_dir / "*" / "*.graphml")
+        reports = list(pagegraph.batch.run(
+            "scripts", [pattern], 2, False, Loader.STREAMING))
+        self.assertEqual(len(reports), len(self.graph_names) + 1)
+        failures = [x for x in reports if not x.success]
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0].path, str(broken_path))
+        self.assertEqual(failures[0].origin, "https://broken.test")
+        self.assertIsNotNone(failures[0].error)
+
+    def test_graphs_closed(self) -> None:
+        graph_path = next(self.crawl_dir.glob("*/*.graphml"))
+        task = pagegraph.batch.BatchTask(
+            "requests", str(graph_path), False, Loader.STREAMING)
+        with mock.patch.object(PageGraph, "close", autospec=True) as close:
+            self.assertTrue(pagegraph.batch.run_task(task).success)
+            self.assertEqual(close.call_count, 1)
+
+            # Also when the query fails.
+            with mock.patch.dict(pagegraph.batch.QUERIES,
+                                 {"requests": mock.Mock(
+                                     side_effect=ValueError("failed"))}):
+                self.assertFalse(pagegraph.batch.run_task(task).success)
+            self.assertEqual(close.call_count, 2)
@@ -0,0 +1,54 @@
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import pagegraph.cache
+from pagegraph.graphml import read_graphml
+import pagegraph.tests.util.paths as PG_PATHS
+from pagegraph.tests.util.stores import assert_stores_equal
+
+
+class ColumnarCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def copy_graph(self, graph_path: pathlib.Path) -> str:
+        copy_path = self.temp_dir / graph_path.name
+        shutil.copyfile(graph_path, copy_path)
+        return str(copy_path)
+
+    def test_matches_streaming(self) -> None:
+        for graph_path in sorted(PG_PATHS.graphs().glob("*.graphml")):
+            with self.subTest(graph=graph_path.name):
+                input_path = self.copy_graph(graph_path)
+                self.assertIsNone(pagegraph.cache.load(input_path))
+
+                reader = read_graphml(input_path)
+                expected = reader.store
+                assert reader.graph_version is not None
+                self.assertTrue(pagegraph.cache.write(
+                    input_path, expected, reader.graph_version))
+
+                cached = pagegraph.cache.load(input_path)
+                assert cached is not None
+                store, graph_version = cached
+                self.assertEqual(graph_version, reader.graph_version)
+                assert_stores_equal(self, store, expected)
+
+    def test_stale_cache_ignored(self) -> None:
+        graph_path = sorted(PG_PATHS.graphs().glob("*.graphml"))[0]
+        input_path = self.copy_graph(graph_path)
+        reader = read_graphml(input_path)
+        assert reader.graph_version is not None
+        pagegraph.cache.write(input_path, reader.store, reader.graph_version)
+        self.assertIsNotNone(pagegraph.cache.load(input_path))
+
+        stat = os.stat(input_path)
+        os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertIsNone(pagegraph.cache.load(input_path))
@@ -0,0 +1,23 @@
+import unittest
+
+import networkx as NWX
+
+from pagegraph.graph.store import NetworkXStore
+from pagegraph.graphml import read_graphml
+import pagegraph.tests.util.paths as PG_PATHS
+from pagegraph.tests.util.stores import assert_stores_equal
+from pagegraph.versions import extract_pagegraph_version
+
+
+class StreamingLoaderTestCase(unittest.TestCase):
+
+    def test_matches_networkx(self) -> None:
+        for graph_path in sorted(PG_PATHS.graphs().glob("*.graphml")):
+            with self.subTest(graph=graph_path.name):
+                reader = read_graphml(str(graph_path))
+                streamed = reader.store
+                expected = NetworkXStore(NWX.read_graphml(str(graph_path)))
+
+                self.assertEqual(reader.graph_version,
+                                 extract_pagegraph_version(str(graph_path)))
+                assert_stores_equal(self, streamed, expected)
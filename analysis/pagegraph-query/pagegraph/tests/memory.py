@@ -0,0 +1,73 @@
+import gc
+import os
+import unittest
+import weakref
+
+import pagegraph.graph
+from pagegraph.graph.store import Loader
+import pagegraph.tests.util.paths as PG_PATHS
+
+
+STATM_PATH = "/proc/self/statm"
+
+
+def rss_bytes() -> int:
+    with open(STATM_PATH, "r") as handle:
+        resident_pages = int(handle.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class GraphOwnershipTestCase(unittest.TestCase):
+    GRAPH_PATH = str(PG_PATHS.graphs() / "event_listeners.graphml")
+
+    def test_graph_is_freed(self) -> None:
+        graph = pagegraph.graph.from_path(self.GRAPH_PATH,
+                                          loader=Loader.STREAMING)
+        graph.nodes()
+        graph.edges()
+        graph_ref = weakref.ref(graph)
+        del graph
+        gc.collect()
+        self.assertIsNone(graph_ref())
+
+    def test_elements_are_slotted(self) -> None:
+        graph = pagegraph.graph.from_path(self.GRAPH_PATH,
+                                          loader=Loader.STREAMING)
+        for node in graph.nodes():
+            self.assertFalse(hasattr(node, "__dict__"), type(node))
+        for edge in graph.edges():
+            self.assertFalse(hasattr(edge, "__dict__"), type(edge))
+        graph.close()
+
+    def test_graphs_do_not_share_state(self) -> None:
+        first = pagegraph.graph.from_path(self.GRAPH_PATH,
+                                          loader=Loader.STREAMING)
+        first_listeners = len(first.event_listeners())
+        second_path = str(PG_PATHS.graphs() / "attrs_basic.graphml")
+        second = pagegraph.graph.from_path(second_path,
+                                           loader=Loader.STREAMING)
+        self.assertEqual(len(first.event_listeners()), first_listeners)
+        for dom_node in second.dom_nodes():
+            self.assertIs(
+                second.node_for_blink_id(dom_node.blink_id()).pg, second)
+        first.close()
+        second.close()
+
+    @unittest.skipUnless(os.path.exists(STATM_PATH), "needs /proc")
+    def test_rss_stays_flat(self) -> None:
+        num_loads = 100
+        # Warm up, so that one-time costs (imports, interned strings,
+        # allocator arenas) don't count as growth.
+        for _ in range(5):
+            pagegraph.graph.from_path(self.GRAPH_PATH,
+                                      loader=Loader.STREAMING).close()
+        gc.collect()
+        start_rss = rss_bytes()
+        for _ in range(num_loads):
+            graph = pagegraph.graph.from_path(self.GRAPH_PATH,
+                                              loader=Loader.STREAMING)
+            graph.js_call_edges()
+            graph.close()
+        gc.collect()
+        growth = rss_bytes() - start_rss
+        self.assertLess(growth, 8 * 1024 * 1024)
@@ -0,0 +1,111 @@
+import http.client
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pagegraph.commands
+import pagegraph.serve
+from pagegraph.graph.store import Loader
+from pagegraph.serialize import to_jsonable
+import pagegraph.tests.util.paths as PG_PATHS
+
+
+class ServeTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.graphs_dir = pathlib.Path(tempfile.mkdtemp())
+        self.graph_paths = []
+        for graph_path in sorted(PG_PATHS.graphs().glob("*.graphml")):
+            copied_path = self.graphs_dir / graph_path.name
+            shutil.copyfile(graph_path, copied_path)
+            self.graph_paths.append(str(copied_path))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.graphs_dir)
+
+    def test_lru_eviction(self) -> None:
+        first, second, third = self.graph_paths[:3]
+        file_budget = os.path.getsize(first) + os.path.getsize(second)
+        cache = pagegraph.serve.GraphCache(file_budget, False,
+                                           Loader.STREAMING)
+
+        first_graph = cache.get(first)
+        cache.get(second)
+        self.assertIs(cache.get(first), first_graph)
+        # The second graph is now the least recently used.
+        cache.get(third)
+        self.assertEqual(cache.paths(), [first, third])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 3)
+        self.assertGreaterEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.file_size(),
+                             max(file_budget, os.path.getsize(third)))
+        cache.close()
+        self.assertEqual(cache.paths(), [])
+
+    def test_changed_graph_is_reloaded(self) -> None:
+        graph_path = self.graph_paths[0]
+        cache = pagegraph.serve.GraphCache(1 << 30, False, Loader.STREAMING)
+        first_graph = cache.get(graph_path)
+        stat_result = os.stat(graph_path)
+        os.utime(graph_path, ns=(stat_result.st_atime_ns,
+                                 stat_result.st_mtime_ns + 1000))
+        self.assertIsNot(cache.get(graph_path), first_graph)
+        self.assertEqual(cache.misses, 2)
+        cache.close()
+
+    def test_http_queries(self) -> None:
+        graph_path = self.graph_paths[0]
+        cache = pagegraph.serve.GraphCache(1 << 30, False, Loader.STREAMING)
+        service = pagegraph.serve.QueryService(cache)
+        server = pagegraph.serve.make_server(service, "127.0.0.1", 0, None)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            port = server.server_address[1]
+
+            def request(method: str, path: str,
+                        body: object = None) -> tuple[int, object]:
+                conn = http.client.HTTPConnection("127.0.0.1", port)
+                encoded = json.dumps(body) if body is not None else None
+                conn.request(method, path, encoded)
+                response = conn.getresponse()
+                result = (response.status, json.loads(response.read()))
+                conn.close()
+                return result
+
+            for _ in range(2):
+                status, body = request("POST", "/query", {
+                    "command": "scripts", "input": graph_path,
+                    "args": {"omit_executors": True}})
+                self.assertEqual(status, 200)
+                expected = to_jsonable(pagegraph.commands.scripts(
+                    graph_path, None, None, False, True, False,
+                    Loader.STREAMING))
+                self.assertEqual(body, expected)
+
+            status, body = request("POST", "/query", {
+                "command": "elm", "input": graph_path})
+            self.assertEqual(status, 400)
+            status, body = request("POST", "/query", {
+                "command": "requests", "input": graph_path + ".missing"})
+            self.assertEqual(status, 404)
+
+            status, stats = request("GET", "/stats")
+            self.assertEqual(status, 200)
+            assert isinstance(stats, dict)
+            self.assertEqual(stats["total"]["queries"], 4)
+            self.assertEqual(stats["total"]["failures"], 2)
+            self.assertEqual(stats["commands"]["scripts"]["queries"], 2)
+            self.assertIsNotNone(stats["total"]["p99 ms"])
+            self.assertEqual(stats["cache"]["hits"], 2)
+            self.assertEqual(stats["cache"]["misses"], 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            cache.close()
@@ -0,0 +1,29 @@
+import unittest
+
+from pagegraph.graph.store import GraphStore
+
+
+def assert_stores_equal(test: unittest.TestCase, store: GraphStore,
+                        expected: GraphStore) -> None:
+    """Checks that two stores hold the same nodes, edges, attributes and
+    adjacency, in the same iteration order."""
+    test.assertEqual(list(store.node_ids()), list(expected.node_ids()))
+    test.assertEqual(list(store.edge_ids()), list(expected.edge_ids()))
+
+    for node_id in expected.node_ids():
+        test.assertEqual(store.node_data(node_id),
+                         expected.node_data(node_id))
+        test.assertEqual(list(store.outgoing_edge_ids(node_id)),
+                         list(expected.outgoing_edge_ids(node_id)))
+        test.assertEqual(list(store.incoming_edge_ids(node_id)),
+                         list(expected.incoming_edge_ids(node_id)))
+        test.assertEqual(list(store.child_node_ids(node_id)),
+                         list(expected.child_node_ids(node_id)))
+        test.assertEqual(list(store.parent_node_ids(node_id)),
+                         list(expected.parent_node_ids(node_id)))
+
+    for edge_id in expected.edge_ids():
+        test.assertEqual(store.edge_data(edge_id),
+                         expected.edge_data(edge_id))
+        test.assertEqual(store.edge_endpoints(edge_id),
+                         expected.edge_endpoints(edge_id))
@@ -55,6 +55,10 @@ def extract_pagegraph_version(input_path: str) -> Version:
 
 def check_pagegraph_version(input_path: str) -> Union[Version, None]:
     graph_version = extract_pagegraph_version(input_path)
+    return check_graph_version(graph_version)
+
+
+def check_graph_version(graph_version: Version) -> Union[Version, None]:
     graph_major, graph_minor, _ = graph_version.release
     min_major, min_minor, _ = MIN_GRAPH_VERSION.release
     if (graph_major < graph_major or
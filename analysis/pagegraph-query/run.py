@@ -4,42 +4,76 @@ import json
 import os
 import sys
 
+import pagegraph.batch
 import pagegraph.commands
 import pagegraph.serialize
+import pagegraph.serve
 from pagegraph import VERSION
+from pagegraph.graph.store import Loader
 
 
 def scripts_cmd(args):
     return pagegraph.commands.scripts(args.input, args.frame, args.id,
                                       args.source, args.omit_executors,
-                                      args.debug)
+                                      args.debug, args.loader)
 
 
 def effects_cmd(args):
     return pagegraph.commands.effects(args.input, args.id, args.loose,
-                                      args.debug)
+                                      args.debug, args.loader)
 
 
 def element_query_cmd(args):
     return pagegraph.commands.element_query(args.input, args.id, args.depth,
-                                            args.debug)
+                                            args.debug, args.loader)
 
 
 def js_calls_cmd(args):
     return pagegraph.commands.js_calls(args.input, args.frame, args.cross,
-                                       args.method, args.id, args.debug)
+                                       args.method, args.id, args.debug,
+                                       args.loader)
+
+
+def event_listeners_cmd(args):
+    return pagegraph.commands.event_listeners(args.input, args.debug,
+                                              args.loader)
 
 
 def request_cmd(args):
-    return pagegraph.commands.requests(args.input, args.frame, args.debug)
+    return pagegraph.commands.requests(args.input, args.frame, args.debug,
+                                       args.loader)
 
 
 def subframes_cmd(args):
-    return pagegraph.commands.subframes(args.input, args.local, args.debug)
+    return pagegraph.commands.subframes(args.input, args.local, args.debug,
+                                        args.loader)
+
+
+def batch_cmd(args):
+    if args.output is None:
+        summary = pagegraph.batch.write_jsonl(
+            args.query, args.targets, args.workers, args.debug, args.loader,
+            sys.stdout)
+    else:
+        with open(args.output, "w") as handle:
+            summary = pagegraph.batch.write_jsonl(
+                args.query, args.targets, args.workers, args.debug,
+                args.loader, handle)
+    summary_report = pagegraph.serialize.to_jsonable(summary)
+    print(json.dumps(summary_report), file=sys.stderr)
+    # Results have already been written, one line per graph.
+    return None
+
+
+def serve_cmd(args):
+    file_budget = args.file_budget * 1024 * 1024
+    pagegraph.serve.serve(args.inputs, args.host, args.port, args.socket,
+                          file_budget, args.verbose, args.debug, args.loader)
+    return None
 
 
 def validate_cmd(args):
-    return pagegraph.commands.validate(args.input)
+    return pagegraph.commands.validate(args.input, args.loader)
 
 
 PARSER = argparse.ArgumentParser(
@@ -52,6 +86,16 @@ PARSER.add_argument(
     action="version",
     version=f"%(prog)s {VERSION}")
 PARSER.add_argument("--debug", action="store_true", default=False)
+PARSER.add_argument(
+    "--loader",
+    default=Loader.CACHED,
+    type=Loader,
+    choices=list(Loader),
+    help="How to parse the PageGraph recording. 'cached' (the default) "
+         "reads the columnar cache next to the recording, and builds it "
+         "if it is missing or out of date. 'streaming' builds the graph "
+         "directly while reading the GraphML file, and 'networkx' parses "
+         "the file with NetworkX first. Neither touches the cache.")
 
 SUBPARSERS = PARSER.add_subparsers(required=True)
 
@@ -154,6 +198,15 @@ JS_CALLS_PARSER.add_argument(
          "(as described by PageGraph node ids, in the format 'n##').")
 JS_CALLS_PARSER.set_defaults(func=js_calls_cmd)
 
+EVENT_LISTENERS_PARSER = SUBPARSERS.add_parser(
+    "event-listeners",
+    help="Print information about event listeners registered during page "
+         "execution.")
+EVENT_LISTENERS_PARSER.add_argument(
+    "input",
+    help="Path to PageGraph recording.")
+EVENT_LISTENERS_PARSER.set_defaults(func=event_listeners_cmd)
+
 ELEMENT_QUERY_PARSER = SUBPARSERS.add_parser(
     "elm",
     help="Print information about a node or edge in the graph.")
@@ -212,12 +265,82 @@ EFFECTS_QUERY_PARSER.add_argument(
 
 EFFECTS_QUERY_PARSER.set_defaults(func=effects_cmd)
 
+BATCH_PARSER = SUBPARSERS.add_parser(
+    "batch",
+    help="Run a query against many PageGraph recordings, and print the "
+         "results as JSON Lines (one line per recording, tagged with the "
+         "recording's origin, along with how long the query took, and "
+         "whether it failed). A summary is printed to stderr at the end.")
+BATCH_PARSER.add_argument(
+    "query",
+    choices=list(pagegraph.batch.QUERIES.keys()),
+    help="Query to run against each recording, with default options.")
+BATCH_PARSER.add_argument(
+    "targets",
+    nargs="+",
+    help="Crawl output directories (searched recursively for .graphml "
+         "files), or glob patterns matching PageGraph recordings.")
+BATCH_PARSER.add_argument(
+    "-w", "--workers",
+    default=None,
+    type=int,
+    help="Number of worker processes. Defaults to the number of CPUs.")
+BATCH_PARSER.add_argument(
+    "-o", "--output",
+    default=None,
+    help="Write results to this file, instead of stdout.")
+BATCH_PARSER.set_defaults(func=batch_cmd)
+
+SERVE_PARSER = SUBPARSERS.add_parser(
+    "serve",
+    help="Keep PageGraph recordings loaded, and answer queries against "
+         "them over HTTP, as JSON. Queries are POSTed to /query as "
+         "{\"command\": ..., \"input\": ..., \"args\": {...}}, where "
+         "\"command\" is the name of a query command (e.g., \"elm\", "
+         "\"effects\", or \"js-calls\"), and \"args\" holds the "
+         "command's options, named after its long options. Query counts, "
+         "queries per second and latency percentiles are available with "
+         "a GET to /stats.")
+SERVE_PARSER.add_argument(
+    "inputs",
+    nargs="*",
+    help="Paths to PageGraph recordings to load at startup. Other "
+         "recordings are loaded when first queried.")
+SERVE_PARSER.add_argument(
+    "--host",
+    default="127.0.0.1",
+    help="Address to listen on. Defaults to 127.0.0.1.")
+SERVE_PARSER.add_argument(
+    "-p", "--port",
+    default=8765,
+    type=int,
+    help="Port to listen on. Defaults to 8765.")
+SERVE_PARSER.add_argument(
+    "-s", "--socket",
+    default=None,
+    help="Listen on a Unix socket at this path, instead of a TCP port.")
+SERVE_PARSER.add_argument(
+    "-b", "--file-budget",
+    default=4096,
+    type=int,
+    help="Megabytes of GraphML files whose graphs are kept loaded. This "
+         "counts the sizes of the recordings on disk, not the memory the "
+         "loaded graphs take. The least recently queried graphs are "
+         "unloaded past this. Defaults to 4096.")
+SERVE_PARSER.add_argument(
+    "-v", "--verbose",
+    default=False,
+    action="store_true",
+    help="Log each HTTP request to stderr.")
+SERVE_PARSER.set_defaults(func=serve_cmd)
+
 
 try:
     ARGS = PARSER.parse_args()
     RESULT = ARGS.func(ARGS)
-    REPORT = pagegraph.serialize.to_jsonable(RESULT)
-    print(json.dumps(REPORT))
+    if RESULT is not None:
+        REPORT = pagegraph.serialize.to_jsonable(RESULT)
+        print(json.dumps(REPORT))
 except ValueError as e:
     print(f"Invalid argument: {e}", file=sys.stderr)
     sys.exit(1)
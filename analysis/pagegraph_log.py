@@ -0,0 +1,157 @@
+"""
+Single-pass parser for the pagegraph.log of a crawl or replay.
+
+The log is read line by line and turned into events: the JSON records of the HWPG hooks,
+the traces of the event handler tests, the URLs mentioned anywhere in the log, and the
+line where the browser starts generating the page graph. Analyses subscribe to the events
+they need, and read_log caches the result per file, so that each log is read once.
+"""
+
+import re
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Type, Union
+from protocol_index import ProtocolIndex, URL_RX
+
+# Line after which the browser is generating the page graph, not running the page
+GRAPH_BOUNDARY = "calling generatePageGraph"
+# Tags of the console traces of the event handler tests
+HANDLER_TAGS = ["inline_handler", "prog_handler", "on_attr_handler"]
+# Parsed logs kept in memory per process: the crawl and both replays of an origin
+LOG_CACHE_SIZE = 3
+
+HWPG_RX = re.compile(r'INFO:CONSOLE.*\[HWPG\] (.*}).*", source')
+
+class HookRecord(NamedTuple):
+    """
+    A JSON record logged by the HWPG hooks.
+    """
+    line_no: int
+    record: Any
+    before_graph: bool
+
+class HandlerTrace(NamedTuple):
+    """
+    A console trace of an event handler test, with its tag (see HANDLER_TAGS).
+    """
+    line_no: int
+    tag: str
+    text: str
+
+class UrlMention(NamedTuple):
+    """
+    A scheme at position in the log, followed by rest (at most MAX_URL_LENGTH characters).
+    line is the line it occurs in, which starts at offset.
+    """
+    position: int
+    scheme: str
+    rest: str
+    line: str
+    offset: int
+
+class GraphBoundary(NamedTuple):
+    """
+    The line where the browser starts generating the page graph.
+    """
+    line_no: int
+
+Event = Union[HookRecord, HandlerTrace, UrlMention, GraphBoundary]
+EVENT_TYPES = frozenset([HookRecord, HandlerTrace, UrlMention, GraphBoundary])
+
+def parse_lines(lines: Iterable[str], kinds: Iterable[Type[Any]] = EVENT_TYPES) -> Iterator[Event]:
+    """
+    Turn the lines of a log into events, in the order they occur. Only the kinds of events
+    asked for are parsed.
+    """
+    kinds = set(kinds)
+    before_graph = True
+    offset = 0
+    for line_no, line in enumerate(lines):
+        text = line.rstrip("\n")
+
+        if text == GRAPH_BOUNDARY:
+            before_graph = False
+            if GraphBoundary in kinds:
+                yield GraphBoundary(line_no)
+
+        if HookRecord in kinds and "[HWPG] {" in text:
+            match = HWPG_RX.search(text)
+            # Otherwise not a logging line
+            if match:
+                try:
+                    yield HookRecord(line_no, json.loads(match[1]), before_graph)
+                except json.JSONDecodeError:
+                    print(f"ERROR: Parsing json: {text}")
+
+        if HandlerTrace in kinds and "INFO:CONSOLE" in text:
+            for tag in HANDLER_TAGS:
+                if f'"tag":"{tag}' in text:
+                    yield HandlerTrace(line_no, tag, text.strip())
+
+        if UrlMention in kinds and "://" in text:
+            for match in URL_RX.finditer(text):
+                yield UrlMention(offset + match.start(), match.group(1), match.group(2), text, offset)
+
+        offset += len(line)
+
+def dispatch(lines: Iterable[str], subscribers: Dict[Type[Any], List[Callable[[Any], None]]]) -> None:
+    """
+    Parse the lines of a log once, passing each event to the subscribers of its kind.
+    """
+    for event in parse_lines(lines, subscribers):
+        for subscriber in subscribers[type(event)]:
+            subscriber(event)
+
+class PagegraphLog:
+    """
+    What the analyses use of a pagegraph.log, collected in one pass over it.
+
+    Attributes:
+        hooks: The HWPG records logged before the page graph was generated.
+        handler_traces: The event handler traces, by tag.
+        protocols: The schemes of the URLs in the log.
+    """
+
+    def __init__(self, lines: Iterable[str], kinds: Iterable[Type[Any]] = EVENT_TYPES) -> None:
+        self.kinds = frozenset(kinds)
+        self.hooks: List[Any] = []
+        self.handler_traces: Dict[str, List[str]] = {tag: [] for tag in HANDLER_TAGS}
+        self.protocols = ProtocolIndex()
+
+        subscribers: Dict[Type[Any], List[Callable[[Any], None]]] = {
+            HookRecord: [self.on_hook],
+            HandlerTrace: [self.on_handler_trace],
+            UrlMention: [self.on_url],
+        }
+        dispatch(lines, {kind: subscribers.get(kind, []) for kind in self.kinds})
+        self.protocols.sort()
+
+    def on_hook(self, event: HookRecord) -> None:
+        if event.before_graph:
+            self.hooks.append(event.record)
+
+    def on_handler_trace(self, event: HandlerTrace) -> None:
+        self.handler_traces[event.tag].append(event.text)
+
+    def on_url(self, event: UrlMention) -> None:
+        self.protocols.add(event.scheme, event.rest, event.position, event.line, event.offset)
+
+LOG_CACHE: "OrderedDict[str, PagegraphLog]" = OrderedDict()
+
+def read_log(path: str, kinds: Iterable[Type[Any]] = EVENT_TYPES) -> PagegraphLog:
+    """
+    Parse a pagegraph.log, or return it from the cache if it was parsed for these kinds of
+    events already. Otherwise it is parsed again, for the kinds it was parsed for before too.
+    """
+    kinds = frozenset(kinds)
+    log = LOG_CACHE.get(path)
+    if log is None or not kinds <= log.kinds:
+        if log is not None:
+            kinds |= log.kinds
+        with open(path, "r", errors="ignore", newline="\n") as f:
+            log = PagegraphLog(f, kinds)
+    LOG_CACHE[path] = log
+    LOG_CACHE.move_to_end(path)
+    while len(LOG_CACHE) > LOG_CACHE_SIZE:
+        LOG_CACHE.popitem(last=False)
+    return log
@@ -0,0 +1,88 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Schemes that are voted on
+SCHEMES = ["https://", "http://"]
+# Characters of a URL kept in the index. Longer URLs are looked up in the lines they occur in.
+MAX_URL_LENGTH = 1024
+
+# Every position where a URL starts, also inside other URLs (hence the lookahead)
+URL_RX = re.compile(r"(?=(https?://)(\S{1,%d}))" % MAX_URL_LENGTH)
+
+class ProtocolIndex:
+    """
+    The schemes that the URLs in a pagegraph.log appear with, filled in one pass over the log.
+
+    For each scheme, the index keeps what follows the scheme at each of its occurrences,
+    sorted, so that the occurrences of a URL (or of longer URLs it is a prefix of, as the
+    log may have anything after a URL) are found by binary search. Results are cached per URL.
+    """
+
+    def __init__(self) -> None:
+        self.found: Dict[str, List[Tuple[str, int]]] = {scheme: [] for scheme in SCHEMES}
+        self.rests: Dict[str, List[str]] = {}
+        self.positions: Dict[str, List[int]] = {}
+        # Lines with URLs longer than MAX_URL_LENGTH, by their position in the log
+        self.long_lines: Dict[int, str] = {}
+        self.cache: Dict[str, str] = {}
+
+    def add(self, scheme: str, rest: str, position: int, line: str, offset: int) -> None:
+        """
+        Add an occurrence of a scheme, followed by rest, at position. line is the line of the
+        log it occurs in, which starts at offset.
+        """
+        self.found[scheme].append((rest, position))
+        if len(rest) == MAX_URL_LENGTH:
+            self.long_lines[offset] = line
+        self.rests.clear()
+
+    def sort(self) -> None:
+        """
+        Sort the occurrences for lookups, once all of them are added.
+        """
+        for scheme, found in self.found.items():
+            found.sort()
+            self.rests[scheme] = [rest for rest, _ in found]
+            self.positions[scheme] = [position for _, position in found]
+        self.cache.clear()
+
+    def occurrences(self, scheme: str, url_sp: str) -> Tuple[int, int]:
+        """
+        Count how often scheme + url_sp occurs in the log, and where it occurs first (-1 if not).
+        """
+        if not self.rests:
+            self.sort()
+        if len(url_sp) > MAX_URL_LENGTH:
+            url = scheme + url_sp
+            count = sum(line.count(url) for line in self.long_lines.values())
+            first = min((offset + line.find(url) for offset, line in self.long_lines.items() if url in line), default=-1)
+            return count, first
+        rests = self.rests[scheme]
+        # All rests starting with url_sp sort between url_sp and url_sp followed by the largest character
+        lo = bisect_left(rests, url_sp)
+        hi = bisect_left(rests, url_sp + "\U0010ffff", lo)
+        if lo == hi:
+            return 0, -1
+        return hi - lo, min(self.positions[scheme][lo:hi])
+
+    def resolve(self, url: str) -> str:
+        """
+        Return the URL with the scheme it appears with most often in the log.
+
+        Ties go to the scheme that appears first. Raises an IndexError if the URL is not in the log.
+        """
+        if not self.rests:
+            self.sort()
+        if url not in self.cache:
+            url_sp = url.split("://", 1)[1]
+            votes = sorted(
+                (position, scheme, count)
+                for scheme in SCHEMES
+                for count, position in [self.occurrences(scheme, url_sp)]
+                if count > 0
+            )
+            prot = Counter({scheme: count for _, scheme, count in votes}).most_common(1)[0][0]
+            self.cache[url] = prot + url_sp
+        return self.cache[url]
@@ -1,28 +1,23 @@
-from warcio.archiveiterator import ArchiveIterator
-from haralyzer import HarParser
 import datetime
 import time
 from tqdm import tqdm
 from typing import Any
 from multiprocessing import Pool
-import networkx as nx
 from adblockparser import AdblockRules
 import tldextract
 import pandas as pd
-import json
 import os
-import re
-from collections import Counter
-from utils import get_valid_directories
+from utils import get_valid_directories, find_har
+from har_reader import iter_har_entries, har_table, has_value
+from warc_records import read_records
+from pagegraph_log import read_log, UrlMention
+from graph_view import read_graph
 
 CRAWL_PATH = "/home/ubuntu/hwpg-ae/src/output/2025-01-16_103056"
 
 def protocol_majority_vote(path, url):
     # Dirty fix for temporary pg issue
-    log = open(os.path.join(path, "logs", "pagegraph.log")).read()
-    url_sp = url.split("://", 1)[1]
-    prot = Counter(re.findall(r"(https?://)" + url_sp.replace("?", r"\?"), log)).most_common(1)[0][0]
-    return prot + url_sp
+    return read_log(os.path.join(path, "logs", "pagegraph.log"), [UrlMention]).protocols.resolve(url)
 
 def run(path):
     """
@@ -39,8 +34,7 @@ def run(path):
     print(f"Processing domain: {domain}")
 
     # Define file paths
-    warc_file = f"{path}/{domain}.warc"
-    har_file = f'{path}/{domain}.har'
+    har_file = find_har(path, domain)
     graphml_file = ""
     for f in os.listdir(path):
         if f.endswith(".graphml"):
@@ -52,88 +46,46 @@ def run(path):
     pg_end_ts = pg_end_ts.replace(tzinfo=None)
 
     # === WARC File Analysis ===
-    warc_urls = list()
-    with open(warc_file, 'rb') as stream:
-        for record in ArchiveIterator(stream):
-            # PG only stores with response.
-            if record.rec_type in ['response', 'revisit']:
-                uri = record.rec_headers.get_header('WARC-Target-URI')
-                ts = record.rec_headers.get_header('WARC-Date')
-                ts_dt = datetime.datetime.fromisoformat(ts[:-1])
-                ts_dt = ts_dt.replace(tzinfo=None)
-
-                if ts_dt > pg_end_ts: continue
-                warc_urls.append(uri)
+    # The record index is built from the WARC on the first run, and read from Parquet after
+    records = read_records(path, domain)
+    # PG only stores with response.
+    records = records[records["type"].isin(['response', 'revisit']) & (records["date"] <= pg_end_ts)]
+    warc_urls = records["uri"].tolist()
 
     # === HAR File Analysis ===
-    har_urls = list()
-    har_redirects = set()
-    har_prefetch = set()
-    har_preflight = set()
-    har_csp_report = set()
-    har_websocket = set()
-
-    with open(har_file, 'r') as f:
-        har_parser = HarParser(json.loads(f.read()))
-        for e in har_parser.pages[0].entries:
-            sec_fetch_dest = [h["value"] for h in e["request"]["headers"] if h["name"] == 'Sec-Fetch-Dest']
-            sec_purpose = [h["value"] for h in e["request"]["headers"] if h["name"] == 'Sec-Purpose']
-            upgrade_req = [h["value"] for h in e["request"]["headers"] if h["name"] == 'Upgrade']
-            access_cntrl_req_meth = [h["value"] for h in e["request"]["headers"] if h["name"] == 'Access-Control-Request-Method']
-
-            additional_info = ""
-
-            if e["response"]["redirectURL"]:
-                if "document" in sec_fetch_dest:
-                    har_redirects.add(e.url)
-                    additional_info = "har_redirects"
-                    print("Redirect", e.url)
-                elif "iframe" in sec_fetch_dest:
-                    har_redirects.add(e.url)
-                    additional_info = "har_redirects_iframe"
-                    print("Iframe Redirect", e.url)
-                else:
-                    pass
-
-            if "serviceworker" in sec_fetch_dest:
-                print("serviceworker", e.url)
-                continue
-            if "report" in sec_fetch_dest:
-                print("report", e.url)
-                print("Content Type:", [h["value"] for h in e["request"]["headers"] if h["name"] == 'Content-Type'])
-                har_csp_report.add(e.url)
-                additional_info = "har_csp_report"
-                # continue
-            if "prefetch" in sec_purpose:
-                print("prefetch", e.url)
-                har_prefetch.add(e.url)
-                additional_info = "har_prefetch"
-                # continue
-            if "websocket" in upgrade_req:
-                print("websocket upgrade", e.url)
-                additional_info = "har_websocket"
-                har_websocket.add(e.url)
-
-            if len(access_cntrl_req_meth) > 0:
-                print("!!!! Pre fligth", e.url)
-                additional_info = "har_preflight"
-                har_preflight.add(e.url)
-                # continue
-
-            uri = e.url
-            ts_dt = e.startTime
-            ts_dt += datetime.timedelta(milliseconds=e.time)
-            ts_dt = ts_dt.replace(tzinfo=None)            
-            
-            if ts_dt > pg_end_ts: continue
-            har_urls.append((uri, additional_info))
+    # Entries are streamed into a table, so the HAR is never loaded as a whole
+    har = har_table(har_file, request_headers=['Sec-Fetch-Dest', 'Sec-Purpose', 'Upgrade', 'Access-Control-Request-Method'])
+    additional_info = pd.Series("", index=har.index)
+
+    document = has_value(har["sec-fetch-dest"], "document")
+    iframe = has_value(har["sec-fetch-dest"], "iframe")
+    redirect = har["redirect_url"].fillna("") != ""
+    har_redirects = set(har.loc[redirect & (document | iframe), "url"])
+    additional_info[redirect & document] = "har_redirects"
+    additional_info[redirect & iframe & ~document] = "har_redirects_iframe"
+
+    # Service workers are left out, but their redirects count
+    kept = ~has_value(har["sec-fetch-dest"], "serviceworker")
+    report = kept & has_value(har["sec-fetch-dest"], "report")
+    prefetch = kept & has_value(har["sec-purpose"], "prefetch")
+    websocket = kept & has_value(har["upgrade"], "websocket")
+    preflight = kept & har["access-control-request-method"].notna()
+    # Later classifications take precedence
+    additional_info[report] = "har_csp_report"
+    additional_info[prefetch] = "har_prefetch"
+    additional_info[websocket] = "har_websocket"
+    additional_info[preflight] = "har_preflight"
+
+    kept &= har["end"] <= pg_end_ts
+    har_urls = list(zip(har.loc[kept, "url"], additional_info[kept]))
 
     # === Pagegraph Analysis ===
     pg_urls = list()
     pg_no_cont = set()
     try:
-        G = nx.read_graphml(graphml_file) 
-    except:
+        G = read_graph(graphml_file)
+    except Exception as e:
+        print(f"Skipping {graphml_file}: {e}")
         return None
     
     edges = G.edges(data=True)
@@ -185,7 +137,8 @@ def run(path):
                 print("Add the following because added to structure:", n[1]["url"])
                 url = protocol_majority_vote(path, n[1]["url"])
                 pg_urls.append(url)
-            
+    G.close()
+
     # Merge together
     pg_urls = [u for u in pg_urls if u.startswith("http")]
     har_urls = [u for u in har_urls if "brave" not in u[0]]
@@ -255,33 +208,24 @@ def export_redirect_chains(path):
     origin = schema + "://" + domain
 
     print(domain)
-    har_file = f'{path}/{domain}.har'
+    har_file = find_har(path, domain)
 
-    with open(har_file, "r") as f:
-        har_parser = HarParser(json.loads(f.read()))
+    # The redirect of the first entry of each URL, read in one pass over the HAR
+    redirects = dict()
+    for e in iter_har_entries(har_file):
+        redirects.setdefault(e["url"], e["response"]["redirectURL"])
 
     chain = [origin]
     while True:
         redirect_url = ""
-        found = False
-        for idx, e in enumerate(har_parser.pages[0].entries):
-            if e.url == chain[-1]:
-                found = True
-                print(idx, e)
-                redirect_url = e.response.redirectURL
+        for url in [chain[-1], chain[-1] + "/"]:
+            if url in redirects:
+                print(url, redirects[url])
+                redirect_url = redirects[url]
                 if redirect_url != "":
                     chain.append(redirect_url)
                 break
         
-        if not found:
-            for idx, e in enumerate(har_parser.pages[0].entries):
-                if e.url == chain[-1] + "/":
-                    print(idx, e)
-                    redirect_url = e.response.redirectURL
-                    if redirect_url != "":
-                        chain.append(redirect_url)
-                    break
-        
         if redirect_url == "":
             break
             
@@ -293,7 +237,7 @@ def get_origin(path):
     for f in os.listdir(path):
         if f.endswith(".graphml"):
             graphml_file = f"{path}/{f}"
-    G = nx.read_graphml(graphml_file)
+    G = read_graph(graphml_file)
     
     origin = ""
     for n in G.nodes(data=True):
@@ -302,6 +246,7 @@ def get_origin(path):
                 origin = n[1]["url"]
                 break
 
+    G.close()
     return path, origin
 
 def load_tracking_list_rules(path):
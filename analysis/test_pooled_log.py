@@ -0,0 +1,160 @@
+"""
+End-to-end test of the pagegraph.log that the browser pool writes for a crawl.
+
+Runs src/browser_pool_driver.mjs with a stand-in for puppeteer, whose page logs to the
+console like the hooks do, before and while the page graph is generated. The log that
+the driver writes for the job is then parsed like the analyses do. It needs node, and
+runs from analysis/, next to the log parser it checks:
+
+    cd analysis && python -m unittest test_pooled_log
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pagegraph_log import PagegraphLog, parse_lines, GraphBoundary
+
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "browser_pool_driver.mjs")
+
+HOOK_RECORD = {"type": "log", "property": "Window", "event": "getComputedStyle"}
+HANDLER_RECORD = {"tag": "inline_handler", "addInfo": "alert(1)", "st_hash": "aGFzaA=="}
+
+# A browser whose page emits the CDP events of console calls, like Brave does
+FAKE_PUPPETEER = """
+const { EventEmitter } = require('events')
+
+function consoleCalled (client, ...args) {
+  client.emit('Runtime.consoleAPICalled', {
+    type: 'log',
+    args: args.map(value => ({ type: typeof value, value })),
+    stackTrace: { callFrames: [{ url: 'https://example.com/hooks.js', lineNumber: 41 }] }
+  })
+}
+
+function newPage () {
+  const client = new EventEmitter()
+  client.send = async (method) => {
+    if (method !== 'Page.generatePageGraph') {
+      return {}
+    }
+    consoleCalled(client, '[HWPG] ' + JSON.stringify(%(hook)s) + ' after')
+    return { data: '<graphml/>' }
+  }
+  return {
+    target: () => ({ createCDPSession: async () => client }),
+    setBypassCSP: async () => {},
+    setRequestInterception: async () => {},
+    on: () => {},
+    goto: async () => {
+      consoleCalled(client, '[HWPG] ' + JSON.stringify(%(hook)s))
+      consoleCalled(client, '[SMURF]' + JSON.stringify(%(handler)s))
+      consoleCalled(client, 'count', 2, true)
+      client.emit('Runtime.exceptionThrown', {
+        exceptionDetails: {
+          text: 'Uncaught',
+          url: 'https://example.com/',
+          lineNumber: 0,
+          exception: { description: 'TypeError: x is not a function\\n    at https://example.com/:1:1' }
+        }
+      })
+    }
+  }
+}
+
+module.exports = {
+  launch: async () => ({
+    process: () => null,
+    isConnected: () => true,
+    close: async () => {},
+    createBrowserContext: async () => ({ newPage: async () => newPage(), close: async () => {} })
+  })
+}
+""" % {"hook": json.dumps(HOOK_RECORD), "handler": json.dumps(HANDLER_RECORD)}
+
+FAKE_XVFB = """
+module.exports = class Xvfb {
+  startSync () {}
+  stopSync () {}
+  display () { return ':99' }
+}
+"""
+
+def write_module(crawl_dir, name, source):
+    module_dir = os.path.join(crawl_dir, "node_modules", name)
+    os.makedirs(module_dir)
+    with open(os.path.join(module_dir, "index.js"), "w") as f:
+        f.write(source)
+
+@unittest.skipIf(shutil.which("node") is None, "needs node")
+class PooledLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.crawl_dir = os.path.join(self.tmp, "pagegraph-crawl")
+        os.makedirs(self.crawl_dir)
+        with open(os.path.join(self.crawl_dir, "package.json"), "w") as f:
+            f.write("{}")
+        write_module(self.crawl_dir, "puppeteer-core", FAKE_PUPPETEER)
+        write_module(self.crawl_dir, "xvfb", FAKE_XVFB)
+        self.output_path = os.path.join(self.tmp, "https_example.com")
+        os.makedirs(os.path.join(self.output_path, "logs"))
+        self.log_path = os.path.join(self.output_path, "logs", "pagegraph.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def crawl(self):
+        job = {
+            "id": 1,
+            "url": "https://example.com",
+            "outputPath": self.output_path,
+            "logPath": self.log_path,
+            "proxyServer": "http://127.0.0.1:1",
+            "seconds": 0,
+            "timeout": 30,
+        }
+        p = subprocess.Popen(
+            ["node", DRIVER, "--crawl-dir", self.crawl_dir, "--brave", "brave"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        try:
+            self.assertEqual(json.loads(p.stdout.readline())["ready"], True)
+            p.stdin.write(json.dumps(job) + "\n")
+            p.stdin.flush()
+            result = json.loads(p.stdout.readline())
+        finally:
+            # The driver shuts down once its stdin is closed
+            p.stdin.close()
+            p.wait(timeout=30)
+            p.stdout.close()
+        return result
+
+    def test_log_is_parsed(self):
+        result = self.crawl()
+        self.assertTrue(result["ok"], result)
+        with open(self.log_path) as f:
+            lines = f.readlines()
+        log = PagegraphLog(lines)
+
+        # The record logged while the graph is generated is left out
+        self.assertEqual(log.hooks, [HOOK_RECORD])
+        self.assertEqual(len(log.handler_traces["inline_handler"]), 1)
+        self.assertIn('"st_hash":"aGFzaA=="', log.handler_traces["inline_handler"][0])
+        self.assertEqual(len([e for e in parse_lines(lines, [GraphBoundary])]), 1)
+        self.assertEqual(log.protocols.resolve("http://example.com/hooks.js"), "https://example.com/hooks.js")
+
+    def test_console_format(self):
+        self.crawl()
+        with open(self.log_path) as f:
+            lines = f.read().splitlines()
+        self.assertIn("calling generatePageGraph", lines)
+        self.assertRegex([line for line in lines if "count 2 true" in line][0],
+                         r'^\[\d{4}/\d{6}\.\d{6}:INFO:CONSOLE\(42\)\] "count 2 true", source: https://example.com/hooks.js \(42\)$')
+        self.assertTrue(any(line.endswith(':INFO:CONSOLE(1)] "Uncaught TypeError: x is not a function", source: https://example.com/ (1)')
+                            for line in lines))
+
+if __name__ == "__main__":
+    unittest.main()
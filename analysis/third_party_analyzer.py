@@ -1,5 +1,4 @@
 import logging
-import networkx as nx
 import math
 import hashlib
 import base64
@@ -8,6 +7,7 @@ import multiprocessing
 from collections import defaultdict
 from tqdm import tqdm
 import pickle
+from graph_view import read_graph
 
 logging.basicConfig(level=logging.INFO)
 
@@ -20,7 +20,7 @@ class Third_Party_Analyser:
     def __init__(self, graphml_file: str, origin: str) -> None:
         """The init method requires the path to the graphml file and the crawled origin."""
 
-        self.G = nx.read_graphml(graphml_file)
+        self.G = read_graph(graphml_file)
         self.origin = origin
         self.graphml_file = graphml_file
         self.resource_dictionary: dict[str, list[str]] = defaultdict(list)
@@ -234,6 +234,7 @@ def run_analysis(path):
         print(path)
         tpa = Third_Party_Analyser(graphml_file, "ORIGIN")
         p_node_types = tpa.find_resource(search)
+        tpa.G.close()
         res[path] = p_node_types
     except Exception as e:
         res[path] = [("ERROR", e, None)]
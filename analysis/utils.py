@@ -2,6 +2,41 @@ import os
 import shutil
 from typing import Any, List, Dict
 
+# Extensions of WARC files, compressed (a gzip member per record) or not.
+WARC_EXTENSIONS = [".warc.gz", ".warc"]
+# Extensions of HAR files, compressed (zlib) or not.
+HAR_EXTENSIONS = [".zhar", ".har"]
+
+def has_file_type(entry: str, file_type: str) -> bool:
+    """
+    Check whether a file is of a type. Compressed WARCs (.warc.gz) count as .warc,
+    compressed HARs (.zhar) as .har.
+    """
+    extensions = {".warc": WARC_EXTENSIONS, ".har": HAR_EXTENSIONS}.get(file_type, [file_type])
+    return any(entry.endswith(extension) for extension in extensions)
+
+def find_file(path: str, domain: str, extensions: List[str]) -> str:
+    """
+    Get the path of a file of an origin directory, compressed or not.
+    """
+    for extension in extensions:
+        file = os.path.join(path, domain + extension)
+        if os.path.exists(file):
+            return file
+    return os.path.join(path, domain + extensions[-1])
+
+def find_warc(path: str, domain: str) -> str:
+    """
+    Get the path of the WARC file of an origin directory, compressed or not.
+    """
+    return find_file(path, domain, WARC_EXTENSIONS)
+
+def find_har(path: str, domain: str) -> str:
+    """
+    Get the path of the HAR file of an origin directory, compressed or not.
+    """
+    return find_file(path, domain, HAR_EXTENSIONS)
+
 def check_directory_validity(directory: str, replay_warc: bool=True, replay_har: bool=True) -> Dict[str, Any]:
     """
     Check the calidity of a directory.
@@ -17,7 +52,7 @@ def check_directory_validity(directory: str, replay_warc: bool=True, replay_har:
 
     for entry in os.listdir(directory):
         for file_type in file_types:
-            if entry.endswith(file_type):
+            if has_file_type(entry, file_type):
                 file_types[file_type].append(entry)
 
     missing_file_types = [
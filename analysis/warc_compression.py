@@ -0,0 +1,119 @@
+from warcio.archiveiterator import ArchiveIterator
+from tqdm import tqdm
+from multiprocessing import Pool
+import pandas as pd
+import tempfile
+import shutil
+import gzip
+import time
+import os
+from utils import get_valid_directories, find_warc
+
+CRAWL_PATH = "/home/ubuntu/hwpg-ae/src/output/2025-01-16_103056"
+
+# Bytes copied at once when decompressing a WARC
+CHUNK_SIZE = 1 << 20
+
+def compress_warc(warc_file, gz_file):
+    """
+    Compress an uncompressed WARC record by record, like warcprox --gzip does.
+    """
+    with open(warc_file, 'rb') as stream, open(warc_file, 'rb') as raw, open(gz_file, 'wb') as out:
+        archive = ArchiveIterator(stream)
+        for record in archive:
+            archive.read_to_end(record)
+            raw.seek(archive.get_record_offset())
+            out.write(gzip.compress(raw.read(archive.get_record_length())))
+
+def decompress_warc(gz_file, warc_file):
+    """
+    Decompress a WARC with a gzip member per record.
+    """
+    with gzip.open(gz_file, 'rb') as stream, open(warc_file, 'wb') as out:
+        shutil.copyfileobj(stream, out, CHUNK_SIZE)
+
+def time_read(warc_file):
+    """
+    Read all records of a WARC, as the analyses do, and return the records and seconds taken.
+    """
+    start = time.perf_counter()
+    records = 0
+    with open(warc_file, 'rb') as stream:
+        for record in ArchiveIterator(stream):
+            record.content_stream().read()
+            records += 1
+    return records, time.perf_counter() - start
+
+def run(path):
+    """
+    Compare the size and read time of the WARC of an origin, compressed and uncompressed.
+
+    Args:
+        path (str): Path to the crawl data directory.
+
+    Returns:
+        pd.DataFrame: Dataframe with one row for the origin.
+    """
+    domain = os.path.basename(path).split("_")[1]
+    warc_file = find_warc(path, domain)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if warc_file.endswith(".gz"):
+            gz_file = warc_file
+            plain_file = os.path.join(tmp_dir, domain + ".warc")
+            decompress_warc(gz_file, plain_file)
+        else:
+            plain_file = warc_file
+            gz_file = os.path.join(tmp_dir, domain + ".warc.gz")
+            compress_warc(plain_file, gz_file)
+
+        records, read_plain = time_read(plain_file)
+        _, read_gz = time_read(gz_file)
+        plain_bytes = os.path.getsize(plain_file)
+        gz_bytes = os.path.getsize(gz_file)
+
+    return pd.DataFrame([{
+        "origin": os.path.basename(path),
+        "compressed": warc_file.endswith(".gz"),
+        "records": records,
+        "warc_bytes": plain_bytes,
+        "warc_gz_bytes": gz_bytes,
+        "saved_bytes": plain_bytes - gz_bytes,
+        "read_warc_s": read_plain,
+        "read_warc_gz_s": read_gz,
+    }])
+
+def main():
+    """
+    Report the bytes saved by compressed WARCs in a crawl, and the overhead of reading them.
+    """
+    crawl_output_path = CRAWL_PATH
+    origin_directories = get_valid_directories(crawl_output_path, replay_warc=False, replay_har=False)
+
+    with Pool(6) as p:
+        frames = list(
+            tqdm(
+                p.imap_unordered(run, origin_directories),
+                leave=True,
+                desc="Origins",
+                total=len(origin_directories),
+                position=0,
+            )
+        )
+
+    result = pd.concat(frames)
+    csv_time = str(int(time.time()))
+    result.to_csv(f"warc_compression_{csv_time}.csv", sep=',', index=False, encoding='utf-8')
+
+    warc_bytes = result["warc_bytes"].sum()
+    saved_bytes = result["saved_bytes"].sum()
+    read_plain = result["read_warc_s"].sum()
+    read_gz = result["read_warc_gz_s"].sum()
+    print(f"Origins: {len(result)}, records: {result['records'].sum()}")
+    print(f"WARC: {warc_bytes / 1e6:.1f} MB, WARC.GZ: {result['warc_gz_bytes'].sum() / 1e6:.1f} MB")
+    print(f"Saved: {saved_bytes / 1e6:.1f} MB ({100 * saved_bytes / max(warc_bytes, 1):.1f}%)")
+    print(f"Read: {read_plain:.2f}s uncompressed, {read_gz:.2f}s compressed "
+          f"({100 * (read_gz - read_plain) / max(read_plain, 1e-9):+.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Columnar index of the records of a WARC, written once and read by the analyses instead of the WARC.
+
+The index of <hostname>.warc(.gz) is <hostname>.records.parquet in the same directory, with one
+row per record, in the order of the WARC. The offsets and lengths are those of the records in the
+WARC file (of their gzip members, for a .warc.gz), so the index can also seed the CDXJ index of
+the replay (see src/warc_index.py). Needs pyarrow.
+
+    python warc_records.py
+"""
+
+from warcio.archiveiterator import ArchiveIterator
+from tqdm import tqdm
+from multiprocessing import Pool
+import pandas as pd
+import datetime
+import time
+import os
+from utils import get_valid_directories, find_warc
+
+CRAWL_PATH = "/home/ubuntu/hwpg-ae/src/output/2025-01-16_103056"
+
+# Extension of the index, after the hostname
+RECORDS_EXTENSION = ".records.parquet"
+# Columns of the index
+COLUMNS = ["uri", "date", "type", "offset", "length", "status", "content_type", "payload_digest", "method"]
+
+def index_warc(warc_file):
+    """
+    Read the headers of all records of a WARC into a dataframe, one row per record.
+
+    date is the WARC-Date without timezone (UTC), status the HTTP status of responses and
+    revisits, content_type the Content-Type of the HTTP message (of the record for non-HTTP
+    records) and method the HTTP method of requests.
+    """
+    rows = []
+    with open(warc_file, 'rb') as stream:
+        archive = ArchiveIterator(stream)
+        for record in archive:
+            headers = record.rec_headers
+            http = record.http_headers
+            ts = headers.get_header('WARC-Date')
+            row = {
+                "uri": headers.get_header('WARC-Target-URI'),
+                "date": datetime.datetime.fromisoformat(ts[:-1]).replace(tzinfo=None) if ts else None,
+                "type": record.rec_type,
+                "status": None,
+                "content_type": record.content_type,
+                "payload_digest": headers.get_header('WARC-Payload-Digest'),
+                "method": None,
+            }
+            if http is not None:
+                row["content_type"] = http.get_header('Content-Type')
+                if record.rec_type == 'request':
+                    row["method"] = http.protocol
+                elif http.get_statuscode().isdigit():
+                    row["status"] = int(http.get_statuscode())
+            archive.read_to_end(record)
+            row["offset"] = archive.get_record_offset()
+            row["length"] = archive.get_record_length()
+            rows.append(row)
+
+    records = pd.DataFrame(rows, columns=COLUMNS)
+    records["date"] = pd.to_datetime(records["date"])
+    records["type"] = records["type"].astype("category")
+    records["offset"] = records["offset"].astype("int64")
+    records["length"] = records["length"].astype("int64")
+    records["status"] = records["status"].astype("Int16")
+    return records
+
+def records_file(path, domain):
+    """
+    Get the path of the record index of an origin directory.
+    """
+    return os.path.join(path, domain + RECORDS_EXTENSION)
+
+def write_records(warc_file, index_file):
+    """
+    Index a WARC into a Parquet file. The index is written to a temporary file first, so that an
+    interrupted run doesn't leave a partial index behind.
+    """
+    records = index_warc(warc_file)
+    temp_file = index_file + ".tmp"
+    records.to_parquet(temp_file, index=False)
+    os.replace(temp_file, index_file)
+    return records
+
+def read_records(path, domain):
+    """
+    Read the record index of the WARC of an origin directory, building it if it is missing or
+    older than the WARC.
+    """
+    warc_file = find_warc(path, domain)
+    index_file = records_file(path, domain)
+    if os.path.exists(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(warc_file):
+        return pd.read_parquet(index_file)
+    return write_records(warc_file, index_file)
+
+def run(path):
+    """
+    Index the WARC of an origin, unless it is indexed already.
+
+    Returns:
+        pd.DataFrame: Dataframe with one row for the origin.
+    """
+    domain = os.path.basename(path).split("_")[1]
+    start = time.perf_counter()
+    records = read_records(path, domain)
+    return pd.DataFrame([{
+        "origin": os.path.basename(path),
+        "records": len(records),
+        "index_bytes": os.path.getsize(records_file(path, domain)),
+        "seconds": time.perf_counter() - start,
+    }])
+
+def main():
+    """
+    Index the WARCs of all origins of a crawl, once, for the analyses and the replay.
+    """
+    crawl_output_path = CRAWL_PATH
+    origin_directories = get_valid_directories(crawl_output_path, replay_warc=False, replay_har=False)
+
+    with Pool(6) as p:
+        frames = list(
+            tqdm(
+                p.imap_unordered(run, origin_directories),
+                leave=True,
+                desc="Origins",
+                total=len(origin_directories),
+                position=0,
+            )
+        )
+
+    result = pd.concat(frames)
+    print(f"Origins: {len(result)}, records: {result['records'].sum()}, "
+          f"index: {result['index_bytes'].sum() / 1e6:.1f} MB, {result['seconds'].sum():.1f}s")
+
+if __name__ == "__main__":
+    main()
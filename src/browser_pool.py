@@ -0,0 +1,187 @@
+"""
+A pool of warm Brave browsers that pagegraph crawls are run in.
+
+Instead of running pagegraph-crawl (npm, Xvfb and a cold browser profile)
+for every origin, a long-running Node driver (browser_pool_driver.mjs)
+keeps a number of browsers open. Each crawl is submitted to the driver as a
+job, and runs in a fresh incognito context of one of the browsers that uses
+the proxy of the crawl, so that crawls stay isolated from each other.
+
+Jobs and results are exchanged as JSON lines over the stdin and stdout of
+the driver. The output of the driver and the browsers goes to a log file,
+while the log of each crawl, with the console messages of its pages, goes
+to the pagegraph.log of its origin in the format of pagegraph-crawl.
+"""
+
+from typing import Any, Dict, Optional
+import os
+import json
+import asyncio
+import logging
+
+from misc import PAGEGRAPH_TIMEOUT, stop_process_async
+
+# Seconds to wait at most for the browsers of the pool to start.
+POOL_STARTUP_TIMEOUT = 120
+# Number of crawls after which a browser of the pool is restarted.
+BROWSER_MAX_JOBS = 100
+# Seconds that pagegraph waits on a page before the graph is generated.
+PAGEGRAPH_DWELL = 10
+# Seconds to wait for a result on top of the timeout of the crawl, which is enforced by the driver.
+RESULT_GRACE = 30
+
+
+class BrowserPoolError(Exception):
+    """Raised if the browser pool failed to start or died during a crawl."""
+
+
+class BrowserPool:
+    """
+    A Node driver that keeps a number of Brave browsers open, and crawls origins with them.
+
+    The driver is started on the first crawl, and restarted if it died.
+
+    Args:
+        size (int): Number of browsers. More crawls than this can be submitted,
+            but they share the browsers.
+        brave_exec_path (str): Path to Brave browser executable.
+        base_dir (str): Base directory of the project.
+        log_path (str): Path of the log file of the driver and the browsers.
+        max_jobs (int): Number of crawls after which a browser is restarted.
+    """
+
+    def __init__(self, size: int, brave_exec_path: str, base_dir: str, log_path: str, max_jobs: int = BROWSER_MAX_JOBS) -> None:
+        self.size = size
+        self.brave_exec_path = brave_exec_path
+        self.base_dir = base_dir
+        self.log_path = log_path
+        self.max_jobs = max_jobs
+        self.p: Optional[asyncio.subprocess.Process] = None
+        self.reader: Optional["asyncio.Task[None]"] = None
+        self.results: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+        self.next_id = 0
+        self.start_lock = asyncio.Lock()
+
+    def is_running(self) -> bool:
+        """Returns whether the driver is running."""
+        return self.p is not None and self.p.returncode is None
+
+    async def start(self) -> None:
+        """
+        Starts the driver, and waits until its browsers are open.
+
+        Raises:
+            BrowserPoolError: If the browsers could not be started.
+        """
+        crawl_dir = os.path.join(self.base_dir, "pagegraph-crawl")
+        cmd = [
+            "node", os.path.join(self.base_dir, "browser_pool_driver.mjs"),
+            "--crawl-dir", crawl_dir,
+            "--brave", self.brave_exec_path,
+            "--browsers", str(self.size),
+            "--max-jobs", str(self.max_jobs),
+            "--logging", "verbose",
+        ]
+        with open(self.log_path, "a") as logfile:
+            self.p = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=logfile, cwd=crawl_dir
+            )
+        assert self.p.stdout is not None
+
+        try:
+            line = await asyncio.wait_for(self.p.stdout.readline(), timeout=POOL_STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise BrowserPoolError(f"Browsers not ready after {POOL_STARTUP_TIMEOUT}s")
+        message = json.loads(line) if line else {}
+        if not message.get("ready"):
+            await self.stop()
+            raise BrowserPoolError(f"Browsers failed to start: {message.get('error', 'driver exited')}")
+        logging.info(f"Browser pool started with {message['browsers']} browsers")
+        self.reader = asyncio.create_task(self.read_results())
+
+    async def read_results(self) -> None:
+        """Hands the results of the driver to the crawls waiting for them, until the driver exits."""
+        assert self.p is not None and self.p.stdout is not None
+        while True:
+            line = await self.p.stdout.readline()
+            if not line:
+                break
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                logging.error(f"Browser pool: invalid result {line!r}")
+                continue
+            future = self.results.pop(result.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+        # The driver exited, so pending crawls won't get a result.
+        if self.results:
+            logging.error(f"Browser pool: driver exited during {len(self.results)} crawls")
+        for future in self.results.values():
+            if not future.done():
+                future.set_exception(BrowserPoolError("Browser pool driver exited"))
+        self.results.clear()
+
+    async def crawl(self, origin: str, output_path: str, port_mitmd: int, timeout: float = PAGEGRAPH_TIMEOUT) -> bool:
+        """
+        Crawls an origin in one of the browsers, through mitmdump, and stores its pagegraph.
+
+        Args:
+            origin (str): URL to crawl.
+            output_path (str): Path to store pagegraph output. The log of the crawl is
+                appended to logs/pagegraph.log below it.
+            port_mitmd (int): Port to mitmdump to connect to.
+            timeout (float): Seconds after which the crawl is given up on.
+
+        Returns:
+            bool: True if a pagegraph was stored.
+
+        Raises:
+            BrowserPoolError: If the driver could not be started, or died during the crawl.
+        """
+        async with self.start_lock:
+            if not self.is_running():
+                await self.start()
+        assert self.p is not None and self.p.stdin is not None
+
+        self.next_id += 1
+        job_id = self.next_id
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self.results[job_id] = future
+        job = {
+            "id": job_id,
+            "url": origin,
+            "outputPath": output_path,
+            "logPath": os.path.join(output_path, "logs", "pagegraph.log"),
+            "proxyServer": f"http://127.0.0.1:{port_mitmd}",
+            "seconds": PAGEGRAPH_DWELL,
+            "timeout": timeout,
+        }
+        self.p.stdin.write((json.dumps(job) + "\n").encode())
+        await self.p.stdin.drain()
+
+        try:
+            result = await asyncio.wait_for(future, timeout=timeout + RESULT_GRACE)
+        except asyncio.TimeoutError:
+            self.results.pop(job_id, None)
+            logging.error(f"{origin} no result from the browser pool")
+            return False
+        if result["error"] is not None:
+            logging.error(f"{origin} pagegraph crawl failed: {result['error']}")
+        return bool(result["ok"])
+
+    async def stop(self) -> None:
+        """Closes the browsers, and shuts the driver down."""
+        if self.p is None:
+            return
+        if self.p.stdin is not None and self.p.returncode is None:
+            # The driver closes its browsers once its stdin is closed.
+            self.p.stdin.close()
+        await stop_process_async(self.p)
+        if self.reader is not None:
+            await self.reader
+            self.reader = None
+        self.p = None
@@ -0,0 +1,412 @@
+'use strict'
+
+// Keeps a pool of warm Brave browsers running, and crawls URLs with them for
+// the Python side of the crawler (see browser_pool.py).
+//
+// Jobs are read as JSON lines from stdin, and a result is written as a JSON
+// line to stdout for each of them. Each job is crawled in a fresh incognito
+// context of one of the browsers, which uses the proxy of the job, so that
+// jobs share nothing but the browser process. Apart from that, a job is
+// crawled like pagegraph-crawl's doCrawl (see pagegraph_patches/crawl.ts).
+//
+// Usage: node browser_pool_driver.mjs --crawl-dir <pagegraph-crawl> --brave <path>
+//          [--browsers <n>] [--max-jobs <n>] [--logging verbose]
+
+import { createRequire } from 'module'
+import * as fs from 'fs'
+import * as osLib from 'os'
+import pathLib from 'path'
+import readline from 'readline'
+
+const xvfbPlatforms = new Set(['linux', 'openbsd'])
+const maxRetries = 3
+
+const parseArgs = (argv) => {
+  const options = { browsers: 1, maxJobs: 100, logging: 'none' }
+  for (let i = 0; i < argv.length; i += 2) {
+    const value = argv[i + 1]
+    switch (argv[i]) {
+      case '--crawl-dir': options.crawlDir = value; break
+      case '--brave': options.brave = value; break
+      case '--browsers': options.browsers = parseInt(value); break
+      case '--max-jobs': options.maxJobs = parseInt(value); break
+      case '--logging': options.logging = value; break
+      default: throw new Error(`Unknown argument ${argv[i]}`)
+    }
+  }
+  if (!options.crawlDir || !options.brave) {
+    throw new Error('--crawl-dir and --brave are required')
+  }
+  return options
+}
+
+const options = parseArgs(process.argv.slice(2))
+
+// puppeteer and xvfb are dependencies of pagegraph-crawl, so we load them from there.
+const require = createRequire(pathLib.join(pathLib.resolve(options.crawlDir), 'package.json'))
+const puppeteer = require('puppeteer-core')
+const Xvfb = require('xvfb')
+
+function wait (ms) {
+  return new Promise(resolve => setTimeout(resolve, ms))
+}
+
+function log (...args) {
+  console.error(new Date().toISOString(), ...args)
+}
+
+function send (message) {
+  process.stdout.write(JSON.stringify(message) + '\n')
+}
+
+// Logs of a job go to the pagegraph.log of its origin, in the format of the logs of
+// pagegraph-crawl, which the analyses parse (see analysis/pagegraph_log.py).
+function jobLogger (logPath) {
+  return (...args) => {
+    const line = args.map(a => (a instanceof Error ? a.stack : String(a))).join(' ')
+    try {
+      fs.appendFileSync(logPath, line + '\n')
+    } catch (err) {
+      log(`ERROR writing to ${logPath}:`, err)
+    }
+  }
+}
+
+// A console message of a page, as Brave logs it with --enable-logging=stderr.
+function consoleLine (text, url, lineNumber) {
+  const now = new Date()
+  const pad = (n, width = 2) => String(n).padStart(width, '0')
+  const date = `${pad(now.getMonth() + 1)}${pad(now.getDate())}`
+  const time = `${pad(now.getHours())}${pad(now.getMinutes())}${pad(now.getSeconds())}.${pad(now.getMilliseconds() * 1000, 6)}`
+  return `[${date}/${time}:INFO:CONSOLE(${lineNumber})] "${text}", source: ${url} (${lineNumber})`
+}
+
+// An argument of a console call as text, like the console message Brave logs.
+function remoteObjectText (arg) {
+  if (arg.type === 'string') {
+    return arg.value
+  }
+  if (arg.unserializableValue !== undefined) {
+    return arg.unserializableValue
+  }
+  if (arg.value !== undefined || arg.subtype === 'null') {
+    return String(arg.value)
+  }
+  return arg.description ?? arg.type
+}
+
+// The browsers are shared by the jobs, so their stderr can't tell which job a console
+// message belongs to. Instead, the console messages of each page are logged to its job.
+function logConsole (client, jobLog) {
+  client.on('Runtime.consoleAPICalled', (event) => {
+    const frame = event.stackTrace?.callFrames[0]
+    const text = event.args.map(remoteObjectText).join(' ')
+    jobLog(consoleLine(text, frame?.url ?? '', (frame?.lineNumber ?? -1) + 1))
+  })
+  client.on('Runtime.exceptionThrown', ({ exceptionDetails }) => {
+    const text = exceptionDetails.exception?.description?.split('\n')[0] ?? exceptionDetails.text
+    jobLog(consoleLine(`Uncaught ${text}`, exceptionDetails.url ?? '', exceptionDetails.lineNumber + 1))
+  })
+}
+
+async function startXvfb () {
+  if (!xvfbPlatforms.has(osLib.platform())) {
+    return null
+  }
+  const xvfbHandle = new Xvfb({
+    // ensure 24-bit color depth or rendering might choke
+    xvfb_args: ['-screen', '0', '1024x768x24']
+  })
+  // Start Xvfb ensuring three retries on errors
+  for (let attempt = 1; ; attempt++) {
+    try {
+      xvfbHandle.startSync()
+      return xvfbHandle
+    } catch (error) {
+      log(`Error starting Xvfb, attempt ${attempt}: ${error}`)
+      if (attempt >= maxRetries) {
+        throw new Error('Failed to start Xvfb after maximum retries')
+      }
+      await wait(1000)
+    }
+  }
+}
+
+function stopXvfb (xvfbHandle) {
+  for (let attempt = 1; attempt <= maxRetries; attempt++) {
+    try {
+      xvfbHandle.stopSync()
+      return
+    } catch (error) {
+      log(`Error stopping Xvfb, attempt ${attempt}: ${error}`)
+    }
+  }
+}
+
+function createFilename (url) {
+  return `page_graph_${url?.replace(/[^\w]/g, '_')}_${Math.floor(Date.now() / 1000)}.graphml`
+}
+
+function createContext (browser, proxyServer) {
+  // Renamed in newer versions of puppeteer.
+  if (browser.createBrowserContext) {
+    return browser.createBrowserContext({ proxyServer })
+  }
+  return browser.createIncognitoBrowserContext({ proxyServer })
+}
+
+// A browser of the pool, with its own Xvfb display and profile.
+class PooledBrowser {
+  constructor (index) {
+    this.index = index
+    this.browser = null
+    this.xvfbHandle = null
+    this.profilePath = null
+    this.jobs = 0
+    this.busy = 0
+    this.ready = null
+  }
+
+  async launch () {
+    this.xvfbHandle = await startXvfb()
+    this.profilePath = fs.mkdtempSync(pathLib.join(osLib.tmpdir(), 'webrec-brave-'))
+    const args = [
+      '--disable-brave-update',
+      '--user-data-dir=' + this.profilePath,
+      '--disable-site-isolation-trials',
+      '--enable-features=PageGraph',
+      '--ignore-certificate-errors'
+    ]
+    if (options.logging === 'verbose') {
+      args.push('--enable-logging=stderr')
+      args.push('--vmodule=page_graph*=2')
+    }
+    const env = { ...process.env }
+    if (this.xvfbHandle) {
+      env.DISPLAY = this.xvfbHandle.display()
+    }
+    for (let attempt = 1; ; attempt++) {
+      try {
+        this.browser = await puppeteer.launch({
+          executablePath: options.brave,
+          args,
+          ignoreDefaultArgs: ['--disable-sync'],
+          defaultViewport: null,
+          headless: false,
+          env
+        })
+        break
+      } catch (err) {
+        log(`Browser ${this.index}: error launching, attempt ${attempt}:`, err)
+        if (attempt >= maxRetries) {
+          await this.close()
+          throw err
+        }
+        await wait(1000)
+      }
+    }
+    // stdout is used for results, so the output of the browser goes to stderr. The
+    // console messages of the pages are logged to their jobs (see logConsole).
+    const proc = this.browser.process()
+    proc?.stdout?.pipe(process.stderr)
+    proc?.stderr?.pipe(process.stderr)
+    this.jobs = 0
+    log(`Browser ${this.index}: launched`)
+  }
+
+  async close () {
+    if (this.browser) {
+      try {
+        await this.browser.close()
+      } catch (err) {
+        log(`Browser ${this.index}: error closing:`, err)
+      }
+      this.browser = null
+    }
+    if (this.xvfbHandle) {
+      stopXvfb(this.xvfbHandle)
+      this.xvfbHandle = null
+    }
+    if (this.profilePath) {
+      fs.rmSync(this.profilePath, { recursive: true, force: true })
+      this.profilePath = null
+    }
+  }
+
+  // Restarts the browser if it crashed, or if it crawled enough jobs.
+  async checkHealth () {
+    if (this.busy > 0) {
+      return
+    }
+    if (this.browser?.isConnected() && this.jobs < options.maxJobs) {
+      return
+    }
+    log(`Browser ${this.index}: restarting after ${this.jobs} jobs`)
+    await this.close()
+    await this.launch()
+  }
+}
+
+const pool = []
+
+function pickBrowser () {
+  return pool.reduce((best, pooled) => (pooled.busy < best.busy ? pooled : best))
+}
+
+async function crawlInContext (pooled, job, url, redirectChain, state, jobLog) {
+  let redirectedUrl = null
+  const context = await createContext(pooled.browser, job.proxyServer)
+  state.context = context
+  try {
+    // create new page, navigate to target URL, and wait for idle time
+    const page = await context.newPage()
+    const client = await page.target().createCDPSession()
+    client.on('Target.targetCrashed', (event) => {
+      jobLog(`ERROR Target.targetCrashed { targetId: ${event.targetId}, status: "${event.status}", errorCode: ${event.errorCode} }`)
+      context.close().catch(() => {})
+    })
+    logConsole(client, jobLog)
+
+    client.send('Debugger.enable')
+    client.send('Network.enable')
+    client.send('Runtime.enable')
+
+    await page.setBypassCSP(true)
+
+    await page.setRequestInterception(true)
+    // First load is not a navigation redirect, so we need to skip it.
+    let firstLoad = true
+    page.on('request', async (request) => {
+      // Only capture parent frame navigation requests.
+      jobLog(`Request intercepted: ${request.url()}, first load: ${firstLoad}`)
+      if (!firstLoad && request.isNavigationRequest() && request.frame() !== null && request.frame().parentFrame() === null) {
+        jobLog('Page is redirecting...')
+        if (!redirectChain.includes(request.url())) {
+          redirectedUrl = request.url()
+          // Add the redirected URL to the redirection chain
+          redirectChain.push(redirectedUrl)
+        }
+        // Stop page load
+        jobLog(`Stopping page load of ${url}`)
+        await client.send('Page.stopLoading').catch(() => {})
+      }
+      firstLoad = false
+      request.continue().catch(() => {})
+    })
+
+    jobLog(`Navigating to ${url}`)
+    await page.goto(url, { waitUntil: 'load' })
+    jobLog(`Loaded ${url}`)
+    jobLog(`Waiting for ${job.seconds * 1000}ms`)
+    await wait(job.seconds * 1000)
+    if (state.timedOut) {
+      throw new Error(`${url} timed out`)
+    }
+    jobLog('calling generatePageGraph')
+    const response = await client.send('Page.generatePageGraph')
+    jobLog(`generatePageGraph { size: ${response.data.length} }`)
+    const outputFilename = pathLib.join(job.outputPath, createFilename(url))
+    fs.writeFileSync(outputFilename, response.data)
+    state.files.push(outputFilename)
+  } catch (err) {
+    jobLog('ERROR runtime fiasco from browser/page:', err)
+  } finally {
+    state.context = null
+    await context.close().catch(() => {})
+  }
+  return redirectedUrl
+}
+
+async function runJob (job) {
+  const jobLog = jobLogger(job.logPath)
+  const pooled = pickBrowser()
+  pooled.busy++
+  const state = { context: null, files: [], timedOut: false }
+  const timer = setTimeout(() => {
+    state.timedOut = true
+    jobLog(`ERROR ${job.url} timed out after ${job.timeout}s`)
+    state.context?.close().catch(() => {})
+  }, job.timeout * 1000)
+  let error = null
+  try {
+    await pooled.ready
+    jobLog(`Crawling ${job.url} in browser ${pooled.index}`)
+    const redirectChain = [new URL(job.url)?.pathname === '/' && !job.url.endsWith('/') ? job.url + '/' : job.url]
+    let url = job.url
+    while (url && !state.timedOut) {
+      url = await crawlInContext(pooled, job, url, redirectChain, state, jobLog)
+      if (url) {
+        jobLog(`Doing new crawl with redirected URL: ${url}`)
+      }
+    }
+  } catch (err) {
+    jobLog('ERROR runtime fiasco from infrastructure:', err)
+    error = String(err)
+  } finally {
+    clearTimeout(timer)
+    pooled.busy--
+    pooled.jobs++
+  }
+  if (state.timedOut) {
+    error = 'timeout'
+  }
+  send({ id: job.id, ok: error === null && state.files.length > 0, files: state.files, error })
+  // Later jobs on this browser wait until it was checked.
+  pooled.ready = pooled.checkHealth().catch((err) => log(`Browser ${pooled.index}: error restarting:`, err))
+}
+
+let shuttingDown = false
+
+async function shutdown () {
+  if (shuttingDown) {
+    return
+  }
+  shuttingDown = true
+  await Promise.all(pool.map(pooled => pooled.close()))
+  process.exit(0)
+}
+
+async function main () {
+  for (let i = 0; i < options.browsers; i++) {
+    pool.push(new PooledBrowser(i + 1))
+  }
+  try {
+    // Xvfb is started synchronously, so browsers are launched one by one.
+    for (const pooled of pool) {
+      await pooled.launch()
+    }
+  } catch (err) {
+    log('ERROR launching browsers:', err)
+    send({ ready: false, error: String(err) })
+    await Promise.all(pool.map(pooled => pooled.close()))
+    process.exit(1)
+  }
+  for (const pooled of pool) {
+    pooled.ready = Promise.resolve()
+  }
+
+  process.on('SIGINT', shutdown)
+  process.on('SIGTERM', shutdown)
+  const input = readline.createInterface({ input: process.stdin })
+  input.on('line', (line) => {
+    if (line.trim() === '') {
+      return
+    }
+    let job
+    try {
+      job = JSON.parse(line)
+    } catch (err) {
+      log(`ERROR invalid job: ${line}`)
+      return
+    }
+    runJob(job).catch((err) => {
+      log(`ERROR job ${job.id}:`, err)
+      send({ id: job.id, ok: false, files: [], error: String(err) })
+    })
+  })
+  // The Python side closes stdin to shut the pool down.
+  input.on('close', shutdown)
+  send({ ready: true, browsers: pool.length })
+}
+
+main()
@@ -0,0 +1,361 @@
+"""
+The coordinator of a crawl that is distributed across several hosts.
+
+The coordinator holds the queue of origins, and workers (see worker.py) pull
+origins from it over HTTP, crawl them, and report back. The crawled origin
+directories are either uploaded to the coordinator as a tar.gz, or written
+to storage that the coordinator and the workers share. The state of each
+origin is kept in the ledger of the crawl, like for a local crawl, so that
+the coordinator can be resumed.
+
+Workers send heartbeats while they crawl. The origins of a worker that
+missed its heartbeats are put back on the queue. Whether a failed origin is
+crawled again is decided by the coordinator, by the retry policy of the
+class of its failure.
+
+Endpoints (all POST, JSON bodies):
+    /lease      {"worker"} -> {"job": {"origin", "attempt"} or null, "done"}
+    /heartbeat  {"worker"} -> {}
+    /report     {"worker", "origin", "attempt", "success", "failure"} -> {}
+    /upload?worker=<worker>&origin=<origin>&attempt=<n>&success=<0|1>  with a tar.gz of the origin directory as body
+
+Uploads are only accepted for origins that are leased to the worker that sends
+them, in the attempt they are leased in, and are only extracted into directories
+directly in the output path. The endpoints are not authenticated, so the
+coordinator should only listen on a network that is limited to the workers.
+"""
+
+from typing import Any, Counter, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import json
+import time
+import heapq
+import itertools
+import shutil
+import logging
+import tarfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from ledger import JobLedger, ledger_path, PENDING, COMPLETE, FAILED
+from misc import check_run_completeness
+from failures import DEFAULT_RETRY_POLICY, RETRY_POLICIES, UNKNOWN, summarize_failures
+
+# Seconds after which the origins of a worker without heartbeats are put back on the queue.
+LEASE_TIMEOUT = 120
+# Seconds between checks for workers that missed their heartbeats.
+REAPER_INTERVAL = 10
+# Bytes read at once from an upload.
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+class Coordinator:
+    """
+    The queue of origins of a distributed crawl, and who crawls which of them.
+
+    Args:
+        output_path (str): Path of the crawl, where the ledger and uploaded origins are stored.
+        ledger (JobLedger): The ledger of the crawl.
+        jobs (Iterable): Tuples of origin and attempt, for the origins to crawl. Taken one
+            at a time as workers ask for origins, so it can be a generator.
+        lease_timeout (float): Seconds after which the origins of a worker without
+            heartbeats are put back on the queue.
+    """
+
+    def __init__(self, output_path: str, ledger: JobLedger, jobs: Iterable[Tuple[str, int]], lease_timeout: float = LEASE_TIMEOUT) -> None:
+        self.output_path = output_path
+        self.ledger = ledger
+        self.lease_timeout = lease_timeout
+        self.lock = threading.Lock()
+        # Origins not taken yet
+        self.pending: Iterator[Tuple[str, int]] = iter(jobs)
+        self.exhausted = False
+        # Origins that are retried, as (ready at, origin, attempt)
+        self.queue: List[Tuple[float, str, int]] = []
+        # Origins being crawled, by worker, with their attempt
+        self.leases: Dict[str, Dict[str, int]] = {}
+        self.heartbeats: Dict[str, float] = {}
+        # Origins taken, but not done yet
+        self.remaining = 0
+        self.done = threading.Event()
+        # Failed attempts by the class of their failure
+        self.failures: Counter[str] = Counter()
+
+    def lease(self, worker: str) -> Dict[str, Any]:
+        """Hands the next origin that is ready to a worker."""
+        with self.lock:
+            self.heartbeats[worker] = time.monotonic()
+            job = self.next_job()
+            if job is not None:
+                origin, attempt = job
+                self.leases.setdefault(worker, {})[origin] = attempt
+                self.ledger.start(origin, attempt)
+                logging.info(f"Leased {origin} (attempt {attempt}) to {worker}")
+                return {"job": {"origin": origin, "attempt": attempt}, "done": False}
+            return {"job": None, "done": self.done.is_set()}
+
+    def next_job(self) -> Optional[Tuple[str, int]]:
+        """
+        Returns the next origin that is ready, with its attempt. Must be called with the lock held.
+
+        Retries that are due go first, so that they don't wait for the rest of the origins.
+        """
+        if self.queue and self.queue[0][0] <= time.monotonic():
+            _, origin, attempt = heapq.heappop(self.queue)
+            return origin, attempt
+        if self.exhausted:
+            return None
+        job = next(self.pending, None)
+        if job is None:
+            self.exhausted = True
+            if self.remaining == 0:
+                self.done.set()
+            return None
+        self.remaining += 1
+        return job
+
+    def heartbeat(self, worker: str) -> None:
+        """Notes that a worker is alive."""
+        with self.lock:
+            self.heartbeats[worker] = time.monotonic()
+
+    def report(self, worker: str, origin: str, attempt: int, success: bool, failure: Optional[str]) -> None:
+        """
+        Records the result of a crawl, and puts the origin back on the queue if it is retried.
+
+        Results of origins that the worker no longer holds, e.g. after it missed its
+        heartbeats, are ignored.
+        """
+        with self.lock:
+            self.heartbeats[worker] = time.monotonic()
+            if self.leases.get(worker, {}).get(origin) != attempt:
+                logging.warning(f"Ignoring result of {origin} (attempt {attempt}) from {worker}")
+                return
+            del self.leases[worker][origin]
+
+            if success:
+                self.finish(origin, True, None)
+                return
+            self.fail(origin, attempt, failure or UNKNOWN)
+
+    def fail(self, origin: str, attempt: int, failure: str) -> None:
+        """
+        Puts an origin back on the queue after a failed attempt, or marks it as failed
+        if the retry policy of the failure gives up on it. Must be called with the lock held.
+        """
+        self.failures[failure] += 1
+        policy = RETRY_POLICIES.get(failure, DEFAULT_RETRY_POLICY)
+        if attempt < policy.max_retries:
+            logging.info(f"Retry {origin} after failure: {failure}")
+            self.ledger.retry(origin, attempt + 1, failure)
+            heapq.heappush(self.queue, (time.monotonic() + policy.delay_for(attempt), origin, attempt + 1))
+        else:
+            logging.info(f"Failed {origin} due to failure: {failure}")
+            self.finish(origin, False, failure)
+
+    def finish(self, origin: str, success: bool, failure: Optional[str]) -> None:
+        """Marks an origin as done for good. Must be called with the lock held."""
+        self.ledger.finish(origin, success, failure)
+        self.remaining -= 1
+        if self.exhausted and self.remaining == 0:
+            self.done.set()
+
+    def requeue_dead_workers(self) -> None:
+        """Puts the origins of workers that missed their heartbeats back on the queue."""
+        with self.lock:
+            now = time.monotonic()
+            for worker, last_seen in list(self.heartbeats.items()):
+                if now - last_seen < self.lease_timeout:
+                    continue
+                for origin, attempt in self.leases.pop(worker, {}).items():
+                    # The attempt counts like a failed one, and its output (if any) is kept apart.
+                    logging.warning(f"{worker} missed its heartbeats, giving up its attempt at {origin}")
+                    keep_failed_output(self.output_path, origin, attempt)
+                    self.fail(origin, attempt, UNKNOWN)
+                del self.heartbeats[worker]
+
+    def receive_upload(self, worker: str, origin: str, attempt: int, success: bool, stream: Any, length: int) -> None:
+        """
+        Extracts the uploaded tar.gz of an origin directory into the output path.
+
+        The directory of a failed attempt is stored as <scheme>_<hostname>_failed_attempt_<n>,
+        like for a local crawl.
+
+        Raises:
+            PermissionError: If the origin is not leased to the worker in this attempt.
+            ValueError: If the origin is invalid, or the upload incomplete.
+        """
+        with self.lock:
+            if self.leases.get(worker, {}).get(origin) != attempt:
+                raise PermissionError(f"{origin} (attempt {attempt}) is not leased to {worker}")
+        target = origin_directory(self.output_path, origin, attempt, success)
+
+        # Read exactly the upload, as the stream stays open for the answer.
+        with tempfile.TemporaryFile() as archive:
+            while length > 0:
+                chunk = stream.read(min(length, UPLOAD_CHUNK_SIZE))
+                if not chunk:
+                    raise ValueError("Upload ended early")
+                archive.write(chunk)
+                length -= len(chunk)
+            archive.seek(0)
+
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.makedirs(target)
+            with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(target, filter="data")
+                else:
+                    tar.extractall(target)
+
+
+def handler_for(coordinator: Coordinator) -> Any:
+    """Returns a request handler class that serves the endpoints of a coordinator."""
+
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                if url.path == "/upload":
+                    query = parse_qs(url.query)
+                    coordinator.receive_upload(
+                        query["worker"][0], query["origin"][0], int(query["attempt"][0]),
+                        query.get("success", ["1"])[0] == "1", self.rfile, length
+                    )
+                    self.send_json(200, {})
+                    return
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if url.path == "/lease":
+                    self.send_json(200, coordinator.lease(request["worker"]))
+                elif url.path == "/heartbeat":
+                    coordinator.heartbeat(request["worker"])
+                    self.send_json(200, {})
+                elif url.path == "/report":
+                    coordinator.report(
+                        request["worker"], request["origin"], int(request["attempt"]),
+                        bool(request["success"]), request.get("failure")
+                    )
+                    self.send_json(200, {})
+                else:
+                    self.send_json(404, {"error": f"unknown endpoint {url.path}"})
+            except PermissionError as e:
+                self.send_json(403, {"error": repr(e)})
+            except (KeyError, ValueError, tarfile.TarError) as e:
+                self.send_json(400, {"error": repr(e)})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.debug("coordinator: " + format, *args)
+
+    return CoordinatorHandler
+
+
+def origin_directory(output_path: str, origin: str, attempt: int, success: bool) -> str:
+    """
+    Returns the directory of an attempt at an origin in the output path, as
+    <scheme>_<hostname>, or <scheme>_<hostname>_failed_attempt_<n> for a failed attempt.
+
+    Raises:
+        ValueError: If the directory would not be directly in the output path.
+    """
+    scheme, hostname = origin.split("://")
+    name = f"{scheme}_{hostname}"
+    if not success:
+        name += f"_failed_attempt_{attempt}"
+    output_path = os.path.realpath(output_path)
+    directory = os.path.realpath(os.path.join(output_path, name))
+    if os.path.dirname(directory) != output_path:
+        raise ValueError(f"Invalid origin {origin!r}")
+    return directory
+
+
+def keep_failed_output(output_path: str, origin: str, attempt: int) -> None:
+    """
+    Moves what an attempt at an origin left in the output path (with shared storage)
+    to the directory of a failed attempt, so that the next attempt starts from scratch.
+    """
+    directory = origin_directory(output_path, origin, attempt, True)
+    if os.path.exists(directory):
+        shutil.move(directory, origin_directory(output_path, origin, attempt, False))
+
+
+def coordinator_jobs(ledger: JobLedger, origins: Iterable[str], output_path: str, resume: bool) -> Iterator[Tuple[str, int]]:
+    """
+    Returns the origins to crawl, with their attempts.
+
+    New origins are added to the ledger as they are taken. Origins that are already
+    in the ledger are skipped.
+
+    Args:
+        ledger (JobLedger): The ledger of the crawl.
+        origins (Iterable): The origins of the crawl, e.g. a generator over a CrUX list.
+        output_path (str): Path of the crawl.
+        resume (bool): Whether to resume the crawl, like a local crawl (see crawl.resume_jobs).
+            Origins that are complete are checked for completeness again, and crawled again
+            if files are missing. Origins that failed for good are not crawled again. The
+            output of an interrupted attempt is kept, like the output of a failed attempt,
+            and the origin is crawled in the next attempt. These origins go first.
+    """
+    unfinished = []
+    if resume:
+        for origin, state, attempt in ledger.jobs():
+            if state == FAILED:
+                continue
+            input = {"origin": origin, "output_path": output_path}
+            directory = origin_directory(output_path, origin, attempt, True)
+            if state == COMPLETE:
+                if os.path.exists(directory) and check_run_completeness(input):
+                    continue
+                logging.info(f"Resume: {origin} was complete, but files are missing")
+            if state != PENDING or os.path.exists(directory):
+                keep_failed_output(output_path, origin, attempt)
+                attempt += 1
+            ledger.retry(origin, attempt)
+            unfinished.append((origin, attempt))
+    new = ((origin, 0) for origin in origins if ledger.add_new(origin))
+    return itertools.chain(unfinished, new)
+
+
+def run_coordinator(origins: Iterable[str], output_path: str, host: str, port: int, resume: bool = False) -> None:
+    """
+    Coordinates a distributed crawl until all origins are done.
+
+    Args:
+        origins (Iterable): The origins to crawl.
+        output_path (str): Path of the crawl.
+        host (str): Host to listen on.
+        port (int): Port to listen on.
+        resume (bool): Whether to resume the crawl in output_path from its ledger.
+    """
+    ledger = JobLedger(ledger_path(output_path))
+    coordinator = Coordinator(output_path, ledger, coordinator_jobs(ledger, origins, output_path, resume))
+    logging.info(f"Coordinating crawl on {host}:{port}: {ledger.counts()}")
+    print(f"Coordinating crawl on {host}:{port}")
+    server = ThreadingHTTPServer((host, port), handler_for(coordinator))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        while not coordinator.done.wait(REAPER_INTERVAL):
+            coordinator.requeue_dead_workers()
+        # Let the workers learn that the crawl is done before shutting down.
+        time.sleep(REAPER_INTERVAL)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    logging.info(f"Crawl finished: {ledger.counts()}")
+    summary = summarize_failures(coordinator.failures, ledger.failure_counts())
+    logging.info(summary)
+    print(summary)
+    ledger.close()
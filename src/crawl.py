@@ -1,135 +1,208 @@
-from typing import Any, Dict, List
+from typing import Counter, Dict, Iterable, Iterator, List, Optional
 import os
-import sys
 import subprocess
-import signal
-import time
+import asyncio
+import functools
 import logging
 import shutil
-from multiprocessing import Pool, current_process
+import itertools
 from tqdm import tqdm
-import json
 
 from reporting import send_message
-from misc import start_mitmd_proxy, start_warc_prox, start_pagegraph, check_run_completeness
+from misc import run_pagegraph_async, check_run_completeness
+from scheduler import Job, ResourceGate, ResourceLimits, Scheduler
+from readiness import ReadinessError, record_readiness
+from ports import PortLeaseError
+from proxy_pool import ProxyPool
+from browser_pool import BrowserPool, BrowserPoolError
+from ledger import JobLedger, ledger_path, COMPLETE, FAILED
+from failures import RETRY_POLICIES, UNKNOWN, classify_failure, summarize_failures
 
 from config import BRAVE_EXEC_PATH
 
-def get_crux_list(output_path: str, yyyymm: str = "202311") -> List[Any]:
-    """
-    Reads and returns the curx list.
-    
-    Args:
-        output_path (str): Path where output is stored.
-        yyyymm (str): Timestamp in the format YYYYMM of the crux list.
-
-    Returns:
-        list: List of origins from the crux list or an empty list if not found.
-    """
-    output_path = os.path.dirname(output_path)
-    crux_file = os.path.join(output_path, f"{yyyymm}.json")
+# Number of origins after which the proxies of a worker are restarted.
+PROXY_MAX_ORIGINS = 50
+# How often, and after how many seconds, a failed crawl of an origin is retried.
+MAX_RETRIES = 3
+RETRY_DELAY = 30
 
-    if os.path.exists(crux_file):
-        with open(crux_file, "r") as f:
-            rows = json.load(f)
-            return rows
-    return []
-
-def setup_process(output_path: str) -> None:
+def setup_logging(output_path: str) -> None:
     """
-    Sets up the logging configuration for the current process.
+    Sets up the logging configuration of the crawl.
 
     Args:
         output_path (str): Path where log files will be stored.
     """
+    log_file = os.path.join(output_path, "log.txt")
+    logging.basicConfig(
+        filename=log_file, encoding="utf-8", level=logging.DEBUG,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
 
-    num = int(current_process().name.split("-")[1])
-    log_file = os.path.join(output_path, f"./log-p{num}.txt")
-    logging.basicConfig(filename=log_file, encoding="utf-8", level=logging.DEBUG)
-
-def run_task_helper(input: Dict[str, str]) -> None:
+def origin_output_path(input: Dict[str, str]) -> str:
     """
-    Helper function to run a task for processing a specific origin.
-    
-    The helper starts all proxies (warcprox and mitmdump) first.
-    In the next step, pagegraph-crawl (called WebREC in the paper) is used to
-    crawl the origin and generate a pagegraph.
-    For every HTML response, mitmdump injects a script element (via js_injector.py) to hook into JS calls.
+    Returns the directory where the crawl of an origin is stored.
 
     Args:
         input (dict): Dict containing the 'origin' and 'output_path' for the task.
     """
+    scheme, hostname = input["origin"].split("://")
+    return os.path.join(input["output_path"], f"{scheme}_{hostname}")
+
+async def crawl_origin(
+        proxy_pool: ProxyPool,
+        browser_pool: Optional[BrowserPool],
+        job: Job,
+        slot: int,
+        gate: ResourceGate
+    ) -> bool:
+    """
+    Crawls a single origin.
 
-    origin = input["origin"]
-    output_path = input["output_path"]
+    The proxies of the slot (warcprox and mitmdump) are pointed at the origin first,
+    and started if they aren't running yet (see ProxyPool).
+    In the next step, pagegraph-crawl (called WebREC in the paper) is used to
+    crawl the origin and generate a pagegraph, in a browser of the browser pool
+    if there is one (see BrowserPool).
+    For every HTML response, mitmdump injects a script element (via js_injector.py) to hook into JS calls.
+    The browser only runs once the host has the resources for it (see ResourceGate).
 
-    num = int(current_process().name.split("-")[1])
+    Args:
+        proxy_pool (ProxyPool): The proxies of all slots.
+        browser_pool (BrowserPool): The browsers to crawl in, or None to run
+            pagegraph-crawl for each origin.
+        job (Job): Job containing the 'origin' and 'output_path' for the task.
+        slot (int): Number of the scheduler slot the job runs in.
+        gate (ResourceGate): Hands out the resources needed to run the browser.
 
-    logging.info(f"Process {num}: {origin}")
+    Returns:
+        bool: True if the crawl created all expected files, False otherwise.
+    """
+    origin = job.input["origin"]
+    logging.info(f"Slot {slot}: {origin} (attempt {job.attempt})")
 
     scheme, hostname = origin.split("://")
-
-    output_path = os.path.join(output_path, f"{scheme}_{hostname}")
-    bin_dir = os.path.join(os.path.dirname(sys.executable))
+    output_path = origin_output_path(job.input)
     base_dir = os.path.dirname(os.path.realpath(__file__))
     os.makedirs(os.path.join(output_path, "logs"))
 
-    # Setup warcprox for creating WARC files
-    port_warcp = 16000 + num
-    p_warcp = start_warc_prox(port_warcp, output_path, hostname, bin_dir)
-
-    # Setup mitmproxy for creating HAR files. 
-    # It also injects our hooking JS.
-    port_mitmd = 15000 + num
-    mitm_script = os.path.join(base_dir, "js_injector.py")
-    p_mitmd = start_mitmd_proxy(
-        port_mitmd, port_warcp, output_path,
-        hostname, bin_dir, mitm_script
-    )
-
-    time.sleep(5) # Allow some time for proxies to be fully started
-
-     # Run page graph crawl
-    start_pagegraph(
-        port_mitmd, BRAVE_EXEC_PATH,
-        output_path, origin, base_dir
-    )
+    # Point the proxies at this origin, so that they record its WARC and HAR files
+    proxies = proxy_pool.pair(slot)
+    # Each attempt gets its own prefix (and so dedup bucket), so that a retry
+    # doesn't dedup against the WARC of a failed attempt.
+    warc_prefix = f"{scheme}_{hostname}_{job.attempt}"
+    latencies: Dict[str, Optional[float]] = {"warcprox": None, "mitmdump": None}
+    try:
+        latencies = await proxies.begin(warc_prefix, os.path.join(output_path, hostname + proxies.har_extension))
+    except (ReadinessError, PortLeaseError, OSError) as e:
+        logging.error(f"{origin}: {e}")
+        await proxies.stop()
+        job.failure = classify_failure(job.input, proxies_crashed=True)
+        return False
+    finally:
+        record_readiness(output_path, latencies)
+
+    try:
+        # Run page graph crawl
+        async with gate.browser():
+            if browser_pool is None:
+                await run_pagegraph_async(
+                    proxies.port_mitmd, BRAVE_EXEC_PATH,
+                    output_path, origin, base_dir
+                )
+            else:
+                try:
+                    await browser_pool.crawl(origin, output_path, proxies.port_mitmd)
+                except BrowserPoolError as e:
+                    logging.error(f"{origin}: {e}")
+    finally:
+        proxies_crashed = not proxies.is_running()
+        proxy_logs = proxies.read_logs()
+        # Save the WARC and HAR files of this origin
+        try:
+            await proxies.finish(
+                warc_prefix, os.path.join(output_path, hostname + proxies.warc_extension), success=True
+            )
+        except OSError as e:
+            logging.error(f"{origin}: {e}")
+            proxies.healthy = False
+
+    complete = check_run_completeness(job.input)
+    if not complete:
+        # Restart the proxies before the next origin, in case they caused this
+        proxies.healthy = False
+        job.failure = classify_failure(job.input, proxy_logs, proxies_crashed)
+    return complete
+
+def on_crawl_failure(job: Job, retry: bool) -> None:
+    """
+    Keeps the output of a failed crawl, before the origin is crawled again.
 
-    # Shut everything down
-    p_mitmd.send_signal(signal.SIGINT)
-    p_mitmd.wait()
-    p_warcp.send_signal(signal.SIGINT)
-    p_warcp.wait()
+    Args:
+        job (Job): The job of the failed crawl.
+        retry (bool): Whether the origin will be crawled again.
+    """
+    _, hostname = job.input["origin"].split("://")
+    failure = job.failure or UNKNOWN
+    if retry:
+        output_path = origin_output_path(job.input)
+        if os.path.exists(output_path):
+            shutil.move(output_path, output_path + "_failed_attempt_" + str(job.attempt))
+        logging.info(f"Retry {hostname} after failure: {failure}")
+    else:
+        logging.info(f"Failed {hostname} due to failure: {failure}")
+
+
+def resume_jobs(ledger: JobLedger, output_path: str) -> List[Job]:
+    """
+    Picks up the origins of a crawl that did not finish.
 
-def run_task(input: Dict[str, str]) -> None:
-    """ 
-    Runs a task to crawl an origin, with retries in case of failure.
+    Origins that are complete are checked for completeness again, and crawled again if files
+    are missing. Origins that failed for good are not crawled again. The output of an
+    interrupted attempt is kept, like the output of a failed attempt, and the origin is
+    crawled in the next attempt.
 
     Args:
-        input (dict): Dictionary containing the 'origin' and 'output_path'.
+        ledger (JobLedger): The ledger of the crawl.
+        output_path (str): Path of the crawl.
+
+    Returns:
+        list: Jobs for the unfinished origins.
     """
-    scheme, hostname = input["origin"].split("://")
-    output_path = os.path.join(input["output_path"], f"{scheme}_{hostname}")
+    jobs = []
+    for origin, state, attempt in ledger.jobs():
+        input = {"origin": origin, "output_path": output_path}
+        if state == FAILED:
+            continue
+        if state == COMPLETE:
+            if os.path.exists(origin_output_path(input)) and check_run_completeness(input):
+                continue
+            logging.info(f"Resume: {origin} was complete, but files are missing")
+        if os.path.exists(origin_output_path(input)):
+            on_crawl_failure(Job(input, attempt), retry=True)
+            attempt += 1
+        ledger.retry(origin, attempt)
+        jobs.append(Job(input, attempt))
+    return jobs
 
-    attempt = 0
-    max_retries = 3
+def new_jobs(ledger: JobLedger, origins: Iterable[str], output_path: str) -> Iterator[Job]:
+    """
+    Adds origins to the ledger as they are taken, and yields jobs for the new ones.
 
-    # Run the task and check if it was completed successfully
-    while 1:
-        run_task_helper(input)
-        complete = check_run_completeness(input)
-        if complete:
-            break
+    Origins that are already in the ledger, because they occur twice or were
+    added by an earlier run of the crawl, are skipped.
 
-        if attempt < max_retries:
-            shutil.move(output_path, output_path + "_failed_attempt_" + str(attempt))
-            attempt += 1
-            time.sleep(30)
-            logging.info(f"Retry {hostname}")
-        else:
-            logging.info(f"Failed {hostname} due to missing files")
-            break
+    Args:
+        ledger (JobLedger): The ledger of the crawl.
+        origins (Iterable): The origins, e.g. a generator over a CrUX list.
+        output_path (str): Path of the crawl.
 
+    Returns:
+        Iterator: Jobs for the new origins.
+    """
+    for origin in origins:
+        if ledger.add_new(origin):
+            yield Job({"origin": origin, "output_path": output_path})
 
 def check_disk_space() -> None:
     """Check disk space and report it after the crawl finished running."""
@@ -137,32 +210,102 @@ def check_disk_space() -> None:
     send_message(str(p.stdout))
 
 
-def run_crawl(origin_list: List[str] = [], output_path: str = "./output", workers: int = 1) -> None:
+def run_crawl(
+        origin_list: Iterable[str] = (),
+        output_path: str = "./output",
+        workers: int = 1,
+        limits: Optional[ResourceLimits] = None,
+        proxy_max_origins: int = PROXY_MAX_ORIGINS,
+        browser_pool: bool = True,
+        resume: bool = False,
+        compress_warc: bool = False,
+        compress_har: bool = False
+    ) -> None:
     """
-    Schedules the crawls for a list of origins using multiprocessing.
+    Schedules the crawls for a list of origins on an asyncio event loop.
 
     Args:
-        origin_list (list): List of origins to process.
+        origin_list (Iterable): Origins to process. Taken one at a time, so it can be a
+            generator, e.g. over a CrUX list (see crux.py).
         output_path (str): Path where output will be stored.
-        workers (int): Number of workers invloved in multiprocessing.
+        workers (int): Number of origins crawled at the same time.
+        limits (ResourceLimits): Further limits on the resources of the host used
+            by the crawl. Only the number of workers is limited by default.
+        proxy_max_origins (int): Number of origins after which the proxies of a
+            worker are restarted.
+        browser_pool (bool): Whether to crawl in a pool of browsers that are kept
+            open, instead of starting pagegraph-crawl for each origin.
+        resume (bool): Whether to resume the crawl in output_path, instead of starting
+            a new one. The unfinished origins in the ledger of the crawl are crawled
+            first, then the origins of origin_list that are not in the ledger yet.
+        compress_warc (bool): Whether to write compressed WARCs (<hostname>.warc.gz),
+            with a gzip member per record.
+        compress_har (bool): Whether to write compressed HARs (<hostname>.zhar).
     """
-
-    # If there is no origin provided, load the crux list
-    if len(origin_list) == 0:
-        origin_list = get_crux_list(output_path)
-        origin_list = [r["origin"] for r in origin_list if int(r["rank"]) <= 10_000]
-
-    # Prepare init args and start the pool
-    inputs = [{"origin": o, "output_path": output_path} for o in origin_list]
-    with Pool(workers, initializer=setup_process, initargs=[output_path]) as p:
-        _ = list(
-            tqdm(
-                p.imap_unordered(run_task, inputs),
-                leave=True,
-                desc="Origins",
-                total=len(origin_list),
-                position=0,
+    if limits is None:
+        limits = ResourceLimits(workers=workers)
+    setup_logging(output_path)
+
+    # The state of each origin is kept in the ledger, so that the crawl can be resumed
+    ledger = JobLedger(ledger_path(output_path))
+    jobs: Iterator[Job] = new_jobs(ledger, origin_list, output_path)
+    total = len(origin_list) if isinstance(origin_list, list) else None
+    if resume:
+        unfinished = resume_jobs(ledger, output_path)
+        logging.info(f"Resuming crawl with {len(unfinished)} unfinished origins: {ledger.counts()}")
+        jobs = itertools.chain(unfinished, jobs)
+        total = None
+
+    # Failed attempts by the class of their failure
+    failures: Counter[str] = Counter()
+
+    def on_failure(job: Job, retry: bool) -> None:
+        on_crawl_failure(job, retry)
+        failures[job.failure or UNKNOWN] += 1
+        if retry:
+            ledger.retry(job.input["origin"], job.attempt + 1, job.failure)
+
+    def on_done(job: Job, success: bool) -> None:
+        ledger.finish(job.input["origin"], success, job.failure or UNKNOWN)
+        progress.update(1)
+
+    with tqdm(leave=True, desc="Origins", total=total, position=0) as progress:
+        proxy_pool = ProxyPool(output_path, proxy_max_origins, compress_warc, compress_har)
+        browsers: Optional[BrowserPool] = None
+        if browser_pool:
+            browsers = BrowserPool(
+                limits.max_browsers(), BRAVE_EXEC_PATH,
+                os.path.dirname(os.path.realpath(__file__)),
+                os.path.join(output_path, "browser_pool.log")
             )
+        crawl = functools.partial(crawl_origin, proxy_pool, browsers)
+
+        async def run_job(job: Job, slot: int, gate: ResourceGate) -> bool:
+            ledger.start(job.input["origin"], job.attempt)
+            return await crawl(job, slot, gate)
+
+        scheduler = Scheduler(
+            limits, run_job,
+            on_failure=on_failure,
+            max_retries=MAX_RETRIES,
+            retry_delay=RETRY_DELAY,
+            on_done=on_done,
+            retry_policies=RETRY_POLICIES,
         )
 
+        async def run() -> Dict[str, int]:
+            try:
+                return await scheduler.run_jobs(jobs)
+            finally:
+                if browsers is not None:
+                    await browsers.stop()
+                await proxy_pool.close()
+
+        counts = asyncio.run(run())
+    logging.info(f"Crawl finished: {counts}, ledger: {ledger.counts()}")
+    summary = summarize_failures(failures, ledger.failure_counts())
+    logging.info(summary)
+    print(summary)
+    ledger.close()
+
     # check_disk_space()
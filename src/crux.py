@@ -0,0 +1,159 @@
+"""
+Streaming readers for CrUX lists.
+
+Full CrUX exports have millions of rows, so they are read row by row
+instead of being loaded at once, from JSON (an array of rows), JSONL (one
+row per line) or CSV (with a header) files. Each row has an origin and a
+rank (the magnitude bucket of its popularity, e.g. 1000 or 10000).
+
+The origins are returned as generators, filtered by rank and optionally
+sharded, so that several crawls (or hosts) can split a list between them.
+Shards are picked by a hash of the origin, so they don't depend on the
+order of the rows.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+import os
+import csv
+import json
+import hashlib
+
+# Characters read at once from JSON files.
+CHUNK_SIZE = 1 << 16
+# Extensions of CrUX lists, in the order they are looked for.
+CRUX_EXTENSIONS = [".json", ".jsonl", ".csv"]
+
+
+def find_crux_list(directory: str, yyyymm: str = "202311") -> Optional[str]:
+    """
+    Looks for the CrUX list of a month in a directory.
+
+    Args:
+        directory (str): The directory, e.g. the output directory of the crawls.
+        yyyymm (str): Timestamp in the format YYYYMM of the crux list.
+
+    Returns:
+        str: Path of the first of <yyyymm>.json, .jsonl and .csv that exists, or None.
+    """
+    for extension in CRUX_EXTENSIONS:
+        path = os.path.join(directory, yyyymm + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_json_array(f: TextIO) -> Iterator[Any]:
+    """
+    Reads the values of a JSON array one by one, without reading the whole file.
+
+    The values must be objects or arrays, e.g. the rows of a CrUX list.
+
+    Args:
+        f (TextIO): The file.
+
+    Returns:
+        Iterator: The values of the array.
+
+    Raises:
+        ValueError: If the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    while True:
+        # Skip whitespace, the opening bracket and the commas between values
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+            pos += 1
+        if pos == len(buffer):
+            buffer, pos = f.read(CHUNK_SIZE), 0
+            if not buffer:
+                raise ValueError("Unexpected end of JSON array")
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The value continues in the next chunk
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield value
+        pos = end
+
+
+def iter_crux_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads the rows of a CrUX list one by one.
+
+    Args:
+        path (str): Path of the list, a .json, .jsonl or .csv file.
+
+    Returns:
+        Iterator: The rows, as dicts with at least 'origin' and 'rank'.
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def read_crux_origins(path: str, min_rank: int = 0, max_rank: Optional[int] = None) -> Iterator[str]:
+    """
+    Reads the origins of a CrUX list within a rank range.
+
+    Args:
+        path (str): Path of the list, a .json, .jsonl or .csv file.
+        min_rank (int): Smallest rank to include.
+        max_rank (int): Largest rank to include, no limit by default.
+
+    Returns:
+        Iterator: The origins, in the order of the list.
+    """
+    for row in iter_crux_rows(path):
+        rank = int(row["rank"])
+        if rank >= min_rank and (max_rank is None or rank <= max_rank):
+            yield row["origin"]
+
+
+def in_shard(origin: str, index: int, count: int) -> bool:
+    """
+    Returns whether an origin belongs to a shard.
+
+    Args:
+        origin (str): The origin.
+        index (int): Number of the shard, from 1 to count.
+        count (int): Number of shards.
+    """
+    digest = hashlib.sha1(origin.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count == index - 1
+
+
+def shard_origins(origins: Iterable[str], index: int, count: int) -> Iterator[str]:
+    """
+    Filters origins down to one shard.
+
+    Args:
+        origins (Iterable): The origins.
+        index (int): Number of the shard, from 1 to count.
+        count (int): Number of shards.
+
+    Returns:
+        Iterator: The origins of the shard.
+    """
+    return (origin for origin in origins if in_shard(origin, index, count))
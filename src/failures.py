@@ -0,0 +1,115 @@
+"""
+Classification of failed crawls, and how each class of failure is retried.
+
+A failed crawl is classified from the pagegraph.log of the origin, what the
+proxies logged while the origin was crawled, and the files it left behind.
+Origins that don't resolve are not retried, since they never will, timeouts
+are retried with exponential backoff, and crashed proxies are restarted and
+the origin crawled again right away.
+"""
+
+from typing import Dict, List
+import os
+import re
+
+from misc import check_run_completeness
+from scheduler import RetryPolicy
+
+# The hostname of the origin does not resolve.
+DNS = "dns"
+# Loading the page, or the crawl as a whole, timed out.
+TIMEOUT = "timeout"
+# The proxies crashed, or didn't start.
+PROXY_CRASH = "proxy_crash"
+# The crawl ran, but the pagegraph, WARC or HAR file is missing.
+MISSING_FILES = "missing_files"
+# Anything else, e.g. an exception in the crawl itself.
+UNKNOWN = "unknown"
+
+RETRY_POLICIES = {
+    DNS: RetryPolicy(max_retries=0),
+    TIMEOUT: RetryPolicy(max_retries=3, delay=30, backoff=2),
+    PROXY_CRASH: RetryPolicy(max_retries=3, delay=0),
+    MISSING_FILES: RetryPolicy(max_retries=3, delay=30),
+}
+# For failures of other classes.
+DEFAULT_RETRY_POLICY = RetryPolicy(max_retries=3, delay=30)
+
+# Name resolution errors that are not temporary (EAI_NONAME and EAI_NODATA),
+# as logged by warcprox, or by the browser when it doesn't use the proxies.
+DNS_PATTERNS = [
+    r"Failed to resolve '{hostname}' \(\[Errno -[25]\]",
+    r"net::ERR_NAME_NOT_RESOLVED at \S*//{hostname}",
+]
+TIMEOUT_PATTERNS = [
+    r"ERROR .*timed out",
+    r"Navigation timeout of \d+ ms exceeded",
+    r"net::ERR_TIMED_OUT",
+    r"net::ERR_CONNECTION_TIMED_OUT",
+]
+
+
+def read_log(path: str) -> str:
+    """Returns the content of a log file, or an empty string if it doesn't exist."""
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", errors="replace") as f:
+        return f.read()
+
+
+def matches_any(patterns: List[str], text: str, hostname: str) -> bool:
+    """Returns whether any of the patterns, with the hostname filled in, occurs in text."""
+    return any(
+        re.search(pattern.format(hostname=re.escape(hostname)), text)
+        for pattern in patterns
+    )
+
+
+def classify_failure(input: Dict[str, str], proxy_logs: str = "", proxies_crashed: bool = False) -> str:
+    """
+    Classifies a failed crawl of an origin.
+
+    Args:
+        input (dict): Dict containing the 'origin' and 'output_path' of the crawl.
+        proxy_logs (str): What the proxies logged while the origin was crawled.
+        proxies_crashed (bool): Whether the proxies exited, or didn't become ready.
+
+    Returns:
+        str: The class of the failure, one of DNS, TIMEOUT, PROXY_CRASH,
+            MISSING_FILES and UNKNOWN.
+    """
+    if proxies_crashed:
+        return PROXY_CRASH
+
+    scheme, hostname = input["origin"].split("://")
+    output_path = os.path.join(input["output_path"], f"{scheme}_{hostname}")
+    pagegraph_log = read_log(os.path.join(output_path, "logs", "pagegraph.log"))
+    logs = pagegraph_log + proxy_logs
+
+    if matches_any(DNS_PATTERNS, logs, hostname):
+        return DNS
+    # Only the pagegraph log, as the proxies log timeouts of any request of the page.
+    if matches_any(TIMEOUT_PATTERNS, pagegraph_log, hostname):
+        return TIMEOUT
+    if os.path.exists(output_path) and not check_run_completeness(input):
+        return MISSING_FILES
+    return UNKNOWN
+
+
+def summarize_failures(attempts: Dict[str, int], origins: Dict[str, int]) -> str:
+    """
+    Summarizes the failures of a crawl by class.
+
+    Args:
+        attempts (dict): Number of failed attempts by class of failure.
+        origins (dict): Number of origins that failed for good, by class of their last failure.
+
+    Returns:
+        str: One line per class, with the failed attempts and origins.
+    """
+    lines = ["Failures (attempts / origins given up):"]
+    for failure in sorted(set(attempts) | set(origins)):
+        lines.append(f"  {failure}: {attempts.get(failure, 0)} / {origins.get(failure, 0)}")
+    if len(lines) == 1:
+        lines.append("  none")
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+"""
+A durable ledger of the jobs of a crawl campaign.
+
+The ledger is a sqlite database in the output directory of the crawl, with
+one row per origin. It records the state of each origin (pending, running,
+complete or failed), how often it was attempted, why its last attempt
+failed, and when it was added, last started and finished. Every change is
+committed right away, so that a crawl that died can be resumed from the
+ledger (see main.py --resume).
+"""
+
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+import sqlite3
+
+LEDGER_FILE = "ledger.sqlite"
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    origin TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    added REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    failure TEXT
+)
+"""
+
+
+def ledger_path(output_path: str) -> str:
+    """Returns the path of the ledger of the crawl in output_path."""
+    return os.path.join(output_path, LEDGER_FILE)
+
+
+class JobLedger:
+    """
+    The states of the origins of a crawl, stored in sqlite.
+
+    Args:
+        path (str): Path of the database, created if it doesn't exist.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # The coordinator of a distributed crawl uses the ledger from its request threads,
+        # one at a time.
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+    def add(self, origins: List[str]) -> None:
+        """
+        Adds origins as pending, skipping origins that are already in the ledger.
+
+        Args:
+            origins (list): The origins to add.
+        """
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (origin, state, added) VALUES (?, ?, ?)",
+                [(origin, PENDING, now) for origin in origins],
+            )
+
+    def add_new(self, origin: str) -> bool:
+        """
+        Adds an origin as pending, unless it is already in the ledger.
+
+        Args:
+            origin (str): The origin to add.
+
+        Returns:
+            bool: Whether the origin was added, i.e. is new to the crawl.
+        """
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO jobs (origin, state, added) VALUES (?, ?, ?)",
+                (origin, PENDING, time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def start(self, origin: str, attempt: int) -> None:
+        """Marks an origin as running in the given attempt."""
+        with self.db:
+            self.db.execute(
+                "UPDATE jobs SET state = ?, attempt = ?, started = ? WHERE origin = ?",
+                (RUNNING, attempt, time.time(), origin),
+            )
+
+    def retry(self, origin: str, attempt: int, failure: Optional[str] = None) -> None:
+        """Marks an origin as pending again, to be crawled in the given attempt after a failure."""
+        with self.db:
+            self.db.execute(
+                "UPDATE jobs SET state = ?, attempt = ?, failure = ? WHERE origin = ?",
+                (PENDING, attempt, failure, origin),
+            )
+
+    def finish(self, origin: str, success: bool, failure: Optional[str] = None) -> None:
+        """Marks an origin as complete, or failed for good with the class of its last failure."""
+        with self.db:
+            self.db.execute(
+                "UPDATE jobs SET state = ?, finished = ?, failure = ? WHERE origin = ?",
+                (COMPLETE if success else FAILED, time.time(), None if success else failure, origin),
+            )
+
+    def jobs(self, states: Optional[List[str]] = None) -> List[Tuple[str, str, int]]:
+        """
+        Lists the origins in the ledger.
+
+        Args:
+            states (list): Only list origins in these states. Lists all origins by default.
+
+        Returns:
+            list: Tuples of origin, state and attempt, in the order they were added.
+        """
+        query = "SELECT origin, state, attempt FROM jobs"
+        params: List[str] = []
+        if states is not None:
+            query += f" WHERE state IN ({', '.join('?' * len(states))})"
+            params = states
+        query += " ORDER BY rowid"
+        return list(self.db.execute(query, params))
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of origins in each state."""
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def failure_counts(self) -> Dict[str, int]:
+        """Returns the number of origins that failed for good, by the class of their last failure."""
+        return dict(self.db.execute(
+            "SELECT COALESCE(failure, 'unknown'), COUNT(*) FROM jobs WHERE state = ? GROUP BY failure",
+            (FAILED,),
+        ))
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.db.close()
@@ -1,14 +1,20 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Tuple
 import os
 import sys
 import subprocess
 from datetime import datetime
 import argparse
 
-from crawl import run_crawl
+from crawl import run_crawl, setup_logging
+from crux import find_crux_list, read_crux_origins, shard_origins
+from coordinator import run_coordinator
+from worker import run_worker
 from misc import get_origin_directories
 from replay_warc import run_replay_warc
+from warc_index import run_index
 from replay_har import run_replay_har
+from scheduler import ResourceLimits
+from ledger import ledger_path
 
 def setup(output_path: str = "./output") -> None:
     """
@@ -88,6 +94,49 @@ def clean() -> None:
     for p in ["mitm", "warc", "Xvfb", "brave"]:
         subprocess.call(["pkill", "-f", p])
 
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as i/n, e.g. 2/8 for the second of eight shards.
+
+    Returns:
+        tuple: The number of the shard and the number of shards.
+
+    Raises:
+        argparse.ArgumentTypeError: If the shard is not of the form i/n, with 1 <= i <= n.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must be of the form i/n, not {value}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard must be between 1/{count} and {count}/{count}")
+    return index, count
+
+
+def origin_stream(args: argparse.Namespace, output_path: str) -> Iterator[str]:
+    """
+    Returns the origins to crawl, from --origins or, by default, from a CrUX list.
+
+    The CrUX list is read row by row and filtered by --min-rank and --max-rank, and
+    the origins are filtered down to --shard, if given.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+        output_path (str): Path of the crawl. Without --crux, the CrUX list is looked
+            for in its parent directory.
+    """
+    origins: Iterator[str] = iter(args.origins)
+    if len(args.origins) == 0:
+        crux_path = args.crux or find_crux_list(os.path.dirname(output_path))
+        if crux_path is None:
+            origins = iter([])
+        else:
+            origins = read_crux_origins(crux_path, args.min_rank, args.max_rank)
+    if args.shard is not None:
+        origins = shard_origins(origins, *args.shard)
+    return origins
+
+
 def parse_args() -> argparse.Namespace:
     """
     Parses command line arguments.
@@ -100,8 +149,42 @@ def parse_args() -> argparse.Namespace:
                         help='output path to store archives')
     parser.add_argument('--workers', type=int, default=1,
                         help='number of workers')
+    parser.add_argument('--displays', type=int, default=None,
+                        help='number of browsers (and Xvfb displays) running at the same time, defaults to the number of workers')
+    parser.add_argument('--cpus-per-browser', type=float, default=0,
+                        help='CPUs needed by each browser, caps the number of browsers running at the same time (default: no cap)')
+    parser.add_argument('--min-available-memory', type=int, default=0,
+                        help='memory in MB that must be available before a browser is started')
+    parser.add_argument('--proxy-max-origins', type=int, default=50,
+                        help='number of origins after which the proxies of a worker are restarted')
+    parser.add_argument('--no-browser-pool', action='store_true',
+                        help='run pagegraph-crawl for each origin instead of keeping a pool of browsers open')
+    parser.add_argument('--compress-warc', action='store_true',
+                        help='write compressed WARC files (.warc.gz, a gzip member per record)')
+    parser.add_argument('--compress-har', action='store_true',
+                        help='write compressed HAR files (.zhar, zlib)')
     parser.add_argument('--origins', type=str, nargs='*', default=[],
                         help='origins that the crawler should visit')
+    parser.add_argument('--crux', type=str, default=None,
+                        help='CrUX list (.json, .jsonl or .csv) to crawl if no origins are given, defaults to 202311.json next to the crawl')
+    parser.add_argument('--min-rank', type=int, default=0,
+                        help='smallest rank of the CrUX list to crawl')
+    parser.add_argument('--max-rank', type=int, default=10_000,
+                        help='largest rank of the CrUX list to crawl')
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help='only crawl the I-th of N shards of the origins, e.g. 1/4')
+    parser.add_argument('--resume', type=str, default=None,
+                        help='path to a crawl that did not finish, to crawl its unfinished origins')
+    parser.add_argument('--coordinator', type=int, default=None, metavar='PORT',
+                        help='coordinate a crawl distributed across hosts, listening on PORT for workers')
+    parser.add_argument('--coordinator-host', type=str, default='127.0.0.1',
+                        help='host the coordinator listens on, e.g. the address of the host on a private network')
+    parser.add_argument('--worker', type=str, default=None, metavar='URL',
+                        help='crawl origins for the coordinator at URL, e.g. http://10.0.0.1:8800')
+    parser.add_argument('--shared-output', type=str, default=None,
+                        help='for workers: path of the crawl on storage shared with the coordinator, instead of uploading origins')
+    parser.add_argument('--index', type=str, default=None, metavar='PATH',
+                        help='path to a crawl whose WARCs are indexed for the replay ahead of time')
     parser.add_argument('--replay-warc-path', type=str, default=None,
                         help='path to the crawl that you want to replay')
     parser.add_argument('--replay-har-path', type=str, default=None,
@@ -125,7 +208,6 @@ def main() -> None:
 
     output = args.output
     workers = args.workers
-    origins = args.origins
     replay_warc_path = args.replay_warc_path
     replay_har_path = args.replay_har_path
 
@@ -139,13 +221,63 @@ def main() -> None:
         print("Successful setup!")
         return
 
-    # Replay WARC or HAR files if paths are provided
-    if replay_warc_path:
+    limits = ResourceLimits(
+        workers=workers,
+        displays=args.displays,
+        cpus_per_browser=args.cpus_per_browser,
+        min_available_memory_mb=args.min_available_memory,
+    )
+
+    # Index WARC files ahead of their replay, or replay WARC or HAR files if paths are provided
+    if args.index:
+        origin_directories = get_origin_directories(args.index)
+        run_index(origin_directories, workers=workers)
+    elif replay_warc_path:
         origin_directories = get_origin_directories(replay_warc_path, warc_replay=True)
         run_replay_warc(origin_directories, workers=workers)
     elif replay_har_path:
         origin_directories = get_origin_directories(replay_har_path, mitmd_replay=True)
         run_replay_har(origin_directories, workers=workers)
+    elif args.coordinator is not None:
+        # Coordinate a crawl distributed across hosts
+        if args.resume:
+            output_path = os.path.abspath(args.resume)
+            if not os.path.exists(ledger_path(output_path)):
+                print("The following path is not a crawl that can be resumed:\n", output_path)
+                sys.exit(-1)
+        else:
+            ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+            print("Timestamp:", ts)
+            output_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), output, ts)
+            os.makedirs(output_path)
+        setup_logging(output_path)
+        run_coordinator(
+            origin_stream(args, output_path), output_path, args.coordinator_host, args.coordinator,
+            resume=args.resume is not None
+        )
+    elif args.resume:
+        # Resume a crawl from its ledger
+        output_path = os.path.abspath(args.resume)
+        if not os.path.exists(ledger_path(output_path)):
+            print("The following path is not a crawl that can be resumed:\n", output_path)
+            sys.exit(-1)
+        run_crawl(
+            origin_stream(args, output_path), output_path, workers, limits,
+            args.proxy_max_origins, browser_pool=not args.no_browser_pool, resume=True,
+            compress_warc=args.compress_warc, compress_har=args.compress_har
+        )
+    elif args.worker:
+        # Crawl origins for a coordinator
+        ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        base_dir = os.path.dirname(os.path.realpath(__file__))
+        output_path = os.path.join(base_dir, output, f"{ts}_worker_{os.getpid()}")
+        setup(output_path)
+        run_worker(
+            args.worker, output_path, limits, args.proxy_max_origins,
+            browser_pool=not args.no_browser_pool,
+            shared_output_path=args.shared_output,
+            compress_warc=args.compress_warc, compress_har=args.compress_har
+        )
     else:
         # Run the crawling process
         ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
@@ -154,7 +286,11 @@ def main() -> None:
         output_path = os.path.join(base_dir, output, ts)
 
         setup(output_path)
-        run_crawl(origins, output_path, workers)
+        run_crawl(
+            origin_stream(args, output_path), output_path, workers, limits,
+            args.proxy_max_origins, browser_pool=not args.no_browser_pool,
+            compress_warc=args.compress_warc, compress_har=args.compress_har
+        )
 
 
 if __name__ == "__main__":
@@ -1,24 +1,111 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import os
+import signal
 import subprocess
+import asyncio
 import logging
+import zlib
 
 from config import JS_HOOKING
 
-def start_warc_prox(port_warcp: int, output_path: str, hostname: str, bin_dir: str) -> subprocess.Popen:
+# Seconds after which a pagegraph crawl of a single origin is given up on.
+PAGEGRAPH_TIMEOUT = 120
+# Seconds to wait for a process to exit after SIGINT, before killing it.
+STOP_TIMEOUT = 30
+# Extensions of WARC files, compressed (a gzip member per record, see warcprox --gzip) or not.
+WARC_EXTENSIONS = [".warc.gz", ".warc"]
+# Extensions of HAR files, compressed (zlib, see mitmproxy's save.har) or not.
+HAR_EXTENSIONS = [".zhar", ".har"]
+# Bytes decompressed at once.
+CHUNK_SIZE = 1 << 20
+
+def warc_extension(compress: bool) -> str:
+    """Returns the extension of the WARC files written by warcprox, with or without --gzip."""
+    return ".warc.gz" if compress else ".warc"
+
+def har_extension(compress: bool) -> str:
+    """Returns the extension of the HAR files written by mitmdump, compressed or not."""
+    return ".zhar" if compress else ".har"
+
+def has_file_type(entry: str, file_type: str) -> bool:
     """
-    Starts the WARC proxy to create WARC files.
+    Checks whether a file is of a type, given by its extension.
+
+    Compressed WARC files (.warc.gz) count as WARC files (.warc), and compressed
+    HAR files (.zhar) as HAR files (.har).
+
+    Args:
+        entry (str): Name of the file.
+        file_type (str): Extension of the type, e.g. '.warc'.
+
+    Returns:
+        bool: True if the file is of the type, False otherwise.
+    """
+    extensions = {".warc": WARC_EXTENSIONS, ".har": HAR_EXTENSIONS}.get(file_type, [file_type])
+    return any(entry.endswith(extension) for extension in extensions)
+
+def find_file(path: str, hostname: str, extensions: List[str]) -> str:
+    """
+    Returns the path of a file of an origin, compressed or not.
+
+    Args:
+        path (str): Path of the origin directory.
+        hostname (str): Hostname of the origin.
+        extensions (list): Extensions of the file, the compressed one first.
+
+    Returns:
+        str: Path of the first <hostname><extension> that exists, or of the
+            uncompressed file if none does.
+    """
+    for extension in extensions:
+        file = os.path.join(path, hostname + extension)
+        if os.path.exists(file):
+            return file
+    return os.path.join(path, hostname + extensions[-1])
+
+def find_warc(path: str, hostname: str) -> str:
+    """Returns the path of the WARC file of an origin, <hostname>.warc.gz or <hostname>.warc."""
+    return find_file(path, hostname, WARC_EXTENSIONS)
+
+def find_har(path: str, hostname: str) -> str:
+    """Returns the path of the HAR file of an origin, <hostname>.zhar or <hostname>.har."""
+    return find_file(path, hostname, HAR_EXTENSIONS)
+
+def decompress_har(har_file: str, output_path: str) -> str:
+    """
+    Decompresses a compressed HAR file (.zhar), as mitmdump only replays uncompressed ones.
+
+    Args:
+        har_file (str): Path of the HAR file.
+        output_path (str): Directory to write the uncompressed HAR file to.
+
+    Returns:
+        str: Path of the uncompressed HAR file, or har_file if it isn't compressed.
+    """
+    if not har_file.endswith(".zhar"):
+        return har_file
+    decompressed_file = os.path.join(output_path, os.path.basename(har_file)[:-len(".zhar")] + ".har")
+    decompressor = zlib.decompressobj()
+    with open(har_file, "rb") as f, open(decompressed_file, "wb") as out:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            out.write(decompressor.decompress(chunk))
+        out.write(decompressor.flush())
+    return decompressed_file
+
+def warc_prox_cmd(port_warcp: int, output_path: str, hostname: str, bin_dir: str, compress: bool = False) -> List[str]:
+    """
+    Builds the command line of the WARC proxy.
 
     Args:
         port_warcp (int): The port on which the WARC proxy should listen.
         output_path (str): Path to store the output WARC files.
         hostname (str): The hostname for the WARC files.
         bin_dir (str): Directory of the executable binaries.
+        compress (bool): Whether to write compressed WARC files (.warc.gz).
 
     Returns:
-        subprocess.Popen: The process running the WARC proxy.
-    """   
-    logfile_warcp = open(os.path.join(output_path, "logs", f"warcp_{port_warcp}.log"), "a")
+        list: The command to run the WARC proxy.
+    """
     db_name_warcp = os.path.join(output_path, "warcprox.sqlite")
     warc_dir = output_path
     warc_name = hostname
@@ -31,10 +118,33 @@ def start_warc_prox(port_warcp: int, output_path: str, hostname: str, bin_dir: s
         "--stats-db-file", db_name_warcp,
         "--dedup-db-file", db_name_warcp,
     ]
+    if compress:
+        cmd.append("--gzip")
 
-    return subprocess.Popen(cmd, stdout=logfile_warcp, stderr=logfile_warcp)
+    return cmd
 
-def start_mitmd_proxy(
+def start_warc_prox(port_warcp: int, output_path: str, hostname: str, bin_dir: str, compress: bool = False) -> subprocess.Popen:
+    """
+    Starts the WARC proxy to create WARC files.
+
+    Args:
+        port_warcp (int): The port on which the WARC proxy should listen.
+        output_path (str): Path to store the output WARC files.
+        hostname (str): The hostname for the WARC files.
+        bin_dir (str): Directory of the executable binaries.
+        compress (bool): Whether to write compressed WARC files (.warc.gz).
+
+    Returns:
+        subprocess.Popen: The process running the WARC proxy.
+    """   
+    cmd = warc_prox_cmd(port_warcp, output_path, hostname, bin_dir, compress)
+    return start_process(cmd, warcp_log_path(output_path, port_warcp))
+
+def warcp_log_path(output_path: str, port_warcp: int) -> str:
+    """Returns the path of the log file of the WARC proxy listening on port_warcp."""
+    return os.path.join(output_path, "logs", f"warcp_{port_warcp}.log")
+
+def mitmd_proxy_cmd(
         port_mitmd: int,
         port_warcp: int,
         output_path: str,
@@ -42,9 +152,9 @@ def start_mitmd_proxy(
         bin_dir: str,
         mitm_script: str,
         set_hardump: bool = True
-    ) -> subprocess.Popen:
+    ) -> List[str]:
     """
-    Starts the mitmdump proxy to create HAR files and inject JS.
+    Builds the command line of the mitmdump proxy that creates HAR files and injects JS.
 
     Args:
         port_mitmd (int): The port on which the mitmdump should listen.
@@ -56,7 +166,7 @@ def start_mitmd_proxy(
         set_hardump (bool): Whether dump trafic in HAR.
 
     Returns:
-        subprocess.Popen: The process running the mitmdump proxy.
+        list: The command to run the mitmdump proxy.
     """
     db_name_mitmd = os.path.join(output_path, "mitmdump.db")
     har_name = os.path.join(output_path, f"{hostname}.har")
@@ -75,7 +185,37 @@ def start_mitmd_proxy(
             "--set", f"db_name={db_name_mitmd}",
         ]
         
-    return start_mitmd(port_mitmd, output_path, bin_dir, add_cmd=cmd)
+    return mitmd_cmd(port_mitmd, bin_dir, add_cmd=cmd)
+
+def start_mitmd_proxy(
+        port_mitmd: int,
+        port_warcp: int,
+        output_path: str,
+        hostname: str,
+        bin_dir: str,
+        mitm_script: str,
+        set_hardump: bool = True
+    ) -> subprocess.Popen:
+    """
+    Starts the mitmdump proxy to create HAR files and inject JS.
+
+    Args:
+        port_mitmd (int): The port on which the mitmdump should listen.
+        port_warcp (int): Port for upstream traffic.
+        output_path (str): Path to store HAR and related data.
+        hostname (str): The target hostname.
+        bin_dir (str): Directory of the executable binaries.
+        mitm_script (str): Path to the mitmproxy script.
+        set_hardump (bool): Whether dump trafic in HAR.
+
+    Returns:
+        subprocess.Popen: The process running the mitmdump proxy.
+    """
+    cmd = mitmd_proxy_cmd(
+        port_mitmd, port_warcp, output_path,
+        hostname, bin_dir, mitm_script, set_hardump
+    )
+    return start_process(cmd, mitmd_log_path(output_path, port_mitmd))
 
 def start_mitmd_replay(port_mitmd: int, output_path: str, bin_dir: str, har_file: str) -> subprocess.Popen:
     """
@@ -98,35 +238,65 @@ def start_mitmd_replay(port_mitmd: int, output_path: str, bin_dir: str, har_file
 
     return start_mitmd(port_mitmd, output_path, bin_dir, add_cmd=cmd)
 
-def start_mitmd(port_mitmd: int, output_path: str, bin_dir: str, add_cmd: List[str]) -> subprocess.Popen:
+def mitmd_cmd(port_mitmd: int, bin_dir: str, add_cmd: List[str]) -> List[str]:
     """
-    Starts the mitmdump proxy process.
+    Builds the command line of a mitmdump proxy process.
 
     Args:
         port_mitmd (int): The port on which the mitmdump should listen.
-        output_path (str): Path to store logs.
         bin_dir (str): Directory of the executable binaries.
         add_cmd (list): Additional command arguments.
 
     Returns:
-        subprocess.Popen: The process running the mitmdump proxy.
+        list: The command to run the mitmdump proxy.
     """
-    logfile_mitmd = open(os.path.join(output_path, "logs", f"mitmd_{port_mitmd}.log"), "a")
-
-    cmd = [
+    return [
         os.path.join(bin_dir, "mitmdump"),
         "--listen-port", f"{port_mitmd}"
     ] + add_cmd
 
-    return subprocess.Popen(cmd, stdout=logfile_mitmd, stderr=logfile_mitmd)
+def mitmd_log_path(output_path: str, port_mitmd: int) -> str:
+    """Returns the path of the log file of the mitmdump proxy listening on port_mitmd."""
+    return os.path.join(output_path, "logs", f"mitmd_{port_mitmd}.log")
 
-def start_wayback(port_warcp: int, warc_file: str, output_path: str, bin_dir: str) -> subprocess.Popen:
+def start_process(cmd: List[str], log_path: str) -> subprocess.Popen:
+    """
+    Starts a process, appending its stdout and stderr to a log file.
+
+    Args:
+        cmd (list): The command to run.
+        log_path (str): Path of the log file.
+
+    Returns:
+        subprocess.Popen: The started process.
+    """
+    logfile = open(log_path, "a")
+    return subprocess.Popen(cmd, stdout=logfile, stderr=logfile)
+
+def start_mitmd(port_mitmd: int, output_path: str, bin_dir: str, add_cmd: List[str]) -> subprocess.Popen:
+    """
+    Starts the mitmdump proxy process.
+
+    Args:
+        port_mitmd (int): The port on which the mitmdump should listen.
+        output_path (str): Path to store logs.
+        bin_dir (str): Directory of the executable binaries.
+        add_cmd (list): Additional command arguments.
+
+    Returns:
+        subprocess.Popen: The process running the mitmdump proxy.
+    """
+    cmd = mitmd_cmd(port_mitmd, bin_dir, add_cmd)
+    return start_process(cmd, mitmd_log_path(output_path, port_mitmd))
+
+def start_wayback(port_warcp: int, collection_path: str, output_path: str, bin_dir: str) -> subprocess.Popen:
     """
     Starts the wayback proxy for replaying a WARC file.
 
     Args:
         port_warcp (int): Port for wayback.
-        warc_file (str): Path to the WARC file that is served.
+        collection_path (str): Directory with the collection 'coll' of the WARC file
+            (see warc_index.py).
         output_path (str): Path to store logs and other files.
         bin_dir (str): Directory of the executable binaries.
 
@@ -134,35 +304,20 @@ def start_wayback(port_warcp: int, warc_file: str, output_path: str, bin_dir: st
         subprocess.Popen: The process running the wayback proxy.
     """    
     logfile_warcp = open(os.path.join(output_path, "logs", f"warcp_{port_warcp}.log"), "a")
-    # db_name_warcp = os.path.join(output_path, "warcprox.sqlite")
-
-    # Create WARC Collection
-    from pywb.manager.manager import CollectionsManager
-    try:
-        colls_dir = os.path.join(output_path, "collections")
-        coll_manager = CollectionsManager("coll", colls_dir=colls_dir, must_exist=False)
-        coll_manager.add_collection()
-        coll_manager.add_warcs([warc_file])
-    except Exception as e:
-        logging.error(f"{warc_file} CollectionsManager ERROR: \n{e}")
-        return -1
 
     cmd = [
         os.path.join(bin_dir, "wayback"),
         "--debug",
         "--threads", "1",
-        "--directory", output_path,
+        "--directory", collection_path,
         "--port", str(port_warcp),
         "--proxy", "coll",
     ]
     return subprocess.Popen(cmd, stdout=logfile_warcp, stderr=logfile_warcp)
 
-def start_pagegraph(port_mitmd: int, brave_exec_path: str, output_path: str, origin: str, base_dir: str) -> None:
+def pagegraph_cmd(port_mitmd: int, brave_exec_path: str, output_path: str, origin: str, base_dir: str) -> List[str]:
     """
-    Starts the pagegraph crawl process (called WebREC in the paper).
-
-    pageggraph crawl can also create screenshots.
-    We don't need it for our experiments and due to disk space we don't store it.
+    Builds the command line of the pagegraph crawl process (called WebREC in the paper).
 
     Args:
         port_mitmd (int): Port to mitmdump to connect to.
@@ -170,12 +325,11 @@ def start_pagegraph(port_mitmd: int, brave_exec_path: str, output_path: str, ori
         output_path (str): Path to store pagegraph output.
         origin (str): URL to crawl.
         base_dir (str): Base directory of the project.
+
+    Returns:
+        list: The command to run pagegraph crawl, from the pagegraph-crawl directory.
     """
     pagegraph_dir = output_path
-    log_dir = os.path.join(output_path, "logs")
-    logfile_pagegraph = open(os.path.join(log_dir, "pagegraph.log"), "a")
-
-    print("Running Brave now: " + brave_exec_path)
     pg_crawl_cmds = [
         "npm", "run", "crawl", "--", "-b", brave_exec_path, "-u", origin,
         "-t","10", "-o", pagegraph_dir,
@@ -189,24 +343,110 @@ def start_pagegraph(port_mitmd: int, brave_exec_path: str, output_path: str, ori
     else:
         pg_crawl_debug = ["--logging", "verbose"]
 
+    return pg_crawl_cmds + pg_crawl_debug
+
+def start_pagegraph(port_mitmd: int, brave_exec_path: str, output_path: str, origin: str, base_dir: str) -> None:
+    """
+    Starts the pagegraph crawl process (called WebREC in the paper).
+
+    pageggraph crawl can also create screenshots.
+    We don't need it for our experiments and due to disk space we don't store it.
+
+    Args:
+        port_mitmd (int): Port to mitmdump to connect to.
+        brave_exec_path (str): Path to Brave browser executable.
+        output_path (str): Path to store pagegraph output.
+        origin (str): URL to crawl.
+        base_dir (str): Base directory of the project.
+    """
+    log_dir = os.path.join(output_path, "logs")
+    logfile_pagegraph = open(os.path.join(log_dir, "pagegraph.log"), "a")
+
+    print("Running Brave now: " + brave_exec_path)
+    cmd = pagegraph_cmd(port_mitmd, brave_exec_path, output_path, origin, base_dir)
+
     try:
         subprocess.run(
-            pg_crawl_cmds + pg_crawl_debug,
+            cmd,
             stdout=logfile_pagegraph,
             stderr=logfile_pagegraph,
             cwd=os.path.join(base_dir, "pagegraph-crawl"),
-            timeout=120,
+            timeout=PAGEGRAPH_TIMEOUT,
         )
     except subprocess.TimeoutExpired:
         logging.error(f"{origin} pagegraph-crawl timed out")
 
+async def start_process_async(
+        cmd: List[str],
+        log_path: str,
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None
+    ) -> asyncio.subprocess.Process:
+    """
+    Starts a process without blocking the event loop, appending its stdout and stderr to a log file.
+
+    Args:
+        cmd (list): The command to run.
+        log_path (str): Path of the log file.
+        cwd (str): Working directory of the process.
+        env (dict): Environment of the process, defaults to the current environment.
+
+    Returns:
+        asyncio.subprocess.Process: The started process.
+    """
+    with open(log_path, "a") as logfile:
+        return await asyncio.create_subprocess_exec(
+            *cmd, stdout=logfile, stderr=logfile, cwd=cwd, env=env
+        )
+
+async def stop_process_async(p: asyncio.subprocess.Process, timeout: float = STOP_TIMEOUT) -> None:
+    """
+    Shuts a process down with SIGINT, like the proxies expect, and waits for it to exit.
+
+    Args:
+        p (asyncio.subprocess.Process): The process to stop.
+        timeout (float): Seconds after which the process is killed instead.
+    """
+    if p.returncode is None:
+        p.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(p.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logging.error(f"Process {p.pid} did not stop, killing it")
+        p.kill()
+        await p.wait()
+
+async def run_pagegraph_async(port_mitmd: int, brave_exec_path: str, output_path: str, origin: str, base_dir: str) -> None:
+    """
+    Runs the pagegraph crawl process, like start_pagegraph, without blocking the event loop.
+
+    Args:
+        port_mitmd (int): Port to mitmdump to connect to.
+        brave_exec_path (str): Path to Brave browser executable.
+        output_path (str): Path to store pagegraph output.
+        origin (str): URL to crawl.
+        base_dir (str): Base directory of the project.
+    """
+    log_path = os.path.join(output_path, "logs", "pagegraph.log")
+    cmd = pagegraph_cmd(port_mitmd, brave_exec_path, output_path, origin, base_dir)
+    p = await start_process_async(cmd, log_path, cwd=os.path.join(base_dir, "pagegraph-crawl"))
+    try:
+        await asyncio.wait_for(p.wait(), timeout=PAGEGRAPH_TIMEOUT)
+    except asyncio.TimeoutError:
+        logging.error(f"{origin} pagegraph-crawl timed out")
+        p.kill()
+        await p.wait()
+        # Also in the log of the origin, where failures are classified from
+        with open(log_path, "a") as logfile:
+            logfile.write(f"ERROR {origin} timed out after {PAGEGRAPH_TIMEOUT}s\n")
+
 def check_run_completeness(input: Dict[str, str]) -> bool:
     """
     Check the crawl for completeness
     
     We check if a crawl created a pagegraph activity graph (.graphml),
-    a warc file and a har file. Only if all three exist, the crawl
-    was successful.
+    a warc file (.warc or .warc.gz) and a har file (.har or .zhar).
+    Only if all three exist, the crawl was successful.
     
     Args:
         input (dict): Dictionary containing 'origin' and 'output_path'.
@@ -224,7 +464,7 @@ def check_run_completeness(input: Dict[str, str]) -> bool:
     file_types = {".graphml": "", ".warc": "", ".har": ""}
     for entry in os.listdir(output_path):
         for file_type in file_types:
-            if entry.endswith(file_type):
+            if has_file_type(entry, file_type):
                 file_types[file_type] = entry
 
     missing_file_types = [
@@ -265,7 +505,7 @@ def check_directory_validity(directory: str, mitmd_replay: bool = False, warc_re
             return result
 
         for file_type in file_types:
-            if entry.endswith(file_type):
+            if has_file_type(entry, file_type):
                 file_types[file_type].append(entry)
 
     missing_file_types = [
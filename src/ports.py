@@ -0,0 +1,166 @@
+"""
+Leases of free TCP ports for the proxies of crawls and replays.
+
+A port is leased by holding an exclusive lock on a lock file named after it,
+and only if nothing is bound to the port. The lock files are shared by all
+crawls and replays on the host, so that several of them can run at the same
+time without handing out the same ports, and a lease is released when its
+lock is released, or at the latest when the process holding it exits.
+
+Ports are picked from a range below the ephemeral port range of Linux
+(32768 and up by default), so that they don't collide with the local ports
+of outgoing connections.
+"""
+
+from typing import IO, List, Optional, Tuple
+import os
+import fcntl
+import random
+import socket
+import tempfile
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "webrec-ports")
+DEFAULT_PORT_RANGE = (20000, 32000)
+
+
+class PortLeaseError(Exception):
+    """Raised if no free port could be leased."""
+
+
+def is_port_free(port: int) -> bool:
+    """
+    Checks whether a port can be bound on all interfaces.
+
+    Ports with connections in TIME_WAIT are not considered free.
+
+    Args:
+        port (int): The port to check.
+
+    Returns:
+        bool: True if the port is free.
+    """
+    families: List[Tuple[socket.AddressFamily, str]] = [(socket.AF_INET, "")]
+    if socket.has_ipv6:
+        families.append((socket.AF_INET6, "::"))
+    for family, host in families:
+        try:
+            s = socket.socket(family, socket.SOCK_STREAM)
+        except OSError:
+            # No support for this address family on the host.
+            continue
+        with s:
+            if family == socket.AF_INET6:
+                s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            try:
+                s.bind((host, port))
+            except OSError:
+                return False
+    return True
+
+
+class PortLease:
+    """
+    A leased port, held until release() is called.
+
+    Can be used as a context manager, which releases the port on exit.
+
+    Args:
+        port (int): The leased port.
+        lock_file (IO): The locked lock file of the port.
+    """
+
+    def __init__(self, port: int, lock_file: IO[str]) -> None:
+        self.port = port
+        self.lock_file: Optional[IO[str]] = lock_file
+
+    def release(self) -> None:
+        """Releases the port. Releasing a port twice does nothing."""
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def __enter__(self) -> "PortLease":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
+
+
+class PortAllocator:
+    """
+    Hands out leases of free ports.
+
+    Args:
+        lock_dir (str): Directory of the lock files, shared by everyone leasing ports.
+        port_range (tuple): Range of ports to lease from, excluding the upper bound.
+    """
+
+    def __init__(
+            self,
+            lock_dir: str = DEFAULT_LOCK_DIR,
+            port_range: Tuple[int, int] = DEFAULT_PORT_RANGE
+        ) -> None:
+        self.lock_dir = lock_dir
+        self.port_range = port_range
+
+    def lease(self) -> PortLease:
+        """
+        Leases a free port.
+
+        Returns:
+            PortLease: The lease of the port.
+
+        Raises:
+            PortLeaseError: If all ports in the range are leased or in use.
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        low, high = self.port_range
+        # Start at a random port, so that concurrent callers rarely contend.
+        offset = random.randrange(high - low)
+        for i in range(high - low):
+            port = low + (offset + i) % (high - low)
+            lock_file = open(os.path.join(self.lock_dir, f"{port}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            lease = PortLease(port, lock_file)
+            if is_port_free(port):
+                return lease
+            lease.release()
+        raise PortLeaseError(f"No free port in range {low}-{high}")
+
+    def lease_many(self, count: int) -> List[PortLease]:
+        """
+        Leases several free ports.
+
+        Args:
+            count (int): Number of ports to lease.
+
+        Returns:
+            list: The leases of the ports.
+        """
+        leases: List[PortLease] = []
+        try:
+            for _ in range(count):
+                leases.append(self.lease())
+        except PortLeaseError:
+            release_all(leases)
+            raise
+        return leases
+
+
+def release_all(leases: List[PortLease]) -> None:
+    """
+    Releases several leased ports.
+
+    Args:
+        leases (list): The leases of the ports.
+    """
+    for lease in leases:
+        lease.release()
+
+
+PORTS = PortAllocator()
@@ -0,0 +1,272 @@
+"""
+Long-lived proxy pairs (warcprox and mitmdump) that are reused across origins.
+
+Each scheduler slot keeps one pair running. Between origins, the pair is
+pointed at the next origin instead of being restarted: mitmdump saves the
+HAR of the finished origin and tags further requests with the WARC prefix
+of the next origin (see proxy_rotation.py), and warcprox closes the WARC of
+the finished origin on request (see warcprox_rotation.py), which is then
+moved to the origin's output directory. A pair is only restarted after a
+failed crawl, or after it recorded a given number of origins.
+"""
+
+from typing import Dict, List, Optional
+import os
+import sys
+import json
+import shutil
+import asyncio
+import logging
+import urllib.request
+
+from misc import mitmd_proxy_cmd, mitmd_log_path, warcp_log_path, warc_extension, har_extension
+from misc import start_process_async, stop_process_async
+from readiness import wait_until_ready_async
+from ports import PORTS, PortLease, release_all
+from warcprox_rotation import CONTROL_PORT_ENV
+from proxy_rotation import CONTROL_HOST
+
+# Seconds to wait at most for the proxies to accept connections.
+PROXY_STARTUP_TIMEOUT = 60
+# Seconds to wait at most for warcprox to close the WARC of a finished origin.
+WARC_CLOSE_TIMEOUT = 30
+# Seconds between checks whether a WARC was closed.
+WARC_CLOSE_POLL_INTERVAL = 0.1
+
+
+class ProxyPair:
+    """
+    A warcprox and mitmdump process, kept running across the origins crawled in one slot.
+
+    The ports of the proxies are leased whenever the pair is started, and released
+    when it is stopped.
+
+    Args:
+        slot (int): Number of the scheduler slot.
+        output_path (str): Path of the crawl. Logs and open WARCs of the pair are kept in
+            proxies/slot-<slot> below it.
+        max_origins (int): Number of origins after which the pair is restarted.
+        compress_warc (bool): Whether warcprox writes compressed WARCs (.warc.gz).
+        compress_har (bool): Whether mitmdump writes compressed HARs (.zhar).
+    """
+
+    def __init__(self, slot: int, output_path: str, max_origins: int, compress_warc: bool = False, compress_har: bool = False) -> None:
+        self.slot = slot
+        self.port_leases: List[PortLease] = []
+        self.port_warcp = 0
+        self.port_mitmd = 0
+        self.port_control = 0
+        self.max_origins = max_origins
+        self.compress_warc = compress_warc
+        self.warc_extension = warc_extension(compress_warc)
+        # mitmdump compresses a HAR if its name ends with .zhar
+        self.har_extension = har_extension(compress_har)
+        self.work_dir = os.path.join(output_path, "proxies", f"slot-{slot}")
+        self.bin_dir = os.path.join(os.path.dirname(sys.executable))
+        self.base_dir = os.path.dirname(os.path.realpath(__file__))
+        self.p_warcp: Optional[asyncio.subprocess.Process] = None
+        self.p_mitmd: Optional[asyncio.subprocess.Process] = None
+        self.origins = 0
+        self.healthy = False
+        self.log_offsets: Dict[str, int] = {}
+
+    def is_running(self) -> bool:
+        """Returns whether both proxies are still running."""
+        return all(
+            p is not None and p.returncode is None
+            for p in (self.p_warcp, self.p_mitmd)
+        )
+
+    async def start(self) -> Dict[str, Optional[float]]:
+        """
+        Starts both proxies, and waits until they accept connections.
+
+        Returns:
+            dict: Seconds until each proxy was ready.
+
+        Raises:
+            ReadinessError: If a proxy did not become ready.
+        """
+        os.makedirs(os.path.join(self.work_dir, "logs"), exist_ok=True)
+        self.port_leases = PORTS.lease_many(3)
+        self.port_warcp, self.port_mitmd, self.port_control = (
+            lease.port for lease in self.port_leases
+        )
+
+        # WARCs are named after the prefix set by mitmdump for each origin.
+        # Dedup is scoped to each origin through its own dedup bucket.
+        db_name_warcp = os.path.join(self.work_dir, "warcprox.sqlite")
+        warcp_cmd = [
+            os.path.join(self.bin_dir, "warcprox"),
+            "--port", f"{self.port_warcp}",
+            "--dir", self.work_dir,
+            "--warc-filename", "{prefix}",
+            "--stats-db-file", db_name_warcp,
+            "--dedup-db-file", db_name_warcp,
+            "--plugin", "warcprox_rotation.WarcRotation",
+        ]
+        if self.compress_warc:
+            # Every record is its own gzip member, so records can still be read one by one.
+            warcp_cmd.append("--gzip")
+        env = dict(os.environ)
+        env[CONTROL_PORT_ENV] = str(self.port_control)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [self.base_dir, env.get("PYTHONPATH")]))
+        self.p_warcp = await start_process_async(
+            warcp_cmd, warcp_log_path(self.work_dir, self.port_warcp), env=env
+        )
+
+        mitm_script = os.path.join(self.base_dir, "js_injector.py")
+        rotation_script = os.path.join(self.base_dir, "proxy_rotation.py")
+        mitmd_cmd = mitmd_proxy_cmd(
+            self.port_mitmd, self.port_warcp, self.work_dir,
+            "", self.bin_dir, mitm_script, set_hardump=False
+        ) + ["-s", rotation_script]
+        self.p_mitmd = await start_process_async(
+            mitmd_cmd, mitmd_log_path(self.work_dir, self.port_mitmd)
+        )
+
+        latencies: Dict[str, Optional[float]] = {}
+        latencies["warcprox"] = await wait_until_ready_async(
+            "warcprox", self.port_warcp, self.p_warcp, PROXY_STARTUP_TIMEOUT
+        )
+        latencies["mitmdump"] = await wait_until_ready_async(
+            "mitmdump", self.port_mitmd, self.p_mitmd, PROXY_STARTUP_TIMEOUT
+        )
+        self.origins = 0
+        self.healthy = True
+        return latencies
+
+    async def stop(self) -> None:
+        """Shuts both proxies down."""
+        for p in (self.p_mitmd, self.p_warcp):
+            if p is not None:
+                await stop_process_async(p)
+        self.p_mitmd = None
+        self.p_warcp = None
+        self.healthy = False
+        release_all(self.port_leases)
+        self.port_leases = []
+
+    async def begin(self, warc_prefix: str, har_path: str) -> Dict[str, Optional[float]]:
+        """
+        Points the proxies at a new origin, (re)starting them if needed.
+
+        Args:
+            warc_prefix (str): WARC prefix of the origin, must be unique within the crawl.
+            har_path (str): Path to save the HAR of the origin to.
+
+        Returns:
+            dict: Seconds until each proxy was ready, 0 if it was already running.
+        """
+        latencies: Dict[str, Optional[float]] = {"warcprox": 0.0, "mitmdump": 0.0}
+        if not self.healthy or not self.is_running() or self.origins >= self.max_origins:
+            logging.info(f"Slot {self.slot}: (re)starting proxies after {self.origins} origins")
+            await self.stop()
+            latencies = await self.start()
+        await self.rotate(warc_prefix, har_path)
+        self.mark_logs()
+        return latencies
+
+    def mark_logs(self) -> None:
+        """Remembers where the logs of the proxies end, so that read_logs returns what follows."""
+        self.log_offsets = {}
+        for path in (warcp_log_path(self.work_dir, self.port_warcp), mitmd_log_path(self.work_dir, self.port_mitmd)):
+            self.log_offsets[path] = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def read_logs(self) -> str:
+        """Returns what the proxies logged since mark_logs was called, e.g. for the current origin."""
+        logs = []
+        for path, offset in self.log_offsets.items():
+            if os.path.exists(path):
+                with open(path, "r", errors="replace") as f:
+                    f.seek(offset)
+                    logs.append(f.read())
+        return "".join(logs)
+
+    async def finish(self, warc_prefix: str, warc_path: str, success: bool) -> None:
+        """
+        Saves the recordings of the current origin.
+
+        The HAR is saved by mitmdump, and the closed WARC is moved to warc_path.
+
+        Args:
+            warc_prefix (str): WARC prefix of the origin.
+            warc_path (str): Path to move the WARC of the origin to.
+            success (bool): Whether the crawl went well. If not, the proxies are restarted
+                before the next origin.
+        """
+        self.origins += 1
+        if not success:
+            self.healthy = False
+        if not self.is_running():
+            self.healthy = False
+            return
+        await self.rotate(None, None)
+        await self.close_warc(warc_prefix, warc_path)
+
+    async def rotate(self, warc_prefix: Optional[str], har_path: Optional[str]) -> None:
+        """Sends a rotation to the mitmdump control endpoint, see proxy_rotation.py."""
+        body = json.dumps({"warc_prefix": warc_prefix, "har_path": har_path}).encode()
+        proxy = urllib.request.ProxyHandler({"http": f"http://127.0.0.1:{self.port_mitmd}"})
+        request = urllib.request.Request(f"http://{CONTROL_HOST}/rotate", data=body, method="POST")
+
+        def send() -> None:
+            with urllib.request.build_opener(proxy).open(request, timeout=PROXY_STARTUP_TIMEOUT):
+                pass
+
+        await asyncio.to_thread(send)
+
+    async def close_warc(self, warc_prefix: str, warc_path: str) -> None:
+        """Closes the WARC of an origin in warcprox, and moves it to warc_path."""
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port_control}/close?prefix={warc_prefix}", method="POST"
+        )
+
+        def send() -> None:
+            with urllib.request.urlopen(request, timeout=WARC_CLOSE_TIMEOUT):
+                pass
+
+        await asyncio.to_thread(send)
+
+        closed_path = os.path.join(self.work_dir, warc_prefix + self.warc_extension)
+        open_path = closed_path + ".open"
+        waited = 0.0
+        while not os.path.exists(closed_path) or os.path.exists(open_path):
+            if waited >= WARC_CLOSE_TIMEOUT:
+                logging.error(f"Slot {self.slot}: WARC {closed_path} was not closed")
+                self.healthy = False
+                return
+            await asyncio.sleep(WARC_CLOSE_POLL_INTERVAL)
+            waited += WARC_CLOSE_POLL_INTERVAL
+        shutil.move(closed_path, warc_path)
+
+
+class ProxyPool:
+    """
+    The proxy pairs of all scheduler slots of a crawl.
+
+    Args:
+        output_path (str): Path of the crawl.
+        max_origins (int): Number of origins after which a pair is restarted.
+        compress_warc (bool): Whether to write compressed WARCs (.warc.gz).
+        compress_har (bool): Whether to write compressed HARs (.zhar).
+    """
+
+    def __init__(self, output_path: str, max_origins: int, compress_warc: bool = False, compress_har: bool = False) -> None:
+        self.output_path = output_path
+        self.max_origins = max_origins
+        self.compress_warc = compress_warc
+        self.compress_har = compress_har
+        self.pairs: Dict[int, ProxyPair] = {}
+
+    def pair(self, slot: int) -> ProxyPair:
+        """Returns the proxy pair of a slot."""
+        if slot not in self.pairs:
+            self.pairs[slot] = ProxyPair(
+                slot, self.output_path, self.max_origins, self.compress_warc, self.compress_har
+            )
+        return self.pairs[slot]
+
+    async def close(self) -> None:
+        """Shuts all proxy pairs down."""
+        await asyncio.gather(*(pair.stop() for pair in self.pairs.values()))
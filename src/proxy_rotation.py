@@ -0,0 +1,71 @@
+from typing import List, Optional
+from mitmproxy import ctx, http
+import json
+
+# Usage: mitmdump -s "proxy_rotation.py"
+# Lets a long-running mitmdump (in front of warcprox) record one origin after the
+# other. The destination of the recordings is switched with a control request
+# sent through the proxy:
+#   POST http://webrec.control/rotate {"warc_prefix": ..., "har_path": ...}
+# The flows recorded since the last rotation are saved as HAR to the previous
+# har_path, and every following request is tagged with the new WARC prefix (and
+# its own dedup bucket) for warcprox. Null values stop recording.
+
+CONTROL_HOST = "webrec.control"
+WARCPROX_META = "Warcprox-Meta"
+
+
+class ProxyRotation:
+    def __init__(self) -> None:
+        self.warc_prefix: Optional[str] = None
+        self.har_path: Optional[str] = None
+        self.flows: List[http.HTTPFlow] = []
+
+    def request(self, flow: http.HTTPFlow) -> None:
+        if flow.request.pretty_host == CONTROL_HOST:
+            self.handle_control(flow)
+        elif self.warc_prefix:
+            flow.request.headers[WARCPROX_META] = json.dumps({
+                "warc-prefix": self.warc_prefix,
+                "dedup-buckets": {self.warc_prefix: "rw"},
+            })
+
+    def handle_control(self, flow: http.HTTPFlow) -> None:
+        if flow.request.method != "POST" or flow.request.path != "/rotate":
+            flow.response = http.Response.make(404)
+            return
+        rotation = json.loads(flow.request.content or b"{}")
+        self.save()
+        self.warc_prefix = rotation.get("warc_prefix")
+        self.har_path = rotation.get("har_path")
+        flow.response = http.Response.make(200)
+
+    def save(self) -> None:
+        if self.har_path:
+            ctx.master.commands.call("save.har", self.flows, self.har_path)
+        self.flows = []
+
+    def record(self, flow: http.HTTPFlow) -> None:
+        if flow.request.pretty_host == CONTROL_HOST:
+            return
+        # The tag is meant for warcprox only, keep it out of the HAR.
+        flow.request.headers.pop(WARCPROX_META, None)
+        if self.har_path:
+            self.flows.append(flow)
+
+    def response(self, flow: http.HTTPFlow) -> None:
+        # Websocket flows are recorded once they end.
+        if flow.websocket is None:
+            self.record(flow)
+
+    def error(self, flow: http.HTTPFlow) -> None:
+        self.response(flow)
+
+    def websocket_end(self, flow: http.HTTPFlow) -> None:
+        self.record(flow)
+
+    def done(self) -> None:
+        self.save()
+
+
+addons = [ProxyRotation()]
@@ -0,0 +1,148 @@
+"""
+Readiness probes for the proxies (warcprox, mitmdump and pywb's wayback).
+
+Instead of sleeping for a fixed time after starting a proxy, we poll its
+port with an HTTP request until it answers, backing off between attempts.
+Any HTTP response counts, since the proxies answer requests that are not
+meant to be proxied with an error page, which still shows that they are
+serving.
+"""
+
+from typing import Callable, Dict, Optional
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+
+# Seconds to wait for a probe to connect and read the status line.
+PROBE_TIMEOUT = 2.0
+# Seconds between the first probes, doubled after each failed probe up to the maximum.
+INITIAL_BACKOFF = 0.05
+MAX_BACKOFF = 1.0
+
+PROBE_REQUEST = b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n"
+
+
+class ReadinessError(Exception):
+    """Raised if a proxy did not become ready."""
+
+
+def probe_http(port: int, host: str = "127.0.0.1", timeout: float = PROBE_TIMEOUT) -> bool:
+    """
+    Checks once whether an HTTP server answers on a port.
+
+    Args:
+        port (int): Port to probe.
+        host (str): Host to probe.
+        timeout (float): Seconds to wait for an answer.
+
+    Returns:
+        bool: True if the server answered with an HTTP status line.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as s:
+            s.sendall(PROBE_REQUEST)
+            return s.recv(5) == b"HTTP/"
+    except OSError:
+        return False
+
+
+async def probe_http_async(port: int, host: str = "127.0.0.1", timeout: float = PROBE_TIMEOUT) -> bool:
+    """
+    Checks once whether an HTTP server answers on a port, without blocking the event loop.
+
+    Args:
+        port (int): Port to probe.
+        host (str): Host to probe.
+        timeout (float): Seconds to wait for an answer.
+
+    Returns:
+        bool: True if the server answered with an HTTP status line.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(PROBE_REQUEST)
+        await writer.drain()
+        return await asyncio.wait_for(reader.read(5), timeout) == b"HTTP/"
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+
+
+def wait_until_ready(name: str, port: int, is_alive: Callable[[], bool], timeout: float) -> float:
+    """
+    Waits until a proxy answers on its port.
+
+    Args:
+        name (str): Name of the proxy, for error messages.
+        port (int): Port the proxy listens on.
+        is_alive (Callable): Returns whether the proxy process is still running.
+        timeout (float): Seconds to wait at most.
+
+    Returns:
+        float: Seconds it took for the proxy to become ready.
+
+    Raises:
+        ReadinessError: If the proxy exited or did not answer in time.
+    """
+    start = time.monotonic()
+    backoff = INITIAL_BACKOFF
+    while True:
+        if probe_http(port):
+            return time.monotonic() - start
+        if not is_alive():
+            raise ReadinessError(f"{name} on port {port} exited before it was ready")
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise ReadinessError(f"{name} on port {port} not ready after {elapsed:.1f}s")
+        time.sleep(min(backoff, timeout - elapsed))
+        backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+async def wait_until_ready_async(name: str, port: int, p: asyncio.subprocess.Process, timeout: float) -> float:
+    """
+    Waits until a proxy answers on its port, without blocking the event loop.
+
+    Args:
+        name (str): Name of the proxy, for error messages.
+        port (int): Port the proxy listens on.
+        p (asyncio.subprocess.Process): The proxy process.
+        timeout (float): Seconds to wait at most.
+
+    Returns:
+        float: Seconds it took for the proxy to become ready.
+
+    Raises:
+        ReadinessError: If the proxy exited or did not answer in time.
+    """
+    start = time.monotonic()
+    backoff = INITIAL_BACKOFF
+    while True:
+        if await probe_http_async(port):
+            return time.monotonic() - start
+        if p.returncode is not None:
+            raise ReadinessError(f"{name} on port {port} exited before it was ready")
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise ReadinessError(f"{name} on port {port} not ready after {elapsed:.1f}s")
+        await asyncio.sleep(min(backoff, timeout - elapsed))
+        backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def record_readiness(output_path: str, latencies: Dict[str, Optional[float]]) -> None:
+    """
+    Stores how long each proxy took to become ready, in logs/readiness.json.
+
+    Args:
+        output_path (str): Output path of the origin.
+        latencies (dict): Seconds until each proxy was ready, or None if it never was.
+    """
+    logging.info(f"{output_path} readiness: {latencies}")
+    with open(os.path.join(output_path, "logs", "readiness.json"), "w") as f:
+        json.dump(latencies, f)
@@ -1,14 +1,15 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 import os
 import sys
 import signal
-import time
 import logging
 import argparse
 from multiprocessing import Pool, current_process
 from tqdm import tqdm
 
-from misc import start_mitmd_replay, start_pagegraph, check_directory_validity
+from misc import start_mitmd_replay, start_pagegraph, check_directory_validity, find_har, decompress_har
+from readiness import ReadinessError, wait_until_ready, record_readiness
+from ports import PORTS
 from config import BRAVE_EXEC_PATH, INITIALIZATION_BREAK
 
 def run_task(path: str) -> None:
@@ -38,21 +39,37 @@ def run_task(path: str) -> None:
     log_dir = os.path.join(output_path, "logs")
     os.makedirs(log_dir)
     
-    # Start mitm proxy
-    port_proxy = 15000 + num
-    har_file = f'{path}/{hostname}.har'
-    p_mitmd = start_mitmd_replay(port_proxy, output_path, bin_dir, har_file)
-
-    time.sleep(INITIALIZATION_BREAK) # Allow time for proxies to initialize
-
-    # Run page graph crawl
-    start_pagegraph(
-        port_proxy, BRAVE_EXEC_PATH,
-        output_path, origin, base_dir
-    )
-    
-    p_mitmd.send_signal(signal.SIGINT)
-    p_mitmd.wait()
+    # Lease a free port for the proxy, released once it is shut down
+    with PORTS.lease() as port_lease:
+        # Start mitm proxy
+        port_proxy = port_lease.port
+        # mitmdump only replays uncompressed HAR files
+        recorded_har_file = find_har(path, hostname)
+        har_file = decompress_har(recorded_har_file, output_path)
+        p_mitmd = start_mitmd_replay(port_proxy, output_path, bin_dir, har_file)
+
+        # Wait until the proxy accepts connections, at most INITIALIZATION_BREAK seconds
+        latencies: Dict[str, Optional[float]] = {"mitmdump": None}
+        try:
+            latencies["mitmdump"] = wait_until_ready(
+                "mitmdump", port_proxy, lambda: p_mitmd.poll() is None, INITIALIZATION_BREAK
+            )
+        except ReadinessError as e:
+            logging.error(f"Process {num}: {origin}: {e}")
+        record_readiness(output_path, latencies)
+
+        # Run page graph crawl
+        if latencies["mitmdump"] is not None:
+            start_pagegraph(
+                port_proxy, BRAVE_EXEC_PATH,
+                output_path, origin, base_dir
+            )
+
+        p_mitmd.send_signal(signal.SIGINT)
+        p_mitmd.wait()
+        if har_file != recorded_har_file:
+            # The compressed HAR is kept, its uncompressed copy was only needed for the replay.
+            os.remove(har_file)
 
 
 def run_replay_har(origin_directories: List[str], workers: int = 1) -> None:
@@ -1,14 +1,16 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 import os
 import sys
 import signal
-import time
 import logging
 import argparse
 from multiprocessing import Pool, current_process
 from tqdm import tqdm
 
 from misc import start_wayback, start_mitmd_proxy, start_pagegraph, check_directory_validity
+from warc_index import find_index, build_index
+from readiness import ReadinessError, wait_until_ready, record_readiness
+from ports import PORTS, release_all
 from config import BRAVE_EXEC_PATH, INITIALIZATION_BREAK
 
 def run_task(path: str) -> None:
@@ -39,33 +41,53 @@ def run_task(path: str) -> None:
     log_dir = os.path.join(output_path, "logs")
     os.makedirs(log_dir)
 
-    # Create WARC Collection
-    port_warcp = 16000 + num
-    warc_file = f"{path}/{hostname}.warc"
-    p_warcp = start_wayback(port_warcp, warc_file, output_path, bin_dir)
-    if p_warcp == -1:
-        logging.error(f"Process {num}: Failed to start wayback proxy for {origin}")
-        return
-
-    # Run mitmd
-    port_mitmd = 15000 + num
-    mitm_script = os.path.join(base_dir, "js_injector.py")
-    p_mitmd = start_mitmd_proxy(
-        port_mitmd, port_warcp, output_path, "", bin_dir, mitm_script, set_hardump=False
-    )
-
-    time.sleep(INITIALIZATION_BREAK) # Allow time for proxies to initialize
-
-    # Run page graph crawl
-    start_pagegraph(
-        port_mitmd, BRAVE_EXEC_PATH, output_path, origin, base_dir
-    )
-
-    # Shut everything down
-    p_mitmd.send_signal(signal.SIGINT)
-    p_mitmd.wait()
-    p_warcp.send_signal(signal.SIGINT)
-    p_warcp.wait()
+    # Lease free ports for the proxies, released once they are shut down
+    port_leases = PORTS.lease_many(2)
+    port_warcp, port_mitmd = (lease.port for lease in port_leases)
+    try:
+        # Use the WARC collection built by the index stage, or build it now
+        collection_path = find_index(path)
+        if collection_path is None:
+            logging.info(f"Process {num}: {origin} is not indexed yet, indexing it")
+            try:
+                collection_path = build_index(path)
+            except Exception as e:
+                logging.error(f"Process {num}: Failed to index the WARC of {origin}: \n{e}")
+                return
+        p_warcp = start_wayback(port_warcp, collection_path, output_path, bin_dir)
+
+        # Run mitmd
+        mitm_script = os.path.join(base_dir, "js_injector.py")
+        p_mitmd = start_mitmd_proxy(
+            port_mitmd, port_warcp, output_path, "", bin_dir, mitm_script, set_hardump=False
+        )
+
+        # Wait until the proxies accept connections, at most INITIALIZATION_BREAK seconds
+        latencies: Dict[str, Optional[float]] = {"wayback": None, "mitmdump": None}
+        try:
+            latencies["wayback"] = wait_until_ready(
+                "wayback", port_warcp, lambda: p_warcp.poll() is None, INITIALIZATION_BREAK
+            )
+            latencies["mitmdump"] = wait_until_ready(
+                "mitmdump", port_mitmd, lambda: p_mitmd.poll() is None, INITIALIZATION_BREAK
+            )
+        except ReadinessError as e:
+            logging.error(f"Process {num}: {origin}: {e}")
+        record_readiness(output_path, latencies)
+
+        # Run page graph crawl
+        if latencies["mitmdump"] is not None:
+            start_pagegraph(
+                port_mitmd, BRAVE_EXEC_PATH, output_path, origin, base_dir
+            )
+
+        # Shut everything down
+        p_mitmd.send_signal(signal.SIGINT)
+        p_mitmd.wait()
+        p_warcp.send_signal(signal.SIGINT)
+        p_warcp.wait()
+    finally:
+        release_all(port_leases)
 
 def run_replay_warc(origin_directories: List[str], workers: int = 1) -> None:
     """
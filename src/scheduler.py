@@ -0,0 +1,278 @@
+"""
+An asyncio scheduler for crawl jobs.
+
+Jobs run in a fixed number of slots, but a slot is never blocked by
+sleeping: failed jobs are put back on the queue after a delay instead of
+waiting in their slot, and waiting on subprocesses does not block other
+slots. The part of a job that runs the browser is additionally limited by
+the resources of the host (Xvfb displays, CPUs and available memory).
+"""
+
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Limits on how much of the host the scheduled jobs may use.
+
+    Attributes:
+        workers (int): Number of jobs that run at the same time.
+        displays (int): Number of browsers (and so Xvfb displays) that run at the same time.
+            Defaults to the number of workers.
+        cpus_per_browser (float): CPUs needed by each browser. If set, the number of
+            browsers that run at the same time is capped at the number of CPUs divided
+            by this. Defaults to 0, no cap.
+        min_available_memory_mb (int): A browser is not started while less than this
+            much memory is available.
+    """
+    workers: int = 1
+    displays: Optional[int] = None
+    cpus_per_browser: float = 0.0
+    min_available_memory_mb: int = 0
+
+    def requested_browsers(self) -> int:
+        """Returns the number of browsers asked for, before the CPU cap."""
+        return self.workers if self.displays is None else self.displays
+
+    def max_browsers(self) -> int:
+        """Returns the number of browsers that may run at the same time."""
+        max_browsers = self.requested_browsers()
+        if self.cpus_per_browser > 0:
+            cpu_count = os.cpu_count() or 1
+            max_browsers = min(max_browsers, int(cpu_count / self.cpus_per_browser))
+        return max(1, max_browsers)
+
+
+def available_memory_mb() -> Optional[int]:
+    """
+    Reads the memory available for starting new applications.
+
+    Returns:
+        int: Available memory in MB, or None if it can't be determined.
+    """
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+class ResourceGate:
+    """Hands out the host resources needed to run a browser."""
+
+    # Seconds between checks of the available memory, while waiting for memory.
+    MEMORY_POLL_INTERVAL = 5.0
+
+    def __init__(self, limits: ResourceLimits) -> None:
+        self.limits = limits
+        max_browsers = limits.max_browsers()
+        if max_browsers < limits.requested_browsers():
+            logging.warning(
+                f"Running {max_browsers} browsers at the same time instead of {limits.requested_browsers()}: "
+                f"{os.cpu_count()} CPUs at {limits.cpus_per_browser} CPUs per browser"
+            )
+        self.displays = asyncio.Semaphore(max_browsers)
+
+    async def wait_for_memory(self) -> None:
+        """Waits until enough memory is available to start a browser."""
+        while True:
+            available = available_memory_mb()
+            if available is None or available >= self.limits.min_available_memory_mb:
+                return
+            logging.info(f"Waiting for memory: {available} MB available")
+            await asyncio.sleep(self.MEMORY_POLL_INTERVAL)
+
+    @asynccontextmanager
+    async def browser(self) -> AsyncIterator[None]:
+        """Holds the resources of one browser for the duration of the context."""
+        async with self.displays:
+            await self.wait_for_memory()
+            yield
+
+
+@dataclass
+class Job:
+    """
+    A unit of scheduled work.
+
+    Attributes:
+        input (dict): The input of the job, e.g. the 'origin' and 'output_path' of a crawl.
+        attempt (int): How often the job was retried so far.
+        failure (str): Class of the failure of the last attempt, if the job function
+            classified it. Picks the retry policy of the job.
+    """
+    input: Dict[str, str]
+    attempt: int = 0
+    failure: Optional[str] = None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How a failed job is retried.
+
+    Attributes:
+        max_retries (int): How often the job is retried.
+        delay (float): Seconds before the job is put back on the queue after its first
+            attempt. 0 puts it back right away.
+        backoff (float): Factor the delay grows by with each further attempt.
+    """
+    max_retries: int
+    delay: float = 0.0
+    backoff: float = 1.0
+
+    def delay_for(self, attempt: int) -> float:
+        """Returns the seconds before a job is retried that failed in the given attempt."""
+        return self.delay * self.backoff ** attempt
+
+
+# Runs a job in a slot (numbered from 1), and returns whether it succeeded.
+JobFunc = Callable[[Job, int, ResourceGate], Awaitable[bool]]
+# Called when a job failed, with whether it will be retried.
+FailureFunc = Callable[[Job, bool], None]
+
+
+class Scheduler:
+    """
+    Runs jobs in a fixed number of slots, and retries failed jobs after a delay.
+
+    Args:
+        limits (ResourceLimits): Limits on how much of the host the jobs may use.
+        job_func (JobFunc): Runs a single job.
+        on_failure (FailureFunc): Called when a job failed, before it is retried.
+        max_retries (int): How often a failed job is retried.
+        retry_delay (float): Seconds before a failed job is put back on the queue.
+        on_done (Callable): Called whenever a job finished for good.
+        retry_policies (dict): Retry policies for the failure classes set by the job
+            function (see Job.failure). Other failures are retried max_retries times,
+            after retry_delay seconds.
+    """
+
+    def __init__(
+            self,
+            limits: ResourceLimits,
+            job_func: JobFunc,
+            on_failure: Optional[FailureFunc] = None,
+            max_retries: int = 3,
+            retry_delay: float = 30,
+            on_done: Optional[Callable[[Job, bool], None]] = None,
+            retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        ) -> None:
+        self.limits = limits
+        self.job_func = job_func
+        self.on_failure = on_failure
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_done = on_done
+        self.retry_policies = retry_policies or {}
+
+    def retry_policy(self, job: Job) -> RetryPolicy:
+        """Returns the retry policy for the failure of a job."""
+        if job.failure is not None and job.failure in self.retry_policies:
+            return self.retry_policies[job.failure]
+        return RetryPolicy(self.max_retries, self.retry_delay)
+
+    async def run(self, inputs: Iterable[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Runs a job for each input, and returns once all of them are done.
+
+        Args:
+            inputs (Iterable): Inputs of the jobs, e.g. a generator.
+
+        Returns:
+            dict: Counts of 'succeeded', 'failed' and 'retried' jobs.
+        """
+        return await self.run_jobs(Job(input) for input in inputs)
+
+    async def run_jobs(self, jobs: Iterable[Job]) -> Dict[str, int]:
+        """
+        Runs jobs, like run, but keeps the attempts of jobs that were attempted before.
+
+        Jobs are taken from jobs only when a slot is free, so jobs can be a generator
+        over a list that doesn't fit in memory.
+
+        Args:
+            jobs (Iterable): The jobs to run.
+
+        Returns:
+            dict: Counts of 'succeeded', 'failed' and 'retried' jobs.
+        """
+        counts = {"succeeded": 0, "failed": 0, "retried": 0}
+        gate = ResourceGate(self.limits)
+        # Jobs that are retried
+        queue: asyncio.Queue[Job] = asyncio.Queue()
+        pending = iter(jobs)
+        exhausted = False
+        remaining = 0
+        all_done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        async def next_job() -> Job:
+            nonlocal exhausted, remaining
+            # Retries go first, so that they don't wait for the rest of the jobs.
+            if not queue.empty() or exhausted:
+                return await queue.get()
+            try:
+                job = next(pending)
+            except StopIteration:
+                exhausted = True
+                if remaining == 0:
+                    all_done.set()
+                return await queue.get()
+            remaining += 1
+            return job
+
+        async def run_slot(slot: int) -> None:
+            nonlocal remaining
+            while True:
+                job = await next_job()
+                job.failure = None
+                try:
+                    success = await self.job_func(job, slot, gate)
+                except Exception:
+                    logging.exception(f"Slot {slot}: job {job.input} failed")
+                    success = False
+
+                policy = self.retry_policy(job)
+                retry = not success and job.attempt < policy.max_retries
+                if not success and self.on_failure is not None:
+                    self.on_failure(job, retry)
+
+                if retry:
+                    # Free the slot right away; the job comes back later.
+                    delay = policy.delay_for(job.attempt)
+                    job.attempt += 1
+                    counts["retried"] += 1
+                    if delay > 0:
+                        loop.call_later(delay, queue.put_nowait, job)
+                    else:
+                        queue.put_nowait(job)
+                    continue
+
+                counts["succeeded" if success else "failed"] += 1
+                if self.on_done is not None:
+                    self.on_done(job, success)
+                remaining -= 1
+                if exhausted and remaining == 0:
+                    all_done.set()
+
+        slots = [
+            asyncio.create_task(run_slot(slot))
+            for slot in range(1, self.limits.workers + 1)
+        ]
+        try:
+            await all_done.wait()
+        finally:
+            for task in slots:
+                task.cancel()
+            await asyncio.gather(*slots, return_exceptions=True)
+        return counts
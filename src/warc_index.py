@@ -0,0 +1,207 @@
+"""
+Prebuilt pywb collections for the WARC replay.
+
+Indexing a WARC (building its CDXJ index) takes long for big WARCs, so it
+is done in a separate stage (see main.py --index), in parallel for all
+origins of a crawl, before the replay. Every origin directory gets its own
+collection in warc_index/, so that a replay only serves the WARC of its own
+origin. The WARC is linked into the collection instead of being copied.
+
+    <scheme>_<hostname>/warc_index/collections/coll/archive/<hostname>.warc -> ../../../../<hostname>.warc
+    <scheme>_<hostname>/warc_index/collections/coll/indexes/index.cdxj
+
+The replay serves the collection with wayback --directory warc_index, and
+only indexes the WARC itself if the index stage didn't run.
+
+If the analyses indexed the records of the WARC already (see
+analysis/warc_records.py), the CDXJ index is built from that record index
+instead of reading the WARC again, where the two give the same result.
+"""
+
+from typing import List, Optional, Tuple
+import os
+import re
+import json
+import logging
+from multiprocessing import Pool
+from tqdm import tqdm
+
+from misc import find_warc
+
+# Directory of the collection, in each origin directory.
+INDEX_DIR = "warc_index"
+# Name of the collection, served by wayback --proxy.
+COLLECTION = "coll"
+# Name of the CDXJ index, as created by pywb's CollectionsManager.
+INDEX_FILE = "index.cdxj"
+# Record index of a WARC written by analysis/warc_records.py, after the hostname.
+RECORDS_EXTENSION = ".records.parquet"
+# Record types that pywb indexes, and those it reads but leaves out.
+CDX_TYPES = ["response", "revisit", "resource"]
+SKIPPED_TYPES = ["warcinfo", "request"]
+# Separates the MIME type from its parameters, as in pywb.
+MIME_RX = re.compile("[; ]")
+
+
+def collection_dir(path: str) -> str:
+    """Returns the directory of the collection of an origin directory."""
+    return os.path.join(path, INDEX_DIR, "collections", COLLECTION)
+
+
+def find_index(path: str) -> Optional[str]:
+    """
+    Looks for the prebuilt collection of an origin.
+
+    Args:
+        path (str): Path of the origin directory.
+
+    Returns:
+        str: The directory to run wayback in, or None if the WARC is not indexed yet.
+    """
+    if os.path.exists(os.path.join(collection_dir(path), "indexes", INDEX_FILE)):
+        return os.path.join(path, INDEX_DIR)
+    return None
+
+
+def cdxj_from_records(records_file: str, filename: str) -> Optional[List[str]]:
+    """
+    Builds the CDXJ index of a WARC from its record index, the way pywb indexes the WARC.
+
+    pywb keys requests other than GET by their body, and computes missing
+    payload digests from the payload, neither of which is in the record
+    index. For WARCs with such records, None is returned.
+
+    Args:
+        records_file (str): Path of the record index.
+        filename (str): Name of the WARC in the collection.
+
+    Returns:
+        list: The sorted lines of the CDXJ index, or None if the WARC has to be indexed by pywb.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    from pywb.utils.canonicalize import canonicalize
+
+    lines = []
+    for record in pq.read_table(records_file).to_pylist():
+        rec_type = record["type"]
+        if rec_type == "request" and record["method"] != "GET":
+            return None
+        if rec_type in SKIPPED_TYPES:
+            continue
+        if rec_type not in CDX_TYPES:
+            return None
+
+        digest = record["payload_digest"] or "-"
+        if digest == "-" and rec_type != "revisit":
+            return None
+        if digest.startswith("sha1:"):
+            digest = digest[len("sha1:"):]
+
+        if rec_type == "revisit":
+            mime = "warc/revisit"
+        else:
+            mime = MIME_RX.split(record["content_type"], 1)[0] if record["content_type"] else "unk"
+        status = str(record["status"]) if rec_type == "response" and record["status"] is not None else "-"
+
+        fields = {
+            "url": record["uri"],
+            "mime": mime,
+            "status": status,
+            "digest": digest,
+            "length": str(record["length"]),
+            "offset": str(record["offset"]),
+        }
+        entry = {key: value for key, value in fields.items() if value and value != "-"}
+        entry["filename"] = filename
+        timestamp = record["date"].strftime("%Y%m%d%H%M%S")
+        lines.append(f"{canonicalize(record['uri'], True)} {timestamp} {json.dumps(entry)}\n")
+    return sorted(lines)
+
+
+def build_index(path: str) -> str:
+    """
+    Builds the collection of an origin, with its WARC linked into it and indexed.
+
+    The index is written to a temporary file first, so that an interrupted
+    build is not mistaken for a finished one.
+
+    Args:
+        path (str): Path of the origin directory.
+
+    Returns:
+        str: The directory to run wayback in.
+    """
+    from pywb.indexer.cdxindexer import write_cdx_index
+
+    scheme, hostname = os.path.basename(path).split("_")
+    warc_file = find_warc(path, hostname)
+    archive_dir = os.path.join(collection_dir(path), "archive")
+    indexes_dir = os.path.join(collection_dir(path), "indexes")
+    os.makedirs(archive_dir, exist_ok=True)
+    os.makedirs(indexes_dir, exist_ok=True)
+
+    filename = os.path.basename(warc_file)
+    link = os.path.join(archive_dir, filename)
+    if not os.path.lexists(link):
+        os.symlink(os.path.relpath(warc_file, archive_dir), link)
+
+    lines = None
+    records_file = os.path.join(path, hostname + RECORDS_EXTENSION)
+    if os.path.exists(records_file) and os.path.getmtime(records_file) >= os.path.getmtime(warc_file):
+        lines = cdxj_from_records(records_file, filename)
+
+    index_file = os.path.join(indexes_dir, INDEX_FILE)
+    temp_file = index_file + ".tmp"
+    if lines is not None:
+        with open(temp_file, "w") as f:
+            f.writelines(lines)
+    else:
+        with open(temp_file, "wb") as out, open(warc_file, "rb") as warc:
+            # The options pywb's CollectionsManager indexes added WARCs with
+            write_cdx_index(out, warc, filename, append_post=True, cdxj=True, sort=True)
+    os.replace(temp_file, index_file)
+    return os.path.join(path, INDEX_DIR)
+
+
+def index_task(path: str) -> Tuple[str, Optional[str]]:
+    """
+    Indexes the WARC of an origin, unless it is indexed already.
+
+    Returns:
+        tuple: The origin directory, and the error if indexing failed, or None.
+    """
+    if find_index(path) is not None:
+        return path, None
+    try:
+        build_index(path)
+    except Exception as e:
+        logging.error(f"{path}: indexing failed: {e}")
+        return path, repr(e)
+    return path, None
+
+
+def run_index(origin_directories: List[str], workers: int = 1) -> None:
+    """
+    Builds the collections of all origins of a crawl, in parallel.
+
+    Args:
+        origin_directories (list): Directories of the origins whose WARCs are indexed.
+        workers (int): Number of processes indexing at the same time.
+    """
+    with Pool(workers) as p:
+        results = list(
+            tqdm(
+                p.imap_unordered(index_task, origin_directories),
+                leave=True,
+                desc="Origins",
+                total=len(origin_directories),
+                position=0,
+            )
+        )
+    failed = [path for path, error in results if error is not None]
+    print(f"Indexed {len(results) - len(failed)} of {len(results)} origins")
+    for path in failed:
+        print("Failed:", path)
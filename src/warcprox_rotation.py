@@ -0,0 +1,81 @@
+from typing import Optional
+import os
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Usage: warcprox --plugin warcprox_rotation.WarcRotation
+# (with this directory on the PYTHONPATH)
+# Lets a long-running warcprox record one origin after the other. Every origin
+# is recorded under its own WARC prefix (set per request by proxy_rotation.py),
+# and once an origin is done, its WARC is closed through a small control server:
+#   POST http://127.0.0.1:$WEBREC_WARCPROX_CONTROL_PORT/close?prefix=<prefix>
+# warcprox renames a closed WARC from <prefix>.warc.open to <prefix>.warc
+# (.warc.gz.open to .warc.gz with --gzip).
+
+CONTROL_PORT_ENV = "WEBREC_WARCPROX_CONTROL_PORT"
+# Seconds to wait at most for queued records to be written before closing a WARC.
+DRAIN_TIMEOUT = 10.0
+
+
+class WarcRotation:
+    def __init__(self, options, controller) -> None:
+        # Fail at startup rather than on the first close, if warcprox lacks what we use.
+        for name in ("postfetch_status", "warc_writer_processor"):
+            if not hasattr(controller, name):
+                raise RuntimeError(f"warcprox rotation: unsupported warcprox, controller has no {name}")
+        if not hasattr(controller.warc_writer_processor, "close_for_prefix"):
+            raise RuntimeError("warcprox rotation: unsupported warcprox, WARC writer has no close_for_prefix")
+        self.controller = controller
+        self.server: Optional[HTTPServer] = None
+
+    def notify(self, recorded_url, records) -> None:
+        # Nothing to do per record, the plugin only needs the controller.
+        pass
+
+    def queued_for_writer(self) -> int:
+        """Number of records queued in the postfetch chain up to and including the WARC writer."""
+        # postfetch_status() is what the warcprox status page reports, with the
+        # processors in chain order.
+        chain = self.controller.postfetch_status()["postfetch_chain"]
+        names = [processor["processor"] for processor in chain]
+        writer = names.index(self.controller.warc_writer_processor.__class__.__name__)
+        return sum(processor["queued_urls"] for processor in chain[:writer + 1])
+
+    def drain(self) -> None:
+        """Waits until the records queued up to the WARC writer are written."""
+        deadline = time.time() + DRAIN_TIMEOUT
+        while self.queued_for_writer() and time.time() < deadline:
+            time.sleep(0.05)
+
+    def start(self) -> None:
+        rotation = self
+        controller = self.controller
+
+        class ControlHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                url = urlparse(self.path)
+                prefix = parse_qs(url.query).get("prefix", [None])[0]
+                if url.path != "/close" or not prefix:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                rotation.drain()
+                controller.warc_writer_processor.close_for_prefix(prefix)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:
+                logging.info("warcprox rotation: " + format, *args)
+
+        port = int(os.environ[CONTROL_PORT_ENV])
+        server = HTTPServer(("127.0.0.1", port), ControlHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.server = server
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
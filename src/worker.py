@@ -0,0 +1,229 @@
+"""
+A worker of a crawl that is distributed across several hosts.
+
+The worker pulls origins from the coordinator (see coordinator.py), crawls
+each of them like a local crawl (see crawl_origin), and hands the origin
+directory back: it is uploaded to the coordinator as a tar.gz, or, if the
+worker writes to storage it shares with the coordinator, left in place.
+The directory of a failed attempt is kept as _failed_attempt_<n>, like for
+a local crawl. While the worker runs, it sends heartbeats to the
+coordinator, so that its origins are crawled by others if it dies.
+"""
+
+from typing import Any, Callable, Dict, Optional, TypeVar
+import os
+import json
+import shutil
+import socket
+import asyncio
+import logging
+import tarfile
+import tempfile
+import functools
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+from crawl import crawl_origin, origin_output_path, setup_logging
+from scheduler import Job, ResourceGate, ResourceLimits
+from proxy_pool import ProxyPool
+from browser_pool import BrowserPool
+
+from config import BRAVE_EXEC_PATH
+
+# Seconds between heartbeats. Must be well below the lease timeout of the coordinator.
+HEARTBEAT_INTERVAL = 15
+# Seconds to wait before asking again, while no origin is ready or the coordinator is unreachable.
+POLL_INTERVAL = 5
+# Seconds to wait for an answer from the coordinator.
+REQUEST_TIMEOUT = 60
+
+T = TypeVar("T")
+
+
+class CoordinatorClient:
+    """
+    Talks to the coordinator of a distributed crawl.
+
+    Args:
+        url (str): URL of the coordinator, e.g. http://10.0.0.1:8800.
+        worker (str): Name of this worker, unique across the crawl.
+    """
+
+    def __init__(self, url: str, worker: str) -> None:
+        self.url = url.rstrip("/")
+        self.worker = worker
+
+    def post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Sends a request to the coordinator, and returns its answer."""
+        body = dict(body, worker=self.worker)
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(body).encode(), method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            answer: Dict[str, Any] = json.load(response)
+            return answer
+
+    def lease(self) -> Dict[str, Any]:
+        """Asks for the next origin to crawl."""
+        return self.post("/lease", {})
+
+    def heartbeat(self) -> None:
+        """Tells the coordinator that this worker is alive."""
+        self.post("/heartbeat", {})
+
+    def report(self, origin: str, attempt: int, success: bool, failure: Optional[str]) -> None:
+        """Tells the coordinator how the crawl of an origin went."""
+        self.post("/report", {
+            "origin": origin, "attempt": attempt, "success": success, "failure": failure,
+        })
+
+    def upload(self, origin: str, attempt: int, success: bool, directory: str) -> None:
+        """Uploads an origin directory to the coordinator, as a tar.gz."""
+        with tempfile.TemporaryFile() as archive:
+            with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+                tar.add(directory, arcname=".")
+            size = archive.tell()
+            archive.seek(0)
+            query = urlencode({
+                "worker": self.worker, "origin": origin, "attempt": attempt, "success": int(success),
+            })
+            request = urllib.request.Request(
+                f"{self.url}/upload?{query}", data=archive, method="POST",
+                headers={"Content-Type": "application/gzip", "Content-Length": str(size)},
+            )
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT):
+                pass
+
+
+async def call_until_reachable(func: Callable[..., T], *args: Any) -> T:
+    """Calls a client method in a thread, and retries until the coordinator was reachable."""
+    while True:
+        try:
+            return await asyncio.to_thread(func, *args)
+        except urllib.error.HTTPError:
+            # The coordinator was reachable, but refused the request.
+            raise
+        except OSError as e:
+            logging.error(f"Coordinator unreachable: {e}")
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def finished_directory(job: Job, success: bool) -> Optional[str]:
+    """
+    Returns the directory of a crawled origin, after moving it aside if the crawl failed.
+
+    Args:
+        job (Job): The job of the crawl.
+        success (bool): Whether the crawl created all expected files.
+
+    Returns:
+        str: The directory, or None if the crawl didn't create one.
+    """
+    directory = origin_output_path(job.input)
+    if not os.path.exists(directory):
+        return None
+    if not success:
+        # Keep the output of a failed attempt apart, like a local crawl does.
+        failed_directory = directory + "_failed_attempt_" + str(job.attempt)
+        shutil.move(directory, failed_directory)
+        directory = failed_directory
+    return directory
+
+
+def run_worker(
+        coordinator_url: str,
+        output_path: str,
+        limits: ResourceLimits,
+        proxy_max_origins: int,
+        browser_pool: bool = True,
+        shared_output_path: Optional[str] = None,
+        compress_warc: bool = False,
+        compress_har: bool = False
+    ) -> None:
+    """
+    Crawls origins for a coordinator, until it has no origins left.
+
+    Args:
+        coordinator_url (str): URL of the coordinator.
+        output_path (str): Local path of the worker, for its logs and proxies, and for
+            origins until they are uploaded.
+        limits (ResourceLimits): Limits on the resources of the host used by the worker.
+            limits.workers origins are crawled at the same time.
+        proxy_max_origins (int): Number of origins after which the proxies of a
+            slot are restarted.
+        browser_pool (bool): Whether to crawl in a pool of browsers that are kept
+            open, instead of starting pagegraph-crawl for each origin.
+        shared_output_path (str): Path of the crawl on storage shared with the coordinator.
+            If given, origins are written there instead of being uploaded.
+        compress_warc (bool): Whether to write compressed WARCs (<hostname>.warc.gz).
+        compress_har (bool): Whether to write compressed HARs (<hostname>.zhar).
+    """
+    setup_logging(output_path)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    client = CoordinatorClient(coordinator_url, worker)
+    origins_path = shared_output_path or output_path
+    logging.info(f"Worker {worker} crawling for {coordinator_url}")
+
+    async def run() -> None:
+        gate = ResourceGate(limits)
+        proxy_pool = ProxyPool(output_path, proxy_max_origins, compress_warc, compress_har)
+        browsers: Optional[BrowserPool] = None
+        if browser_pool:
+            browsers = BrowserPool(
+                limits.max_browsers(), BRAVE_EXEC_PATH,
+                os.path.dirname(os.path.realpath(__file__)),
+                os.path.join(output_path, "browser_pool.log")
+            )
+        crawl = functools.partial(crawl_origin, proxy_pool, browsers)
+
+        async def send_heartbeats() -> None:
+            while True:
+                try:
+                    await asyncio.to_thread(client.heartbeat)
+                except OSError as e:
+                    logging.error(f"Heartbeat failed: {e}")
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+        async def run_slot(slot: int) -> None:
+            while True:
+                answer = await call_until_reachable(client.lease)
+                if answer["job"] is None:
+                    if answer["done"]:
+                        return
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                job = Job(
+                    {"origin": answer["job"]["origin"], "output_path": origins_path},
+                    answer["job"]["attempt"],
+                )
+                try:
+                    success = await crawl(job, slot, gate)
+                except Exception:
+                    logging.exception(f"Slot {slot}: job {job.input} failed")
+                    success = False
+                directory = finished_directory(job, success)
+                if directory is not None and shared_output_path is None:
+                    try:
+                        await call_until_reachable(
+                            client.upload, job.input["origin"], job.attempt, success, directory
+                        )
+                        shutil.rmtree(directory)
+                    except urllib.error.HTTPError as e:
+                        logging.error(f"Upload of {directory} refused, keeping it: {e}")
+                await call_until_reachable(
+                    client.report, job.input["origin"], job.attempt, success, job.failure
+                )
+
+        heartbeats = asyncio.create_task(send_heartbeats())
+        try:
+            await asyncio.gather(*(run_slot(slot) for slot in range(1, limits.workers + 1)))
+        finally:
+            heartbeats.cancel()
+            if browsers is not None:
+                await browsers.stop()
+            await proxy_pool.close()
+
+    asyncio.run(run())
+    logging.info(f"Worker {worker} done")